@@ -0,0 +1,184 @@
+# backend/agents/incremental.py
+# Helpers for incremental re-processing: diff an edited/extended transcript
+# against the one a previous run was built from, find which epics/stories
+# the change touches (via source_span), and shift the spans of everything
+# that is kept.
+
+import bisect
+import copy
+import difflib
+from typing import List, Optional, Tuple
+
+from backend.models.requirements import Epic, SourceSpan
+
+# Changed windows closer than this are re-planned together in one call
+MERGE_GAP_CHARS = 500
+# Extra context on each side of a changed window sent to the planner
+CONTEXT_CHARS = 200
+
+
+class TranscriptDiff:
+    """
+    Line-level diff of old -> new transcript, expressed in character
+    offsets. Line granularity keeps SequenceMatcher fast on multi-hour
+    transcripts while still localizing edits well.
+    """
+
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+        old_lines = old.splitlines(keepends=True)
+        new_lines = new.splitlines(keepends=True)
+        old_starts = _line_starts(old_lines)
+        new_starts = _line_starts(new_lines)
+
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+        # equal blocks as (old_start, new_start, length) in chars
+        self.equal: List[Tuple[int, int, int]] = []
+        # changed regions as ((old_start, old_end), (new_start, new_end))
+        self.changes: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            old_range = (old_starts[i1], old_starts[i2])
+            new_range = (new_starts[j1], new_starts[j2])
+            if tag == "equal":
+                self.equal.append((old_range[0], new_range[0], old_range[1] - old_range[0]))
+            else:
+                self.changes.append((old_range, new_range))
+        self._equal_old_starts = [b[0] for b in self.equal]
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.changes
+
+    @property
+    def changed_chars(self) -> int:
+        return sum(max(o[1] - o[0], n[1] - n[0]) for o, n in self.changes)
+
+    def map_offset(self, old_pos: int) -> int:
+        """Maps an offset in the old transcript to the new one."""
+        i = bisect.bisect_right(self._equal_old_starts, old_pos) - 1
+        if i < 0:
+            return min(old_pos, len(self.new))
+        old_start, new_start, length = self.equal[i]
+        return new_start + min(old_pos - old_start, length)
+
+    def touches(self, span: Optional[SourceSpan]) -> bool:
+        """True if a change overlaps (or is inserted inside) the old span."""
+        return _overlaps_any(span, [old for old, _ in self.changes])
+
+    def touches_new(self, span: Optional[SourceSpan]) -> bool:
+        """Same as touches(), for a span of the NEW transcript."""
+        return _overlaps_any(span, [new for _, new in self.changes])
+
+
+def _overlaps_any(span: Optional[SourceSpan], ranges: List[Tuple[int, int]]) -> bool:
+    if not span or span.end_char <= span.start_char:
+        return False
+    start, end = span.start_char, span.end_char
+    for range_start, range_end in ranges:
+        if range_start == range_end:
+            if start < range_start < end:  # pure insertion (or deletion point) inside the span
+                return True
+        elif range_start < end and start < range_end:
+            return True
+    return False
+
+
+def _line_starts(lines: List[str]) -> List[int]:
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    return starts
+
+
+def shift_span(span: Optional[SourceSpan], diff: TranscriptDiff) -> Optional[SourceSpan]:
+    if not span:
+        return span
+    return SourceSpan(diff.map_offset(span.start_char), diff.map_offset(span.end_char))
+
+
+def classify_epics(epics: List[Epic], diff: TranscriptDiff):
+    """
+    Splits previous epics into:
+      - dirty:   the epic's own span overlaps a change -> re-plan its region
+      - restory: epic is untouched but some story span is -> regenerate stories
+      - kept:    nothing touched -> keep as is (spans shifted)
+    An epic without a source_span can't be located, so whether the change
+    touches it is unknown: when the transcript changed it goes to restory,
+    which regenerates its stories and anchors it in the new transcript.
+    """
+    dirty, restory, kept = [], [], []
+    for epic in epics:
+        if not epic.source_span and not diff.unchanged:
+            restory.append(epic)
+        elif diff.touches(epic.source_span):
+            dirty.append(epic)
+        elif any(diff.touches(s.source_span) for s in epic.stories):
+            restory.append(epic)
+        else:
+            kept.append(epic)
+    return dirty, restory, kept
+
+
+def replan_windows(dirty: List[Epic], diff: TranscriptDiff) -> List[Tuple[int, int]]:
+    """
+    Regions of the NEW transcript to re-plan: every changed region plus
+    the (shifted) spans of dirty epics, padded with a little context and
+    merged when close together.
+    """
+    windows = []
+    for (old_start, old_end), (new_start, new_end) in diff.changes:
+        if new_end > new_start:
+            windows.append((new_start, new_end))
+    for epic in dirty:
+        span = shift_span(epic.source_span, diff)
+        windows.append((span.start_char, span.end_char))
+
+    size = len(diff.new)
+    windows = sorted((max(0, s - CONTEXT_CHARS), min(size, e + CONTEXT_CHARS)) for s, e in windows)
+    merged: List[Tuple[int, int]] = []
+    for start, end in windows:
+        if merged and start - merged[-1][1] <= MERGE_GAP_CHARS:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def drop_overlapping(new_epics: List[Epic], carried: List[Epic], diff: TranscriptDiff) -> List[Epic]:
+    """
+    Re-plan windows are padded with context, so the planner can re-extract
+    an epic that was kept. Drops re-planned epics (spans anchored in the new
+    transcript) that overlap a carried epic's span without touching any
+    changed region; unlocated ones are kept.
+    """
+    kept_spans = [(e.source_span.start_char, e.source_span.end_char) for e in carried if e.source_span]
+    return [
+        epic for epic in new_epics
+        if diff.touches_new(epic.source_span) or not _overlaps_any(epic.source_span, kept_spans)
+    ]
+
+
+def carry_over(epics: List[Epic], diff: TranscriptDiff) -> List[Epic]:
+    """Deep copies kept epics (the previous run stays untouched) with shifted spans."""
+    carried = copy.deepcopy(epics)
+    for epic in carried:
+        epic.source_span = shift_span(epic.source_span, diff)
+        for story in epic.stories:
+            story.source_span = shift_span(story.source_span, diff)
+    return carried
+
+
+def unique_epic_ids(new_epics: List[Epic], taken: set):
+    """Renames re-planned epic ids that collide with kept ones."""
+    for epic in new_epics:
+        base = epic.id or "epic"
+        candidate, n = base, 1
+        while candidate in taken:
+            n += 1
+            candidate = f"{base}-r{n}"
+        epic.id = candidate
+        taken.add(candidate)
+        for story in epic.stories:
+            story.epic_id = candidate
@@ -1,46 +1,528 @@
 # backend/agents/pipeline.py
 
+import asyncio
+import dataclasses
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+
 from backend.agents.planner import PlannerAgent
 from backend.agents.reviewer import ReviewerAgent
 from backend.agents.story_generator import StoryGeneratorAgent
+from backend.agents import incremental
+from backend.agents.stage_graph import StageGraph
+from backend.models.requirements import Plan, Review, parse_plan, parse_review, to_dict
+from backend.storage.history_store import HistoryStore
+from backend.utils import resilience
+from backend.utils.span_index import TranscriptIndex, anchor_spans
+from backend.utils.singleflight import SingleFlight, make_key
+
+# How many story generation requests may be in flight at the same time per run
+STORY_CONCURRENCY = int(os.getenv("STORY_CONCURRENCY", "4"))
+# Pack several small epics into one story generation request
+STORY_BATCHING = os.getenv("STORY_BATCHING", "").strip().lower() in ("1", "true", "yes", "on")
+# Review each epic (story batch) as soon as its stories are ready, instead of
+# one review call for the whole plan: lower latency, more reviewer calls
+REVIEW_EACH_EPIC = os.getenv("PIPELINE_REVIEW_EACH_EPIC", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Runs with a deadline degrade instead of overrunning it. Seconds of budget:
+#  - story generation isn't started with less than STORY_MIN_SECONDS left
+#    after reserving REVIEW_FULL_SECONDS for the review (planner stories kept)
+#  - with less than REVIEW_FULL_SECONDS left only High priority epics are
+#    reviewed, with less than REVIEW_MIN_SECONDS the review is deferred
+STORY_MIN_SECONDS = float(os.getenv("PIPELINE_STORY_MIN_SECONDS", "10"))
+REVIEW_FULL_SECONDS = float(os.getenv("PIPELINE_REVIEW_FULL_SECONDS", "20"))
+REVIEW_MIN_SECONDS = float(os.getenv("PIPELINE_REVIEW_MIN_SECONDS", "8"))
+
+# Speculative planning (see speculate()): unclaimed plans are dropped after
+# SPECULATION_TTL seconds, and at most MAX_SPECULATIONS are kept at once
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL_SECONDS", "600"))
+MAX_SPECULATIONS = int(os.getenv("MAX_SPECULATIONS", "32"))
 
 class RequirementsPipeline:
 
-    def __init__(self, model="mistral-small-latest"):
+    def __init__(self, model="mistral-small-latest", history_store=None, story_concurrency=STORY_CONCURRENCY,
+                 story_batching=STORY_BATCHING, review_each_epic=REVIEW_EACH_EPIC):
+        self.model = model
         self.planner = PlannerAgent(model)
         self.story_gen = StoryGeneratorAgent(model)
         self.reviewer = ReviewerAgent(model)
+        self.history = history_store if history_store is not None else HistoryStore()
+        self.story_concurrency = max(1, story_concurrency)
+        self.story_batching = story_batching
+        self.review_each_epic = review_each_epic
+
+        # In-flight dedup of identical runs (same transcript + config):
+        # duplicates attach to the running execution and share its result.
+        self._flights = SingleFlight()
+        self._progress_listeners = {}
+        self._last_progress = {}
+
+        # owner -> (plan_key, planner task, started at), oldest first
+        self._speculations = OrderedDict()
+        self.speculation_counters = {"started": 0, "claimed": 0, "discarded": 0, "expired": 0, "failed": 0}
+
+    def run_key(self, transcript: str, previous_run_id=None) -> str:
+        """Dedup key: transcript content + everything that changes the output."""
+        return make_key("pipeline", transcript, self.model, previous_run_id)
+
+    def plan_key(self, transcript: str) -> str:
+        """Key of a speculative plan: the planner's output only depends on these."""
+        return make_key("plan", transcript, self.model)
+
+    def speculate(self, transcript: str, owner: str) -> bool:
+        """
+        Starts planning transcript in the background before anyone asked
+        for a run (e.g. while the user reads the upload preview). A full
+        run of the same transcript claims the plan, in flight or done,
+        instead of calling the planner again. Each owner (client) has at
+        most one speculation: a new transcript discards the previous one.
+        Returns False when the owner's speculation is already this one.
+        Must be called on the event loop the runs use.
+        """
+        self._expire_speculations()
+        key = self.plan_key(transcript)
+        current = self._speculations.get(owner)
+        if current is not None and current[0] == key:
+            return False
+        self.discard_speculation(owner)
+
+        task = asyncio.get_running_loop().create_task(self.planner.generate_requirements_async(transcript))
+        # an unclaimed failure is only counted, never raised
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._speculations[owner] = (key, task, time.monotonic())
+        self.speculation_counters["started"] += 1
+        while len(self._speculations) > MAX_SPECULATIONS:
+            self.discard_speculation(next(iter(self._speculations)))
+        return True
+
+    def discard_speculation(self, owner: str) -> bool:
+        """Stops (or forgets) owner's speculative plan; False if there is none."""
+        entry = self._speculations.pop(owner, None)
+        if entry is None:
+            return False
+        entry[1].cancel()
+        self.speculation_counters["discarded"] += 1
+        return True
+
+    def _expire_speculations(self):
+        now = time.monotonic()
+        for owner, (_, task, started) in list(self._speculations.items()):
+            if now - started > SPECULATION_TTL:
+                del self._speculations[owner]
+                task.cancel()
+                self.speculation_counters["expired"] += 1
+
+    def _claim_speculation(self, transcript: str):
+        """Takes over the speculative planner task for transcript, or None."""
+        self._expire_speculations()
+        key = self.plan_key(transcript)
+        for owner, (spec_key, task, _) in self._speculations.items():
+            if spec_key == key:
+                del self._speculations[owner]
+                self.speculation_counters["claimed"] += 1
+                return task
+        return None
+
+    def speculation_stats(self):
+        return {"active": len(self._speculations), **self.speculation_counters}
+
+    async def _plan(self, transcript: str) -> Plan:
+        """Planner output for a full run: a claimed speculative plan if there is one."""
+        task = self._claim_speculation(transcript)
+        if task is not None:
+            try:
+                # the run owns the task now: cancelling the run cancels it
+                return await asyncio.wait_for(task, resilience.time_left())
+            except asyncio.TimeoutError:
+                raise resilience.DeadlineExceeded("Speculative plan not ready within the deadline")
+            except Exception as e:
+                self.speculation_counters["failed"] += 1
+                print(f"Speculative plan failed ({e}); planning again")
+        return await self.planner.generate_requirements_async(transcript)
+
+    def run(self, transcript: str, progress=None, previous_run_id=None, deadline=None):
+        """
+        Blocking wrapper around run_async() for scripts and CLI use.
+        """
+        return asyncio.run(self.run_async(
+            transcript, progress=progress, previous_run_id=previous_run_id, deadline=deadline
+        ))
 
-    def run(self, transcript: str):
+    async def run_async(self, transcript: str, progress=None, previous_run_id=None, deadline=None):
+        """
+        Runs the pipeline, or attaches to an identical run already in
+        flight (same run_key) and returns its result. Every attached
+        caller's progress callback receives the shared run's progress.
+
+        previous_run_id: re-process incrementally against a stored run,
+        only re-planning what changed in the transcript.
+
+        deadline: time budget in seconds. Every LLM call is bounded by
+        what's left of it, and the run degrades (see STORY_MIN_SECONDS /
+        REVIEW_*_SECONDS) rather than overrun it; a degraded result has a
+        "partial" entry saying what was skipped. Only a planner that
+        can't finish in time fails the run. Callers attaching to a run in
+        flight get it with the budget it was started with.
+        """
+        key = self.run_key(transcript, previous_run_id)
+        listeners = self._progress_listeners.setdefault(key, [])
+        if progress is not None:
+            listeners.append(progress)
+            if key in self._last_progress:
+                progress(*self._last_progress[key])
+
+        def fanout(stage, done=0, total=0):
+            self._last_progress[key] = (stage, done, total)
+            for listener in list(listeners):
+                listener(stage, done, total)
+
+        try:
+            return await self._flights.do(key, self._run_async, transcript, fanout, previous_run_id, deadline)
+        finally:
+            if progress is not None:
+                listeners.remove(progress)
+            if not self._flights.in_flight(key):
+                self._progress_listeners.pop(key, None)
+                self._last_progress.pop(key, None)
+
+    async def _run_async(self, transcript: str, progress=None, previous_run_id=None, deadline=None):
         """
         Runs:
-         1. Planner Agent
-         2. Reviewer Agent
+         1. Planner Agent (the transcript index for span anchoring is
+            built meanwhile)
+         2. Story Generator Agent (per epic, concurrently)
+            + local source_span anchoring against the transcript
+         3. Reviewer Agent
+         4. History store write
         and returns combined output.
+
+        Steps 1-3 run as a StageGraph: each epic is anchored (and, with
+        review_each_epic, reviewed) as soon as its own stories are ready
+        rather than after every epic's.
+
+        progress: optional callback(stage, done, total) used by background
+        jobs to report where the run is.
         """
+        if progress is None:
+            progress = lambda stage, done=0, total=0: None
+
+        with resilience.deadline_scope(deadline):
+            if previous_run_id:
+                return await self._run_incremental(transcript, previous_run_id, progress, deadline)
 
-        # Step 1: Generate requirements (epics/stories)
-        planner_output = self.planner.generate_requirements(transcript)
+            graph = StageGraph(limits={"stories": self.story_concurrency, "review": self.story_concurrency})
+            kept = set()
+            batch_reviews = {}
+            counts = {"stories": 0, "reviewed": 0}
 
-        # NEW STEP 2: Generate stories for each epic
-        for epic in planner_output["epics"]:
-            if "user_stories" in epic:
-                del epic["user_stories"]
-            epic_title = epic.get("title")
-            epic_desc = epic.get("description")
+            async def plan_transcript():
+                try:
+                    return await self._plan(transcript)
+                except resilience.DeadlineExceeded:
+                    raise ValueError(f"Planning did not finish within the {deadline:g}s deadline")
+
+            async def review_batch(position, batch, total, _):
+                batch_reviews[position] = await self._review(Plan(epics=batch))
+                counts["reviewed"] += len(batch)
+                if counts["stories"] == total:
+                    progress("reviewing", counts["reviewed"], total)
+
+            async def review_all(plan, *_):
+                progress("reviewing", len(plan.epics), len(plan.epics))
+                batch_reviews[0] = await self._review(plan)
+
+            async def expand(plan):
+                # NEW STEP 2: Generate stories for each epic, then anchor
+                # (and review) each epic as soon as its stories are in
+                total = len(plan.epics)
+                chains = self._add_story_stages(graph, plan.epics, transcript, kept, counts, progress)
+                for i, (batch, anchor) in enumerate(chains):
+                    if self.review_each_epic:
+                        graph.add(f"review:{i}", "review", partial(review_batch, i, batch, total), deps=(anchor,))
+                # Step 3: Review generated requirements
+                if not self.review_each_epic:
+                    graph.add("review", "review", review_all, deps=["plan"] + [anchor for _, anchor in chains])
+
+            # Step 1: Generate requirements (epics/stories)
+            progress("planning")
+            graph.add("index", "index", partial(asyncio.to_thread, TranscriptIndex, transcript))
+            graph.add("plan", "planner", plan_transcript)
+            graph.add("expand", "expand", expand, deps=("plan",))
+            await graph.run()
+
+        plan = graph.result("plan")
+        # Ordered assembly: batches (and their reviews) follow the plan's epic order
+        review = Review()
+        review_deferred = []
+        for position in sorted(batch_reviews):
+            part, deferred = batch_reviews[position]
+            review.epics += part.epics
+            review.context = review.context or part.context
+            review_deferred += deferred
+        stories_kept = [epic.id for epic in plan.epics if epic.id in kept]
+
+        # Stored / served as plain JSON
+        result = {
+            "planner_output": to_dict(plan),
+            "reviewer_output": {"review": to_dict(review)}
+        }
+        mark_partial(result, deadline, stories_kept, review_deferred)
+
+        # Step 4: Persist the run so it can be searched later
+        return await self._save(transcript, result, progress)
+
+    def _add_story_stages(self, graph, epics, transcript, kept: set, counts, progress):
+        """
+        Adds the stories stage for epics to graph: per story batch, a
+        "stories" node generating the batch's stories, then an "anchor"
+        node locating them in transcript (with the "index" node's
+        TranscriptIndex). Stories nodes run concurrently up to the graph's
+        "stories" limit.
 
-            generated_stories = self.story_gen.generate_stories_for_epic(
-                epic_title,
-                epic_desc
+        Under a deadline, batches whose generation can't finish in time
+        (leaving REVIEW_FULL_SECONDS for the review) keep the stories they
+        already have, and their epic ids are added to kept. Returns
+        [(batch, anchor node name)].
+        """
+        budget = story_budget()
+        story_until = None if budget is None else time.monotonic() + budget
+        total = len(epics)
+        progress("generating_stories", 0, total)
+
+        async def stories(batch):
+            if story_until is None:
+                await self._generate_batch(batch, kept)
+            elif story_until <= time.monotonic():
+                kept.update(epic.id for epic in batch)
+            else:
+                with resilience.deadline_scope(story_until - time.monotonic()):
+                    await self._generate_batch(batch, kept)
+            counts["stories"] += len(batch)
+            progress("generating_stories", counts["stories"], total)
+
+        async def anchor(batch, _, index):
+            await asyncio.to_thread(anchor_spans, batch, transcript, index)
+
+        chains = []
+        for i, batch in enumerate(self._story_batches(epics)):
+            graph.add(f"stories:{i}", "stories", partial(stories, batch))
+            chains.append((batch, graph.add(f"anchor:{i}", "anchor", partial(anchor, batch), deps=(f"stories:{i}", "index"))))
+        return chains
+
+    def _story_batches(self, epics):
+        """One request per epic, or (story_batching) several epics per request."""
+        return self.story_gen.plan_batches(epics) if self.story_batching else [[epic] for epic in epics]
+
+    async def _generate_batch(self, batch, kept: set):
+        """
+        Generates stories for one batch of epics. If the deadline runs out
+        first, the epics keep the stories they have and their ids are
+        added to kept.
+        """
+        try:
+            generated_stories = await self.story_gen.generate_stories_for_epics_async(batch)
+        except resilience.DeadlineExceeded:
+            kept.update(epic.id for epic in batch)
+            return
+        # Overwrite empty stories[] with generated stories
+        for epic in batch:
+            epic.stories = generated_stories[epic.id]
+
+    async def _review(self, plan: Plan):
+        """
+        Reviews the plan's epics. Under a deadline: only High priority
+        epics when less than REVIEW_FULL_SECONDS are left, none below
+        REVIEW_MIN_SECONDS or when the review times out. Returns the
+        Review and the ids of the epics left unreviewed.
+        """
+        left = resilience.time_left()
+        if left is not None and left < REVIEW_MIN_SECONDS:
+            return Review(), [epic.id for epic in plan.epics]
+
+        selected = plan
+        if left is not None and left < REVIEW_FULL_SECONDS:
+            high = [epic for epic in plan.epics if epic.priority == "High"]
+            if high:
+                selected = dataclasses.replace(plan, epics=high)
+
+        try:
+            review = await self.reviewer.review_requirements_async(selected)
+        except resilience.DeadlineExceeded:
+            return Review(), [epic.id for epic in plan.epics]
+        reviewed = {epic.id for epic in selected.epics}
+        return review, [epic.id for epic in plan.epics if epic.id not in reviewed]
+
+    async def complete_review_async(self, run_id: str, progress=None):
+        """
+        Reviews the epics a partial run deferred (no deadline) and stores
+        the completed run as a new run (stored runs are immutable), with
+        "completes_run_id" pointing back. Returns the new result.
+        """
+        if progress is None:
+            progress = lambda stage, done=0, total=0: None
+
+        run = await asyncio.to_thread(self.history.get_run, run_id)
+        if run is None:
+            raise ValueError(f"Run {run_id} not found")
+        stored = run["result"]
+        partial = dict(stored.get("partial") or {})
+        deferred = set(partial.pop("review_deferred", None) or [])
+        if not deferred:
+            raise ValueError(f"Run {run_id} has no deferred review")
+
+        plan = parse_plan(stored.get("planner_output") or {})
+        review = parse_review(stored.get("reviewer_output"))
+        pending = dataclasses.replace(plan, epics=[e for e in plan.epics if e.id in deferred])
+        progress("reviewing", 0, len(pending.epics))
+        extra = await self.reviewer.review_requirements_async(pending)
+        review.epics += extra.epics
+        review.context = review.context or extra.context
+
+        result = dict(stored, reviewer_output={"review": to_dict(review)}, completes_run_id=run_id)
+        result.pop("run_id", None)
+        result.pop("partial", None)
+        if partial.get("stories_kept"):
+            result["partial"] = partial
+        return await self._save(run["transcript"], result, progress)
+
+    async def _save(self, transcript: str, result, progress):
+        """
+        Writes the run to the history store (sqlite is blocking, so it runs
+        off the event loop). A storage failure must not throw away a
+        finished LLM run.
+        """
+        progress("saving")
+        try:
+            result["run_id"] = await asyncio.to_thread(
+                self.history.save_run, transcript, result, self.model
             )
+        except Exception as e:
+            print(f"Failed to store pipeline run in history: {e}")
+
+        return result
+
+    async def _run_incremental(self, transcript: str, previous_run_id: str, progress, deadline=None):
+        """
+        Re-processes only what changed since a previous run:
+         1. Diff the new transcript against the previous run's transcript
+         2. Keep epics/stories whose source_span the change doesn't touch
+            (spans shifted to the new text)
+         3. Re-plan only the changed windows of the new transcript
+         4. Regenerate stories for re-planned epics and for kept epics
+            that had a touched story (the full run's stories stage)
+         5. Review only re-planned epics; reuse the other review entries
+        """
+        previous = await asyncio.to_thread(self.history.get_run, previous_run_id)
+        if previous is None:
+            raise ValueError(f"Previous run {previous_run_id} not found")
+
+        diff = incremental.TranscriptDiff(previous["transcript"], transcript)
+        prev_plan = parse_plan(previous["result"].get("planner_output") or {})
+        prev_review = parse_review(previous["result"].get("reviewer_output"))
+        prev_reviews = {r.id: r for r in prev_review.epics}
+
+        prev_epics = prev_plan.epics
+        # Epics stored without a span get one located in the previous
+        # transcript; the ones that still can't be located are re-storied
+        unlocated = [e for e in prev_epics if not e.source_span]
+        if unlocated and not diff.unchanged:
+            await asyncio.to_thread(anchor_spans, unlocated, previous["transcript"])
+        dirty, restory, kept = incremental.classify_epics(prev_epics, diff)
+
+        # Carried epics keep their original order
+        dirty_ids, restory_ids = {id(e) for e in dirty}, {id(e) for e in restory}
+        survivors = [e for e in prev_epics if id(e) not in dirty_ids]
+        carried = incremental.carry_over(survivors, diff)
+        carried_restory = [c for c, e in zip(carried, survivors) if id(e) in restory_ids]
+
+        # Re-plan changed windows concurrently, one planner call per window
+        windows = incremental.replan_windows(dirty, diff) if not diff.unchanged else []
+        progress("planning", 0, len(windows))
+
+        async def replan(window):
+            start, end = window
+            planned = await self.planner.generate_requirements_async(transcript[start:end])
+            return planned.epics
+
+        async def replan_all():
+            try:
+                return [e for epics in await asyncio.gather(*(replan(w) for w in windows)) for e in epics]
+            except resilience.DeadlineExceeded:
+                raise ValueError(f"Planning did not finish within the {deadline:g}s deadline")
+
+        async def expand(new_epics, index):
+            # Windows include context around the changes: drop epics the planner
+            # re-extracted from a kept epic's region instead of duplicating them
+            await asyncio.to_thread(anchor_spans, new_epics, transcript, index)
+            new_epics = incremental.drop_overlapping(new_epics, carried, diff)
+            incremental.unique_epic_ids(new_epics, {e.id for e in carried})
+            # Same stories stage as a full run. Spans are anchored against the
+            # full new transcript, so re-planned epics land in the right place
+            # regardless of which window they came from
+            self._add_story_stages(graph, new_epics + carried_restory, transcript, kept_stories, counts, progress)
+            return new_epics
+
+        graph = StageGraph(limits={"stories": self.story_concurrency})
+        kept_stories, counts = set(), {"stories": 0}
+        graph.add("index", "index", partial(asyncio.to_thread, TranscriptIndex, transcript))
+        graph.add("plan", "planner", replan_all)
+        graph.add("expand", "expand", expand, deps=("plan", "index"))
+        await graph.run()
+        new_epics = graph.result("expand")
+        stories_kept = [e.id for e in new_epics + carried_restory if e.id in kept_stories]
+
+        # Review only what's new; kept epics keep their previous review
+        progress("reviewing", len(new_epics), len(new_epics))
+        review = Review(epics=[prev_reviews[e.id] for e in carried if e.id in prev_reviews])
+        review_deferred = []
+        if new_epics:
+            new_review, review_deferred = await self._review(Plan(epics=new_epics))
+            review.epics += new_review.epics
+            review.context = new_review.context
+
+        plan = Plan(epics=carried + new_epics, metadata=prev_plan.metadata, context=prev_plan.context)
+
+        result = {
+            "planner_output": to_dict(plan),
+            "reviewer_output": {"review": to_dict(review)},
+            "incremental": {
+                "previous_run_id": previous_run_id,
+                "changed_chars": diff.changed_chars,
+                "replanned_windows": len(windows),
+                "replaced_epics": [e.id for e in dirty],
+                "restoried_epics": [e.id for e in restory],
+                "kept_epics": [e.id for e in kept],
+                "new_epics": [e.id for e in new_epics],
+            },
+        }
+        mark_partial(result, deadline, stories_kept, review_deferred)
+        return await self._save(transcript, result, progress)
+
 
-            # Overwrite empty stories[] with generated stories
-            epic["stories"] = generated_stories
+def story_budget():
+    """
+    Seconds story generation may take under the current deadline, keeping
+    REVIEW_FULL_SECONDS for the review: None without a deadline, 0 when
+    too little is left to start it (epics keep the planner's stories).
+    """
+    left = resilience.time_left()
+    if left is None:
+        return None
+    budget = left - REVIEW_FULL_SECONDS
+    return budget if budget >= STORY_MIN_SECONDS else 0
 
-        # Step 3: Review generated requirements
-        reviewer_output = self.reviewer.review_requirements(planner_output)
 
-        return {
-            "planner_output": planner_output,
-            "reviewer_output": reviewer_output
+def mark_partial(result, deadline, stories_kept, review_deferred):
+    """
+    Flags a run that degraded to meet its deadline:
+      - stories_kept:    epics whose stories weren't (re)generated
+      - review_deferred: epics the reviewer didn't see
+    """
+    if stories_kept or review_deferred:
+        result["partial"] = {
+            "deadline_seconds": round(deadline, 2),
+            "stories_kept": stories_kept,
+            "review_deferred": review_deferred,
         }
@@ -1,10 +1,10 @@
 # backend/agents/planner.py
 
-import json
+import asyncio
 from backend.llm.llm_client import LLMClient
-from backend.utils import prompts
+from backend.models.requirements import Plan, parse_plan
+from backend.utils import json_utils, prompts
 import re
-import json
 
 def clean_json_output(raw_text: str) -> str:
     """
@@ -32,7 +32,7 @@ def transform_to_nested_structure(parsed_json: dict) -> dict:
     stories = parsed_json.get("stories", [])
 
     # Map each epic by id
-    epic_map = {e["id"]: e for e in epics}
+    epic_map = {e.get("id"): e for e in epics}
 
     # Add stories list inside each epic
     for epic in epics:
@@ -56,10 +56,16 @@ class PlannerAgent:
         self.llm = LLMClient(model=model)
 
     def generate_requirements(self, transcript: str):
+        """
+        Blocking wrapper around generate_requirements_async().
+        """
+        return asyncio.run(self.generate_requirements_async(transcript))
+
+    async def generate_requirements_async(self, transcript: str) -> Plan:
         """
         Step 1: Build the LLM prompt for the planner agent.
         Step 2: Call Mistral.
-        Step 3: Return the raw JSON (as string).
+        Step 3: Parse, nest and validate into a Plan (epics with stories).
         """
 
         # Build system prompt
@@ -77,8 +83,8 @@ class PlannerAgent:
             schema_key="SCHEMA_JSON"
         )
 
-        # Call Mistral
-        raw_output = self.llm.chat(
+        # Call Mistral (resumed automatically if the answer hits max_tokens)
+        raw_output = await self.llm.chat_continued_async(
             system=system_prompt,
             user=user_prompt,
             temperature=0.0,
@@ -88,12 +94,15 @@ class PlannerAgent:
         cleaned = clean_json_output(raw_output)
 
         try:
-            parsed = json.loads(cleaned)
+            parsed = json_utils.loads(cleaned)
         except Exception as e:
             raise ValueError(f"Planner output is not valid JSON: {e}\nRaw text:\n{raw_output}")
 
         # Transform to nested epics.stories[] structure (Option 2)
         nested = transform_to_nested_structure(parsed)
 
-        return nested
+        try:
+            return parse_plan(nested)
+        except ValueError as e:
+            raise ValueError(f"Planner output does not match the schema: {e}")
     
\ No newline at end of file
@@ -1,8 +1,9 @@
 # backend/agents/reviewer.py
 
-import json
+import asyncio
 from backend.llm.llm_client import LLMClient
-from backend.utils import prompts
+from backend.models.requirements import Review, parse_review, to_dict
+from backend.utils import json_utils, prompts
 
 import re
 
@@ -35,21 +36,27 @@ class ReviewerAgent:
 
     def review_requirements(self, planner_json: dict):
         """
-        Sends planner output to Mistral for review.
-        Returns parsed JSON.
+        Blocking wrapper around review_requirements_async().
+        """
+        return asyncio.run(self.review_requirements_async(planner_json))
+
+    async def review_requirements_async(self, planner_json) -> Review:
+        """
+        Sends planner output (a Plan or plain dict) to Mistral for review.
+        Returns the validated Review.
         """
 
         # System prompt
         system_prompt = prompts.SYSTEM_REVIEWER + "\n\n" + prompts.REVIEWER_FEW_SHOT
 
-        # Convert planner JSON to string
-        planner_json_str = json.dumps(planner_json, indent=2)
+        # Convert planner JSON to string (compact: indentation only costs prompt tokens)
+        planner_json_str = json_utils.dumps(to_dict(planner_json))
 
         # Build user prompt
         user_prompt = prompts.REVIEWER_PROMPT + "\n\nHERE IS THE INPUT:\n" + planner_json_str
 
-        # Call Mistral
-        raw_output = self.llm.chat(
+        # Call Mistral (resumed automatically if the answer hits max_tokens)
+        raw_output = await self.llm.chat_continued_async(
             system=system_prompt,
             user=user_prompt,
             temperature=0.0,
@@ -65,10 +72,15 @@ class ReviewerAgent:
         json_block = extract_json_block(cleaned)
 
         try:
-            parsed = json.loads(json_block)
+            parsed = json_utils.loads(json_block)
         except Exception as e:
             raise ValueError(f"Reviewer JSON parse failed: {e}\nRAW JSON BLOCK:\n{json_block}")
 
+        try:
+            review = parse_review(parsed)
+        except ValueError as e:
+            raise ValueError(f"Reviewer output does not match the schema: {e}")
+
         
         # Parse JSON
         #try:
@@ -76,4 +88,4 @@ class ReviewerAgent:
         #except Exception as e:
         #    raise ValueError(f"Reviewer output not valid JSON: {e}\nRAW:\n{raw_output}")
 
-        return parsed
+        return review
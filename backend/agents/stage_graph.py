@@ -0,0 +1,95 @@
+# backend/agents/stage_graph.py
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+
+class StageGraph:
+    """
+    Small dependency-graph executor for pipeline stages.
+
+    Every node is an async function that starts as soon as all of its
+    dependencies have finished, and receives their results as positional
+    arguments. Nodes have a kind ("stories", "review", ...) and at most
+    limits[kind] nodes of a kind run at once. Nodes may add more nodes
+    while the graph runs (e.g. one chain per epic once the planner has
+    answered), so each epic flows through the stages independently and
+    the run takes about as long as its critical path.
+
+    The first failing node cancels every other node and run() re-raises
+    its exception. Results are read back by node name, so callers
+    assemble them in whatever order they need.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = limits or {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # name -> {"kind", "started", "finished"} (seconds since the graph was created)
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._created = time.monotonic()
+
+    def add(self, name: str, kind: str, fn: Callable[..., Awaitable[Any]], deps: Iterable[str] = ()) -> str:
+        """Schedules node name = fn(*results of deps); returns the name."""
+        if name in self._tasks:
+            raise ValueError(f"Duplicate stage node: {name}")
+        deps = list(deps)
+        missing = [d for d in deps if d not in self._tasks]
+        if missing:
+            raise ValueError(f"Stage node {name} depends on unknown node(s): {', '.join(missing)}")
+
+        dep_tasks = [self._tasks[d] for d in deps]
+        self._tasks[name] = asyncio.get_running_loop().create_task(self._run_node(name, kind, fn, dep_tasks))
+        return name
+
+    def _semaphore(self, kind: str) -> Optional[asyncio.Semaphore]:
+        if kind not in self.limits:
+            return None
+        if kind not in self._semaphores:
+            self._semaphores[kind] = asyncio.Semaphore(max(1, self.limits[kind]))
+        return self._semaphores[kind]
+
+    async def _run_node(self, name: str, kind: str, fn, dep_tasks):
+        if dep_tasks:
+            # wait() rather than await: cancelling this node must not cancel its dependencies
+            await asyncio.wait(dep_tasks)
+        inputs = [t.result() for t in dep_tasks]
+
+        semaphore = self._semaphore(kind)
+        if semaphore is None:
+            return await self._timed(name, kind, fn, inputs)
+        async with semaphore:
+            return await self._timed(name, kind, fn, inputs)
+
+    async def _timed(self, name, kind, fn, inputs):
+        timing = self.timings[name] = {"kind": kind, "started": round(time.monotonic() - self._created, 4)}
+        try:
+            return await fn(*inputs)
+        finally:
+            timing["finished"] = round(time.monotonic() - self._created, 4)
+
+    def result(self, name: str) -> Any:
+        return self._tasks[name].result()
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Waits for every node, including ones added meanwhile, and returns
+        {name: result}.
+        """
+        try:
+            while True:
+                pending = [t for t in self._tasks.values() if not t.done()]
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if not task.cancelled() and task.exception() is not None:
+                        raise task.exception()
+        finally:
+            leftover = [t for t in self._tasks.values() if not t.done()]
+            for task in leftover:
+                task.cancel()
+            if leftover:
+                await asyncio.wait(leftover)
+        return {name: task.result() for name, task in self._tasks.items()}
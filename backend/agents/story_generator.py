@@ -1,8 +1,41 @@
 # backend/agents/story_generator.py
 
-import json
+import asyncio
 import re
-from backend.llm.llm_client import LLMClient
+from typing import Dict, List
+from backend import config
+from backend.llm.llm_client import FINISH_LENGTH, LLMClient
+from backend.models.requirements import Epic, Story, parse_stories
+from backend.utils import json_utils
+
+# Batching mode packs several epics into one request (the system prompt and
+# story template are then sent once per batch instead of once per epic).
+# Output budget of one batched request, and share of it planned for use
+# (headroom for epics that get more stories than average)
+BATCH_MAX_TOKENS = int(config.get("STORY_BATCH_MAX_TOKENS", 6000))
+BATCH_HEADROOM = 0.8
+# Epic text allowed per batch, and hard cap on epics per batch
+BATCH_INPUT_TOKENS = int(config.get("STORY_BATCH_INPUT_TOKENS", 2000))
+MAX_BATCH_EPICS = int(config.get("STORY_BATCH_MAX_EPICS", 8))
+# Starting guess of output tokens per epic (3-6 stories), refined as batches complete
+INITIAL_TOKENS_PER_EPIC = 900
+
+SYSTEM_PROMPT = """
+        You are a senior Agile Business Analyst. 
+        You write high-quality user stories with acceptance criteria.
+        Follow INVEST and best product practices.
+        """
+
+STORY_FORMAT = """{
+  "id": "string",
+  "title": "string",
+  "description": "string",
+  "acceptance_criteria": [
+     "string", "string", "string"
+  ],
+  "priority": "High | Medium | Low",
+  "dependencies": []
+}"""
 
 def clean_json_output(raw_text: str) -> str:
     cleaned = re.sub(r"```json", "", raw_text, flags=re.IGNORECASE)
@@ -10,20 +43,27 @@ def clean_json_output(raw_text: str) -> str:
     return cleaned.strip()
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
 class StoryGeneratorAgent:
 
     def __init__(self, model="mistral-small-latest"):
         self.llm = LLMClient(model=model)
+        # learned from completed batches, drives plan_batches()
+        self.tokens_per_epic = float(INITIAL_TOKENS_PER_EPIC)
 
     def generate_stories_for_epic(self, epic_title: str, epic_description: str):
         """
-        Generates 3–6 stories for a given epic.
+        Blocking wrapper around generate_stories_for_epic_async().
         """
+        return asyncio.run(self.generate_stories_for_epic_async(epic_title, epic_description))
 
-        system_prompt = """
-        You are a senior Agile Business Analyst. 
-        You write high-quality user stories with acceptance criteria.
-        Follow INVEST and best product practices.
+    async def generate_stories_for_epic_async(self, epic_title: str, epic_description: str) -> List[Story]:
+        """
+        Generates 3–6 validated stories for a given epic.
         """
 
         user_prompt = f"""
@@ -34,26 +74,13 @@ EPIC DESCRIPTION: {epic_description}
 
 Each story MUST follow this JSON format:
 
-{{
-  "id": "string",
-  "title": "string",
-  "description": "string",
-  "acceptance_criteria": [
-     "string", "string", "string"
-  ],
-  "priority": "High | Medium | Low",
-  "dependencies": [],
-  "source_span": {{
-     "start_char": 0,
-     "end_char": 0
-  }}
-}}
+{STORY_FORMAT}
 
 Return ONLY JSON list: [ {{story1}}, {{story2}}, ... ]
 """
 
-        raw_output = self.llm.chat(
-            system=system_prompt,
+        raw_output = await self.llm.chat_continued_async(
+            system=SYSTEM_PROMPT,
             user=user_prompt,
             temperature=0.2,
             max_tokens=3000
@@ -62,8 +89,109 @@ Return ONLY JSON list: [ {{story1}}, {{story2}}, ... ]
         cleaned = clean_json_output(raw_output)
 
         try:
-            parsed = json.loads(cleaned)
+            parsed = json_utils.loads(cleaned)
         except Exception as e:
             raise ValueError(f"StoryGenerator invalid JSON: {e}\nRAW:\n{raw_output}")
 
-        return parsed
+        try:
+            return parse_stories(parsed)
+        except ValueError as e:
+            raise ValueError(f"StoryGenerator output does not match the schema: {e}")
+
+    def plan_batches(self, epics: List[Epic]) -> List[List[Epic]]:
+        """
+        Greedily packs epics (in order) into batches whose expected output
+        fits BATCH_MAX_TOKENS (with headroom) and whose epic text fits
+        BATCH_INPUT_TOKENS. Epics sharing an id never share a batch, since
+        batched output is keyed by epic id.
+        """
+        max_epics = int(BATCH_MAX_TOKENS * BATCH_HEADROOM // self.tokens_per_epic)
+        max_epics = max(1, min(MAX_BATCH_EPICS, max_epics))
+
+        batches, current, ids, input_tokens = [], [], set(), 0
+        for epic in epics:
+            cost = estimate_tokens(epic.title + epic.description)
+            if current and (len(current) >= max_epics or input_tokens + cost > BATCH_INPUT_TOKENS or epic.id in ids):
+                batches.append(current)
+                current, ids, input_tokens = [], set(), 0
+            current.append(epic)
+            ids.add(epic.id)
+            input_tokens += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def generate_stories_for_epics(self, epics: List[Epic]) -> Dict[str, List[Story]]:
+        """
+        Blocking wrapper around generate_stories_for_epics_async().
+        """
+        return asyncio.run(self.generate_stories_for_epics_async(epics))
+
+    async def generate_stories_for_epics_async(self, epics: List[Epic]) -> Dict[str, List[Story]]:
+        """
+        Generates stories for a batch of epics (see plan_batches) in one
+        request and returns {epic id: stories}. A batch whose output hits
+        max_tokens or can't be parsed is split in half and retried; epics
+        the model skipped are generated on their own.
+        """
+        if len(epics) == 1:
+            epic = epics[0]
+            return {epic.id: await self.generate_stories_for_epic_async(epic.title, epic.description)}
+
+        epic_list = json_utils.dumps([
+            {"epic_id": e.id, "title": e.title, "description": e.description} for e in epics
+        ])
+        user_prompt = f"""
+Generate between 3 to 6 detailed user stories for EACH of these EPICS:
+
+{epic_list}
+
+Each story MUST follow this JSON format:
+
+{STORY_FORMAT}
+
+Return ONLY a JSON object mapping every epic_id to its list of stories:
+{{"<epic_id>": [ {{story1}}, {{story2}}, ... ], ...}}
+"""
+
+        raw_output, finish_reason = await self.llm.complete_async(
+            system=SYSTEM_PROMPT,
+            user=user_prompt,
+            temperature=0.2,
+            max_tokens=BATCH_MAX_TOKENS
+        )
+
+        if finish_reason == FINISH_LENGTH:
+            # more output than one request allows: every epic gets at least this much
+            self.tokens_per_epic = max(self.tokens_per_epic, 1.1 * BATCH_MAX_TOKENS / len(epics))
+            print(f"StoryGenerator batch of {len(epics)} epics truncated; splitting")
+            return await self._split(epics)
+
+        try:
+            parsed = json_utils.loads(clean_json_output(raw_output))
+            if not isinstance(parsed, dict):
+                raise ValueError("expected an object keyed by epic_id")
+            result = {
+                epic.id: parse_stories(parsed[epic.id])
+                for epic in epics if isinstance(parsed.get(epic.id), (list, dict))
+            }
+            if not result:
+                raise ValueError("no epic_id of the batch in the output")
+        except ValueError as e:
+            print(f"StoryGenerator batch of {len(epics)} epics unusable ({e}); splitting")
+            return await self._split(epics)
+
+        self.tokens_per_epic = 0.7 * self.tokens_per_epic + 0.3 * estimate_tokens(raw_output) / len(epics)
+
+        missing = [epic for epic in epics if epic.id not in result]
+        if missing:
+            result.update(await self.generate_stories_for_epics_async(missing))
+        return result
+
+    async def _split(self, epics: List[Epic]) -> Dict[str, List[Story]]:
+        middle = len(epics) // 2
+        first, second = await asyncio.gather(
+            self.generate_stories_for_epics_async(epics[:middle]),
+            self.generate_stories_for_epics_async(epics[middle:]),
+        )
+        return {**first, **second}
@@ -0,0 +1,76 @@
+# backend/config.py
+# Lightweight configuration for the backend, independent of Streamlit.
+#
+# Lookup order for every setting:
+#   1. environment variable (also filled from .env by python-dotenv)
+#   2. TOML file at $APP_CONFIG_FILE, if set
+#   3. .streamlit/secrets.toml (cwd, then repo root), so existing
+#      Streamlit deployments keep working without changes
+#
+# Only the stdlib is imported here, so reading config costs nothing at boot.
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_file_settings: Optional[Dict[str, Any]] = None
+_lock = threading.Lock()
+
+
+def _candidate_files():
+    explicit = os.getenv("APP_CONFIG_FILE")
+    if explicit:
+        yield explicit
+    yield os.path.join(os.getcwd(), ".streamlit", "secrets.toml")
+    yield os.path.join(ROOT_DIR, ".streamlit", "secrets.toml")
+
+
+def _load_files() -> Dict[str, Any]:
+    """Reads the config files once; earlier files win."""
+    global _file_settings
+    with _lock:
+        if _file_settings is not None:
+            return _file_settings
+        merged: Dict[str, Any] = {}
+        if tomllib is not None:
+            for path in _candidate_files():
+                if not os.path.isfile(path):
+                    continue
+                with open(path, "rb") as f:
+                    for key, value in tomllib.load(f).items():
+                        merged.setdefault(key, value)
+        _file_settings = merged
+        return merged
+
+
+def get(name: str, default: Any = None) -> Any:
+    """Returns a setting from env, then config files, else default."""
+    value = os.getenv(name)
+    if value not in (None, ""):
+        return value
+    value = _load_files().get(name)
+    if value not in (None, ""):
+        return value
+    return default
+
+
+def require(name: str, hint: str = "") -> Any:
+    """Like get(), but raises ValueError when the setting is missing."""
+    value = get(name)
+    if value in (None, ""):
+        raise ValueError(f"{name} not found. Set it in the environment, .env or secrets.toml. {hint}".strip())
+    return value
+
+
+def reload():
+    """Forgets cached file settings (for tests / config changes)."""
+    global _file_settings
+    with _lock:
+        _file_settings = None
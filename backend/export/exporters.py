@@ -0,0 +1,120 @@
+# backend/export/exporters.py
+# Streaming exports of stored runs. Every writer consumes epics one at a
+# time (HistoryStore.iter_epics) and yields bytes as it goes, so memory
+# stays flat no matter how many runs/stories are exported.
+#
+#  - csv / xlsx: one row per story, with its epic's fields repeated
+#  - jsonl:      one line per epic, stories nested (lossless)
+
+import csv
+import io
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from backend.utils import json_utils
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+COLUMNS = [
+    "run_id", "epic_id", "epic_title", "epic_description", "epic_priority", "epic_labels",
+    "story_id", "story_title", "story_description", "acceptance_criteria",
+    "story_priority", "story_labels", "dependencies", "source_start_char", "source_end_char",
+]
+
+# Flush CSV output to the client in chunks of roughly this size
+CHUNK_BYTES = 64 * 1024
+
+
+def _join(values) -> str:
+    if not values:
+        return ""
+    if isinstance(values, str):
+        return values
+    return "\n".join(str(v) for v in values)
+
+
+def story_rows(run_id: str, epic: Dict[str, Any]) -> Iterator[List[Any]]:
+    """Flat rows for one epic: one per story, or a single epic-only row."""
+    head = [
+        run_id, epic.get("id"), epic.get("title"), epic.get("description"),
+        epic.get("priority"), _join(epic.get("labels")),
+    ]
+    stories = epic.get("stories") or []
+    if not stories:
+        yield head + [None] * (len(COLUMNS) - len(head))
+        return
+    for story in stories:
+        span = story.get("source_span") or {}
+        yield head + [
+            story.get("id"), story.get("title"), story.get("description"),
+            _join(story.get("acceptance_criteria")), story.get("priority"),
+            _join(story.get("labels")), _join(story.get("dependencies")),
+            span.get("start_char"), span.get("end_char"),
+        ]
+
+
+def iter_csv(epics: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for run_id, epic in epics:
+        for row in story_rows(run_id, epic):
+            writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_jsonl(epics: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[bytes]:
+    for run_id, epic in epics:
+        yield json_utils.dumps_bytes(dict(epic, run_id=run_id)) + b"\n"
+
+
+def iter_xlsx(epics: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[bytes]:
+    """
+    openpyxl write-only mode streams rows to a temp file instead of
+    building the sheet in memory. An xlsx is a zip whose directory comes
+    last, so the bytes are sent once the workbook is closed, read back in
+    chunks.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Requirements")
+    sheet.append(COLUMNS)
+    for run_id, epic in epics:
+        for row in story_rows(run_id, epic):
+            sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+WRITERS = {"csv": iter_csv, "jsonl": iter_jsonl, "xlsx": iter_xlsx}
+
+
+def export_stream(history, run_ids: List[str], fmt: str) -> Iterator[bytes]:
+    """Bytes of the export of run_ids (in order) in the given format."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}. Use one of {', '.join(WRITERS)}")
+    epics = ((run_id, epic) for run_id in run_ids for epic in history.iter_epics(run_id))
+    return WRITERS[fmt](epics)
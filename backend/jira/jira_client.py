@@ -1,56 +1,111 @@
 # backend/jira/jira_client.py
 
-import os
-import requests
-from typing import Dict, Any, List
-import streamlit as st
-
-JIRA_SITE = st.secrets["JIRA_SITE_URL"]
-JIRA_EMAIL = st.secrets["JIRA_EMAIL"]
-JIRA_API_TOKEN = st.secrets["JIRA_API_TOKEN"]
-JIRA_PROJECT_KEY = st.secrets["JIRA_PROJECT_KEY"]
-JIRA_PROJECT_ID = st.secrets["JIRA_PROJECT_ID"]
-
-if not (JIRA_SITE and JIRA_EMAIL and JIRA_API_TOKEN and JIRA_PROJECT_KEY):
-    # we'll not raise here; caller should handle missing config
-    pass
-
-AUTH = (JIRA_EMAIL, JIRA_API_TOKEN)
+import asyncio
+import hashlib
+import re
+from typing import Dict, Any, List, Optional
+from backend import config
+from backend.utils import resilience
+
+# requests / httpx are imported on first use so importing this module
+# (and the API that depends on it) stays cheap.
+
 HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
 
+# Retries/breaker shared by every JiraClient in the process. Creating an
+# issue is not idempotent, so it's only retried when Jira provably
+# rejected the request (429/503, connection refused).
+_discover_endpoint = resilience.endpoint("jira.discover_fields", "jira", max_attempts=4, deadline=30.0)
+_search_endpoint = resilience.endpoint("jira.search", "jira", max_attempts=4, deadline=30.0)
+_create_endpoint = resilience.endpoint("jira.create_issue", "jira", max_attempts=5, deadline=60.0, idempotent=False)
+
+
+def _raise_for_status(r):
+    """Prints Jira's error body (requests or httpx response) before raising."""
+    try:
+        r.raise_for_status()
+    except Exception as e:
+        print("\n❌ JIRA ERROR DETAILS:")
+        print("Status:", r.status_code)
+        try:
+            print(r.json())
+        except:
+            print("Raw response:", r.text)
+        raise e
+
 
 class JiraClient:
-    def __init__(self):
-        if not (JIRA_SITE and JIRA_EMAIL and JIRA_API_TOKEN and JIRA_PROJECT_KEY):
+    """
+    Jira Cloud REST client. Blocking methods use requests; the *_async
+    variants use a pooled httpx.AsyncClient so the API server can await
+    Jira without tying up a thread. Call aclose() when done with async use.
+    """
+
+    def __init__(self, discover: bool = True):
+        site = config.get("JIRA_SITE_URL")
+        email = config.get("JIRA_EMAIL")
+        api_token = config.get("JIRA_API_TOKEN")
+        self.project_key = config.get("JIRA_PROJECT_KEY")
+        self.project_id = config.get("JIRA_PROJECT_ID")
+        if not (site and email and api_token and self.project_key):
             raise ValueError("JIRA credentials missing. Please set JIRA_SITE_URL, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY in .env")
-        self.base = JIRA_SITE.rstrip("/")
-        self.auth = AUTH
+        self.base = site.rstrip("/")
+        self.auth = (email, api_token)
+        self._async_client = None
 
         # cache discovered field ids
         self.epic_name_field = None
         self.epic_link_field = None
-        # call discovery now
-        try:
-            self.discover_fields()
-        except Exception:
-            # don't crash on init; allow caller to attempt discovery later
-            pass
+        # call discovery now (async callers pass discover=False and
+        # await discover_fields_async() instead of blocking the loop)
+        if discover:
+            try:
+                self.discover_fields()
+            except Exception:
+                # don't crash on init; allow caller to attempt discovery later
+                pass
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(
+                auth=self.auth,
+                headers=HEADERS,
+                timeout=30,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """Closes the async connection pool."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
     def discover_fields(self):
         """Discover custom field ids for 'Epic Name' and 'Epic Link' in this Jira instance."""
+        import requests
         url = f"{self.base}/rest/api/3/field"
-        r = requests.get(url, auth=self.auth, headers=HEADERS, timeout=30)
-        try:
-            r.raise_for_status()
-        except Exception as e:
-            print("\n❌ JIRA ERROR DETAILS:")
-            print("Status:", r.status_code)
-            try:
-                print(r.json())
-            except:
-                print("Raw response:", r.text)
-            raise e
-        fields = r.json()
+
+        def get():
+            r = requests.get(url, auth=self.auth, headers=HEADERS, timeout=30)
+            _raise_for_status(r)
+            return r.json()
+
+        return self._apply_fields(_discover_endpoint.call(get))
+
+    async def discover_fields_async(self):
+        """Async variant of discover_fields()."""
+        url = f"{self.base}/rest/api/3/field"
+
+        async def get():
+            r = await self._get_async_client().get(url)
+            _raise_for_status(r)
+            return r.json()
+
+        return self._apply_fields(await _discover_endpoint.call_async(get))
+
+    def _apply_fields(self, fields: List[Dict[str, Any]]):
         for f in fields:
             name = f.get("name", "").lower()
             # common names
@@ -77,20 +132,27 @@ class JiraClient:
 
     def create_issue(self, fields: Dict[str, Any]) -> Dict[str, Any]:
         """Create a Jira issue and return the JSON response."""
+        import requests
         url = f"{self.base}/rest/api/3/issue"
         payload = {"fields": fields}
-        r = requests.post(url, auth=self.auth, headers=HEADERS, json=payload, timeout=30)
-        try:
-            r.raise_for_status()
-        except Exception as e:
-            print("\n❌ JIRA ERROR DETAILS:")
-            print("Status:", r.status_code)
-            try:
-                print(r.json())
-            except:
-                print("Raw response:", r.text)
-            raise e
-        return r.json()
+
+        def post():
+            r = requests.post(url, auth=self.auth, headers=HEADERS, json=payload, timeout=30)
+            _raise_for_status(r)
+            return r.json()
+
+        return _create_endpoint.call(post)
+
+    async def create_issue_async(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of create_issue()."""
+        url = f"{self.base}/rest/api/3/issue"
+
+        async def post():
+            r = await self._get_async_client().post(url, json={"fields": fields})
+            _raise_for_status(r)
+            return r.json()
+
+        return await _create_endpoint.call_async(post)
 
     def _to_adf(self, text: str):
         """
@@ -115,8 +177,15 @@ class JiraClient:
         """
         Creates an Epic in a Team-Managed project.
         """
+        return self.create_issue(self._epic_fields(epic))
+
+    async def create_epic_async(self, epic: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of create_epic()."""
+        return await self.create_issue_async(self._epic_fields(epic))
+
+    def _epic_fields(self, epic: Dict[str, Any]) -> Dict[str, Any]:
         fields = {
-            "project": {"id": JIRA_PROJECT_ID},
+            "project": {"id": self.project_id},
             "summary": epic.get("title") or epic.get("id"),
             "description": self._to_adf(epic.get("description")),
             "issuetype": {"name": "Epic"},
@@ -125,14 +194,21 @@ class JiraClient:
         if epic.get("labels"):
             fields["labels"] = epic.get("labels")
 
-        return self.create_issue(fields)
+        return fields
 
     def create_story(self, story: Dict[str, Any], epic_jira_key: str) -> Dict[str, Any]:
         """
         Creates a story and links it to a Team-Managed Epic using parent field.
         """
+        return self.create_issue(self._story_fields(story, epic_jira_key))
+
+    async def create_story_async(self, story: Dict[str, Any], epic_jira_key: str) -> Dict[str, Any]:
+        """Async variant of create_story()."""
+        return await self.create_issue_async(self._story_fields(story, epic_jira_key))
+
+    def _story_fields(self, story: Dict[str, Any], epic_jira_key: str) -> Dict[str, Any]:
         fields = {
-            "project": {"id": JIRA_PROJECT_ID},
+            "project": {"id": self.project_id},
             "summary": story.get("title") or story.get("id"),
             "description": self._to_adf(self._build_story_description(story)),
             "issuetype": {"name": "Story"},
@@ -143,8 +219,7 @@ class JiraClient:
         if story.get("labels"):
             fields["labels"] = story.get("labels")
 
-        created = self.create_issue(fields)
-        return created
+        return fields
 
 
     def _build_story_description(self, story: Dict[str, Any]) -> str:
@@ -163,27 +238,279 @@ class JiraClient:
                 desc += f"- {d}\n"
         return desc
 
-    def sync_approved_payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def browse_url(self, key: Optional[str]) -> Optional[str]:
+        return f"{self.base}/browse/{key}" if key else None
+
+    def find_existing(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Looks up issues already in the project for the payload's items, by
+        their requirement label, in batched JQL searches. Returns
+        {requirement label: issue key}.
+        """
+        import requests
+        url = f"{self.base}/rest/api/3/search/jql"
+        existing: Dict[str, str] = {}
+        for jql in self._reconcile_queries(payload):
+            body = {"jql": jql, "fields": ["labels"], "maxResults": SEARCH_PAGE_SIZE}
+            while True:
+                def post():
+                    r = requests.post(url, auth=self.auth, headers=HEADERS, json=body, timeout=30)
+                    _raise_for_status(r)
+                    return r.json()
+
+                page = _search_endpoint.call(post)
+                _index_issues(page.get("issues", []), existing)
+                if page.get("isLast", True) or not page.get("nextPageToken"):
+                    break
+                body["nextPageToken"] = page["nextPageToken"]
+        return existing
+
+    async def find_existing_async(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        """Async variant of find_existing(); batches are searched concurrently."""
+        url = f"{self.base}/rest/api/3/search/jql"
+
+        async def search(jql):
+            found: Dict[str, str] = {}
+            body = {"jql": jql, "fields": ["labels"], "maxResults": SEARCH_PAGE_SIZE}
+            while True:
+                async def post():
+                    r = await self._get_async_client().post(url, json=body)
+                    _raise_for_status(r)
+                    return r.json()
+
+                page = await _search_endpoint.call_async(post)
+                _index_issues(page.get("issues", []), found)
+                if page.get("isLast", True) or not page.get("nextPageToken"):
+                    return found
+                body["nextPageToken"] = page["nextPageToken"]
+
+        existing: Dict[str, str] = {}
+        for found in await asyncio.gather(*(search(jql) for jql in self._reconcile_queries(payload))):
+            existing.update(found)
+        return existing
+
+    def _reconcile_queries(self, payload: Dict[str, Any]) -> List[str]:
+        labels = sorted({label for _, label in requirement_labels(payload)})
+        return [
+            f'project = "{self.project_key}" AND labels in ({", ".join(labels[i:i + LABELS_PER_QUERY])})'
+            for i in range(0, len(labels), LABELS_PER_QUERY)
+        ]
+
+    def sync_approved_payload(self, payload: Dict[str, Any], progress=None, previous=None) -> Dict[str, Any]:
         """
         payload: {
            "epics": [ {id,title,description,priority,labels,stories:[{...}]} ],
            "context": {...}
         }
-        Create epics first, then create stories under them. Returns mapping.
+        Reconciles against issues already in Jira (one batched label
+        search), then creates the missing epics and their stories.
+        Returns the per-item report (see SyncReport). A failing item
+        doesn't stop the sync; pass the report back as previous to retry
+        only what failed.
         """
-        result = {"epics": []}
+        report = SyncReport(self, payload, progress, previous)
+        try:
+            report.existing = self.find_existing(payload)
+        except Exception as e:
+            print(f"Jira reconciliation search failed, creating without it: {e}")
         for epic in payload.get("epics", []):
-            created_epic = self.create_epic(epic)
-            epic_key = created_epic.get("key")  # like REQR-123
-            epic_result = {"requested_epic_id": epic.get("id"), "jira_key": epic_key, "stories": []}
-
-            # create stories that were approved (epic already includes only approved stories)
-            for s in epic.get("stories", []):
-                created_story = self.create_story(s, epic_key)
-                epic_result["stories"].append({
-                    "requested_story_id": s.get("id"),
-                    "jira_key": created_story.get("key")
-                })
-
-            result["epics"].append(epic_result)
-        return result
+            epic_entry = report.epic(epic, self.create_epic)
+            epic_entry["stories"] = [report.story(epic_entry, s, self.create_story) for s in epic.get("stories", [])]
+        return report.result()
+
+    async def sync_approved_payload_async(self, payload: Dict[str, Any], progress=None, previous=None) -> Dict[str, Any]:
+        """
+        Async variant of sync_approved_payload(). Stories of an epic are
+        created concurrently once the epic exists; result order matches
+        the payload.
+        """
+        report = SyncReport(self, payload, progress, previous)
+        try:
+            report.existing = await self.find_existing_async(payload)
+        except Exception as e:
+            print(f"Jira reconciliation search failed, creating without it: {e}")
+        for epic in payload.get("epics", []):
+            epic_entry = await report.epic_async(epic, self.create_epic_async)
+            epic_entry["stories"] = list(await asyncio.gather(
+                *(report.story_async(epic_entry, s, self.create_story_async) for s in epic.get("stories", []))
+            ))
+        return report.result()
+
+
+# Every synced issue carries a label derived from its normalized summary
+# (stories: plus their epic's), so a re-approval can find it again with a
+# cheap JQL "labels in (...)" search instead of creating a duplicate.
+REQUIREMENT_LABEL_PREFIX = "req-"
+LABELS_PER_QUERY = 50
+SEARCH_PAGE_SIZE = 100
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+def requirement_label(kind: str, *summaries: Optional[str]) -> str:
+    digest = hashlib.sha1("|".join([kind] + [_normalize(x) for x in summaries]).encode("utf-8")).hexdigest()
+    return f"{REQUIREMENT_LABEL_PREFIX}{kind}-{digest[:16]}"
+
+
+def _epic_summary(epic: Dict[str, Any]) -> str:
+    return epic.get("title") or epic.get("id")
+
+
+def _story_summary(story: Dict[str, Any]) -> str:
+    return story.get("title") or story.get("id")
+
+
+def requirement_labels(payload: Dict[str, Any]):
+    """Yields (item, label) for every epic and story in the payload."""
+    for epic in payload.get("epics", []):
+        yield epic, requirement_label("epic", _epic_summary(epic))
+        for story in epic.get("stories", []):
+            yield story, requirement_label("story", _epic_summary(epic), _story_summary(story))
+
+
+def _index_issues(issues: List[Dict[str, Any]], existing: Dict[str, str]):
+    for issue in issues:
+        for label in (issue.get("fields") or {}).get("labels") or []:
+            if label.startswith(REQUIREMENT_LABEL_PREFIX):
+                existing.setdefault(label, issue.get("key"))
+
+
+CREATED = "created"
+REUSED = "reused"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+# Statuses meaning the item exists in Jira
+DONE_STATUSES = (CREATED, REUSED)
+
+
+def remaining_items(report: Optional[Dict[str, Any]]) -> int:
+    """How many items of a sync report still need a (re)try."""
+    if not report:
+        return 0
+    counts = report["counts"]
+    return counts[FAILED] + counts[SKIPPED]
+
+
+class SyncReport:
+    """
+    Per-item bookkeeping for one sync: every epic/story ends up created,
+    reused (already in Jira), failed (with the error) or skipped (its epic
+    could not be created). Items done in a previous report are carried
+    over with their Jira key instead of being created again.
+
+    result() = {
+        "epics": [{requested_epic_id, jira_key, jira_url, status, error,
+                   stories: [{requested_story_id, jira_key, jira_url, status, error}]}],
+        "counts": {"created", "reused", "failed", "skipped", "total"}
+    }
+    """
+
+    def __init__(self, jira: "JiraClient", payload: Dict[str, Any], progress=None, previous=None):
+        self.jira = jira
+        self.progress = progress or (lambda stage, done=0, total=0, **detail: None)
+        self.epics: List[Dict[str, Any]] = []
+        self.counts = {CREATED: 0, REUSED: 0, FAILED: 0, SKIPPED: 0}
+        self.done = 0
+        self.total = sum(1 + len(e.get("stories", [])) for e in payload.get("epics", []))
+
+        # requirement label -> key of issues found in Jira (see find_existing)
+        self.existing: Dict[str, str] = {}
+        self.labels = {id(item): label for item, label in requirement_labels(payload)}
+
+        # (epic_id, story_id or None) -> (jira key, status) of items done before
+        self.previous_keys: Dict[tuple, tuple] = {}
+        for e in (previous or {}).get("epics", []):
+            if e.get("status") in DONE_STATUSES:
+                self.previous_keys[(e.get("requested_epic_id"), None)] = (e.get("jira_key"), e["status"])
+            for st in e.get("stories", []):
+                if st.get("status") in DONE_STATUSES:
+                    self.previous_keys[(e.get("requested_epic_id"), st.get("requested_story_id"))] = (st.get("jira_key"), st["status"])
+
+        self.progress("syncing", 0, self.total, counts=dict(self.counts))
+
+    def _entry(self, id_field: str, item_id, key=None, error=None, status=None) -> Dict[str, Any]:
+        return {
+            id_field: item_id,
+            "jira_key": key,
+            "jira_url": self.jira.browse_url(key),
+            "status": status or (CREATED if key else FAILED),
+            "error": error if key or error else "Jira returned no issue key",
+        }
+
+    def _record(self, entry: Dict[str, Any]):
+        self.counts[entry["status"]] += 1
+        self.done += 1
+        self.progress("syncing", self.done, self.total, counts=dict(self.counts))
+
+    def _epic_entry(self, epic, key=None, error=None, status=None):
+        entry = self._entry("requested_epic_id", epic.get("id"), key, error, status)
+        entry["stories"] = []
+        self.epics.append(entry)
+        self._record(entry)
+        return entry
+
+    def _story_entry(self, story, key=None, error=None, status=None):
+        entry = self._entry("requested_story_id", story.get("id"), key, error, status)
+        self._record(entry)
+        return entry
+
+    def _known(self, item, epic_id, story_id=None) -> Optional[tuple]:
+        """(key, status) if the item exists already: from the previous report or Jira."""
+        if (epic_id, story_id) in self.previous_keys:
+            return self.previous_keys[(epic_id, story_id)]
+        key = self.existing.get(self.labels.get(id(item)))
+        return (key, REUSED) if key else None
+
+    def _labelled(self, item):
+        """Copy of the item with its requirement label added (the payload stays untouched)."""
+        label = self.labels.get(id(item))
+        return dict(item, labels=list(item.get("labels") or []) + [label]) if label else item
+
+    def epic(self, epic, create):
+        known = self._known(epic, epic.get("id"))
+        if known:
+            return self._epic_entry(epic, known[0], status=known[1])
+        try:
+            return self._epic_entry(epic, create(self._labelled(epic)).get("key"))
+        except Exception as e:
+            return self._epic_entry(epic, error=str(e))
+
+    async def epic_async(self, epic, create):
+        known = self._known(epic, epic.get("id"))
+        if known:
+            return self._epic_entry(epic, known[0], status=known[1])
+        try:
+            return self._epic_entry(epic, (await create(self._labelled(epic))).get("key"))
+        except Exception as e:
+            return self._epic_entry(epic, error=str(e))
+
+    def _skipped(self, story):
+        return self._story_entry(story, error="Epic was not created", status=SKIPPED)
+
+    def story(self, epic_entry, story, create):
+        if epic_entry["status"] not in DONE_STATUSES:
+            return self._skipped(story)
+        known = self._known(story, epic_entry["requested_epic_id"], story.get("id"))
+        if known:
+            return self._story_entry(story, known[0], status=known[1])
+        try:
+            return self._story_entry(story, create(self._labelled(story), epic_entry["jira_key"]).get("key"))
+        except Exception as e:
+            return self._story_entry(story, error=str(e))
+
+    async def story_async(self, epic_entry, story, create):
+        if epic_entry["status"] not in DONE_STATUSES:
+            return self._skipped(story)
+        known = self._known(story, epic_entry["requested_epic_id"], story.get("id"))
+        if known:
+            return self._story_entry(story, known[0], status=known[1])
+        try:
+            return self._story_entry(story, (await create(self._labelled(story), epic_entry["jira_key"])).get("key"))
+        except Exception as e:
+            return self._story_entry(story, error=str(e))
+
+    def result(self) -> Dict[str, Any]:
+        return {"epics": self.epics, "counts": dict(self.counts, total=self.total)}
@@ -0,0 +1,195 @@
+# backend/jobs/admission.py
+# Admission control for pipeline runs (/api/process and /api/process/jobs).
+#
+# A pipeline run holds an LLM rate-limit budget for minutes, so instead of
+# accepting every request and letting all runs slow down together:
+#  - at most max_running runs execute at once, the rest wait in a queue
+#  - the queue is bounded; when it's full new runs are rejected right away
+#    (503 + Retry-After) rather than queued behind work that can't finish
+#  - each client may have at most max_per_client runs queued or running (429)
+#  - "interactive" runs (the UI) are started before "batch" runs, and batch
+#    may only fill part of the queue so there is always room for users
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from backend import config
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Lower rank starts first
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+MAX_RUNNING = int(config.get("ADMISSION_MAX_RUNNING", 8))
+MAX_QUEUE = int(config.get("ADMISSION_MAX_QUEUE", 32))
+MAX_PER_CLIENT = int(config.get("ADMISSION_MAX_PER_CLIENT", 4))
+# Share of the queue batch runs may occupy
+BATCH_QUEUE_SHARE = float(config.get("ADMISSION_BATCH_QUEUE_SHARE", 0.5))
+# Seconds a synchronous /api/process call may wait for a slot
+QUEUE_TIMEOUT = float(config.get("ADMISSION_QUEUE_TIMEOUT", 120))
+
+# Run duration assumed before any run finished (seconds), for Retry-After
+INITIAL_RUN_SECONDS = 30.0
+MAX_RETRY_AFTER = 300
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing a run; status_code is 503 or 429."""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    An admitted run. `async with ticket:` waits for a run slot (in
+    priority order) and releases it afterwards. A ticket counts against
+    its client's limit from admit() until it is closed.
+    """
+
+    def __init__(self, controller: "AdmissionController", client: str, rank: int):
+        self.controller = controller
+        self.client = client
+        self.rank = rank
+        self.running = False
+        self.closed = False
+        self._started = None
+
+    async def acquire(self, timeout: Optional[float] = None):
+        try:
+            await self.controller._acquire(self, timeout)
+        except BaseException:
+            self.close()
+            raise
+        self.running = True
+        self._started = time.monotonic()
+
+    def close(self):
+        """Releases the slot (if running) and the client's quota. Idempotent."""
+        if self.closed:
+            return
+        self.closed = True
+        self.controller._close(self, time.monotonic() - self._started if self.running else None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class AdmissionController:
+    """
+    Bounded, prioritised admission of pipeline runs. admit() decides
+    synchronously (so rejections are immediate); the returned Ticket is
+    then awaited for a run slot. Must be used from the server's event loop.
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING, max_queue: int = MAX_QUEUE,
+                 max_per_client: int = MAX_PER_CLIENT, batch_queue_share: float = BATCH_QUEUE_SHARE):
+        self.max_running = max(1, max_running)
+        self.max_queue = max(0, max_queue)
+        self.max_per_client = max(1, max_per_client)
+        self.batch_queue_limit = int(self.max_queue * batch_queue_share)
+        self.running = 0
+        self.admitted = 0
+        self._per_client: Counter = Counter()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._avg_run_seconds = INITIAL_RUN_SECONDS
+        self.counters = {"admitted": 0, "rejected_queue_full": 0, "rejected_client_limit": 0, "queue_timeouts": 0}
+
+    @property
+    def queued(self) -> int:
+        """Admitted runs not running yet (waiting for a slot or in the job queue)."""
+        return self.admitted - self.running
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue place frees up, from the average run time."""
+        waves = self.queued / self.max_running + 1
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(self._avg_run_seconds * waves)))
+
+    def admit(self, client: str, priority: str = INTERACTIVE) -> Ticket:
+        """Returns a Ticket, or raises AdmissionRejected (ValueError on an unknown priority)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}. Use one of {', '.join(PRIORITIES)}")
+        rank = PRIORITIES[priority]
+
+        if self._per_client[client] >= self.max_per_client:
+            self.counters["rejected_client_limit"] += 1
+            raise AdmissionRejected(
+                f"Too many runs in progress for this client (limit {self.max_per_client})",
+                status_code=429, retry_after=self.retry_after(),
+            )
+        limit = self.max_queue if rank == PRIORITIES[INTERACTIVE] else self.batch_queue_limit
+        if self.admitted >= self.max_running and self.queued >= limit:
+            self.counters["rejected_queue_full"] += 1
+            raise AdmissionRejected(
+                f"Server busy: {self.running} runs in progress and {self.queued} queued",
+                status_code=503, retry_after=self.retry_after(),
+            )
+
+        self._per_client[client] += 1
+        self.admitted += 1
+        self.counters["admitted"] += 1
+        return Ticket(self, client, rank)
+
+    async def _acquire(self, ticket: Ticket, timeout: Optional[float]):
+        if self.running < self.max_running and not self._waiters:
+            self.running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (ticket.rank, next(self._seq), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we gave up: pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters["queue_timeouts"] += 1
+                raise AdmissionRejected(
+                    "Timed out waiting for a free run slot", status_code=503, retry_after=self.retry_after(),
+                ) from None
+            raise
+
+    def _release_slot(self):
+        """Hands a finished run's slot to the best waiter, or frees it."""
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def _close(self, ticket: Ticket, run_seconds: Optional[float]):
+        self.admitted -= 1
+        self._per_client[ticket.client] -= 1
+        if self._per_client[ticket.client] <= 0:
+            del self._per_client[ticket.client]
+        if run_seconds is not None:
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+            self._release_slot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_running": self.max_running,
+            "max_queue": self.max_queue,
+            "max_per_client": self.max_per_client,
+            "clients": len(self._per_client),
+            "avg_run_seconds": round(self._avg_run_seconds, 1),
+            **self.counters,
+        }
@@ -0,0 +1,170 @@
+# backend/jobs/job_manager.py
+
+import asyncio
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# How often abandoned (unpolled) leased jobs are looked for, in seconds
+LEASE_CHECK_INTERVAL = 1.0
+
+
+class JobManager:
+    """
+    Runs long backend work (pipeline runs) off the request path as
+    asyncio tasks. Callers submit a coroutine function, get a job id back
+    immediately and poll get() for status/progress until the job reaches
+    a terminal state. Must be used from the server's event loop.
+
+    Jobs can be cancelled (cancel()); a job submitted with a lease is
+    cancelled automatically once nobody has polled it for that long, so
+    work for a client that went away stops using LLM tokens and slots.
+    """
+
+    def __init__(self, max_concurrent: int = 32, ttl_seconds: int = 3600):
+        self.max_concurrent = max_concurrent
+        self.ttl_seconds = ttl_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # (args, kwargs) each job was submitted with, so it can be resumed
+        self._inputs: Dict[str, tuple] = {}
+        # job id -> (lease seconds, last poll time) for leased jobs
+        self._leases: Dict[str, tuple] = {}
+        self._lease_watcher: Optional[asyncio.Task] = None
+
+    def submit(self, kind: str, fn: Callable[..., Awaitable[Any]], *args,
+               lease_seconds: Optional[float] = None, cleanup: Optional[Callable[[], Any]] = None,
+               **kwargs) -> str:
+        """
+        Schedules await fn(*args, progress=<callback>, **kwargs) and returns the job id.
+        The callback takes (stage, done, total, **detail) and updates the job's
+        progress; detail (e.g. per-status counts) is merged into it.
+
+        lease_seconds: cancel the job if get() isn't called for this long.
+        cleanup: called once the job is finished, cancelled or failed, even
+        if it was cancelled before fn started (e.g. to release resources
+        taken at submit time that fn would otherwise release).
+        """
+        self._prune()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": QUEUED,
+            "progress": {"stage": QUEUED, "done": 0, "total": 0},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+        self._inputs[job_id] = (args, kwargs)
+
+        def progress(stage: str, done: int = 0, total: int = 0, **detail):
+            self._update(job_id, progress={"stage": stage, "done": done, "total": total, **detail})
+
+        async def run():
+            async with self._semaphore:
+                self._update(job_id, status=RUNNING)
+                return await fn(*args, progress=progress, **kwargs)
+
+        def finished(task: asyncio.Task):
+            # A done callback rather than try/finally in run(): a task
+            # cancelled before its first step never executes run() at all
+            self._tasks.pop(job_id, None)
+            self._leases.pop(job_id, None)
+            try:
+                if task.cancelled():
+                    self._update(job_id, status=CANCELLED, error=self._jobs.get(job_id, {}).get("error") or "Cancelled")
+                elif task.exception() is not None:
+                    traceback.print_exception(task.exception())
+                    self._update(job_id, status=FAILED, error=str(task.exception()))
+                else:
+                    self._update(job_id, status=SUCCEEDED, result=task.result())
+            finally:
+                if cleanup is not None:
+                    cleanup()
+
+        # keep a reference so the task isn't garbage collected mid-run
+        task = asyncio.get_running_loop().create_task(run())
+        task.add_done_callback(finished)
+        self._tasks[job_id] = task
+        if lease_seconds:
+            self._leases[job_id] = (lease_seconds, time.monotonic())
+            if self._lease_watcher is None or self._lease_watcher.done():
+                self._lease_watcher = asyncio.get_running_loop().create_task(self._watch_leases())
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a snapshot of the job, or None if unknown/expired. Renews its lease."""
+        if job_id in self._leases:
+            self._leases[job_id] = (self._leases[job_id][0], time.monotonic())
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def cancel(self, job_id: str, reason: str = "Cancelled", wait: float = 1.0) -> bool:
+        """
+        Cancels a queued or running job: the CancelledError interrupts it at
+        its current await (aborting in-flight HTTP calls). Waits up to wait
+        seconds for it to stop. Returns False if the job isn't running.
+        """
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        self._update(job_id, error=reason)
+        task.cancel()
+        await asyncio.wait({task}, timeout=wait)
+        return True
+
+    async def _watch_leases(self):
+        """Cancels leased jobs nobody has polled within their lease."""
+        while self._leases:
+            await asyncio.sleep(LEASE_CHECK_INTERVAL)
+            now = time.monotonic()
+            for job_id, (lease, last_seen) in list(self._leases.items()):
+                if now - last_seen > lease:
+                    self._leases.pop(job_id, None)
+                    print(f"Cancelling job {job_id}: not polled for {lease:g}s")
+                    await self.cancel(job_id, reason=f"Abandoned: not polled for {lease:g}s", wait=0)
+
+    def get_inputs(self, job_id: str) -> Optional[tuple]:
+        """Returns the (args, kwargs) a job was submitted with."""
+        return self._inputs.get(job_id)
+
+    async def shutdown(self):
+        """Cancels outstanding jobs (called on server shutdown)."""
+        tasks = list(self._tasks.values())
+        if self._lease_watcher is not None:
+            tasks.append(self._lease_watcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _update(self, job_id: str, **changes):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.update(changes)
+        job["updated_at"] = time.time()
+
+    def _prune(self):
+        """Drops finished jobs older than the TTL so memory stays bounded."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in TERMINAL_STATES and job["updated_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._inputs.pop(job_id, None)
@@ -1,34 +1,153 @@
 # backend/llm/llm_client.py
 
-import os
-from mistralai import Mistral
-import streamlit as st
+import asyncio
+from backend import config
+from backend.utils import resilience
+from backend.utils.singleflight import SingleFlight, make_key
+
+# Identical prompts sent concurrently (by any client in this process) share
+# one Mistral call.
+_inflight_chats = SingleFlight()
+
+# finish_reason Mistral reports when the output was cut off at max_tokens
+FINISH_LENGTH = "length"
+# How many follow-up requests may be spent resuming one truncated answer
+MAX_CONTINUATIONS = int(config.get("LLM_MAX_CONTINUATIONS", 3))
+# Alternative API base URL, e.g. a local Mistral-compatible stand-in server
+SERVER_URL = config.get("MISTRAL_SERVER_URL") or None
+
+# Chat completions are idempotent, so every transient failure is retried
+_chat_endpoint = resilience.endpoint("mistral.chat", "mistral", max_attempts=4, deadline=180.0)
 
 class LLMClient:
     """
     Lightweight wrapper for Mistral AI chat models.
+    chat_async() is the primary entry point; chat() is a blocking
+    convenience wrapper for scripts.
+
+    The mistralai SDK is imported and instantiated on first use, so
+    constructing agents/pipelines (e.g. at worker boot) stays cheap.
     """
 
     def __init__(self, model: str = "mistral-small-latest"):
-        api_key = st.secrets["MISTRAL_API_KEY"]
+        api_key = config.get("MISTRAL_API_KEY")
         if not api_key:
             raise ValueError("MISTRAL_API_KEY not found. Please add it to your .env file.")
 
-        self.client = Mistral(api_key=api_key)
+        self.api_key = api_key
         self.model = model
+        self._client = None
+
+        # The SDK's async HTTP pool is bound to the event loop it was first
+        # used on, so keep one async client per loop.
+        self._async_client = None
+        self._async_client_loop = None
+
+    def _new_client(self):
+        from mistralai import Mistral
+        return Mistral(api_key=self.api_key, server_url=SERVER_URL)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = self.client if self._async_client is None else self._new_client()
+            self._async_client_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def _messages(system: str, user: str, prefix: str = ""):
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ]
+        if prefix:
+            # Mistral continues an assistant message flagged as prefix
+            messages.append({"role": "assistant", "content": prefix, "prefix": True})
+        return messages
+
+    @staticmethod
+    def _unpack(response, prefix: str = ""):
+        choice = response.choices[0]
+        content = choice.message.content or ""
+        # The reply may echo the prefix; only the new text is wanted
+        if prefix and content.startswith(prefix):
+            content = content[len(prefix):]
+        return content, choice.finish_reason
+
+    async def chat_async(self, system: str, user: str, temperature: float = 0.0, max_tokens: int = 2000):
+        """
+        Sends chat messages to Mistral without blocking the event loop
+        and returns the text content. Concurrent identical requests are
+        coalesced into one call.
+        """
+        content, _ = await self.complete_async(system, user, temperature, max_tokens)
+        return content
+
+    async def complete_async(self, system: str, user: str, temperature: float = 0.0,
+                             max_tokens: int = 2000, prefix: str = ""):
+        """
+        Like chat_async() but returns (content, finish_reason). With a
+        prefix, the model resumes that partial assistant answer and only
+        the continuation is returned.
+        """
+        key = make_key(self.model, system, user, temperature, max_tokens, prefix)
+        return await _inflight_chats.do(key, self._complete_async, system, user, temperature, max_tokens, prefix)
+
+    async def _complete_async(self, system: str, user: str, temperature: float, max_tokens: int, prefix: str):
+        response = await _chat_endpoint.call_async(
+            self._get_async_client().chat.complete_async,
+            model=self.model,
+            messages=self._messages(system, user, prefix),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+        return self._unpack(response, prefix)
+
+    async def chat_continued_async(self, system: str, user: str, temperature: float = 0.0,
+                                   max_tokens: int = 2000, max_rounds: int = MAX_CONTINUATIONS):
+        """
+        chat_async() that doesn't give up on truncated output: while the
+        model stops because of max_tokens, it asks it to continue from
+        what it has written so far (up to max_rounds extra calls) and
+        returns the stitched text.
+        """
+        text, finish_reason = await self.complete_async(system, user, temperature, max_tokens)
+        rounds = 0
+        while finish_reason == FINISH_LENGTH and rounds < max_rounds:
+            rounds += 1
+            more, finish_reason = await self.complete_async(system, user, temperature, max_tokens, prefix=text)
+            if not more:
+                break
+            text += more
+
+        if finish_reason == FINISH_LENGTH:
+            print(f"LLM output still truncated after {rounds} continuation(s)")
+        return text
 
     def chat(self, system: str, user: str, temperature: float = 0.0, max_tokens: int = 2000):
         """
         Sends chat messages to Mistral and returns the text content.
         """
-        response = self.client.chat.complete(
+        content, _ = self.complete(system, user, temperature, max_tokens)
+        return content
+
+    def complete(self, system: str, user: str, temperature: float = 0.0, max_tokens: int = 2000, prefix: str = ""):
+        """
+        Blocking counterpart of complete_async(): returns (content, finish_reason).
+        """
+        response = _chat_endpoint.call(
+            self.client.chat.complete,
             model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user}
-            ],
+            messages=self._messages(system, user, prefix),
             temperature=temperature,
             max_tokens=max_tokens,
         )
 
-        return response.choices[0].message.content
+        return self._unpack(response, prefix)
@@ -1,23 +1,89 @@
 # backend/main.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from backend.agents.pipeline import RequirementsPipeline
+from backend.export.exporters import FORMATS, export_stream
 import traceback
-from backend.jira.jira_client import JiraClient
+from backend.jira.jira_client import JiraClient, remaining_items
+from backend.jobs.admission import INTERACTIVE, QUEUE_TIMEOUT, AdmissionController, AdmissionRejected
+from backend.jobs.job_manager import TERMINAL_STATES, JobManager
+from backend.storage.history_store import make_etag
+from backend.utils import json_utils, profiling, resilience
+
+# orjson-backed responses when available (much faster on big nested results)
+DefaultResponse = ORJSONResponse if json_utils.orjson is not None else JSONResponse
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+# Default time budget (seconds) for interactive runs that don't send one;
+# unset or 0 = no deadline
+INTERACTIVE_DEADLINE = float(os.getenv("INTERACTIVE_DEADLINE_SECONDS", "0")) or None
+
+# Start planning uploads before the user asks for a run (POST /api/process/speculate)
+SPECULATIVE_PLANNING = os.getenv("SPECULATIVE_PLANNING", "").strip().lower() in ("1", "true", "yes", "on")
+
+# How often a synchronous /api/process call checks whether its client left
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Per-process state. Created in lifespan() rather than at import time so
+# that every uvicorn worker process builds its own pipeline, sqlite
+# connections and job manager inside its own event loop.
+pipeline = None
+history = None
+jobs = None
+admission = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global pipeline, history, jobs, admission
+    pipeline = RequirementsPipeline()
+    history = pipeline.history
+    jobs = JobManager(max_concurrent=int(os.getenv("MAX_CONCURRENT_JOBS", "64")))
+    admission = AdmissionController()
+    yield
+    await jobs.shutdown()
 
 app = FastAPI(
     title="Agentic Requirements Assistant",
     version="1.0.0",
-    description="Pipeline: Planner → Epic Generator → Reviewer → Unified Result"
+    description="Pipeline: Planner → Epic Generator → Reviewer → Unified Result",
+    default_response_class=DefaultResponse,
+    lifespan=lifespan
 )
 
+# Negotiate br/gzip from Accept-Encoding. brotli-asgi is optional; its
+# middleware falls back to gzip for clients that don't accept br.
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
 # Request model
 class TranscriptInput(BaseModel):
     transcript: str
+    # re-process incrementally against this stored run (edited/extended transcript)
+    previous_run_id: Optional[str] = None
+    # "interactive" (UI, started first) or "batch" (scripts, bulk imports)
+    priority: str = INTERACTIVE
+    # time budget for the run in seconds, counted from the request; the
+    # result is marked "partial" when the pipeline had to cut corners
+    deadline_seconds: Optional[float] = None
+    # jobs only: cancel the run if its status isn't polled for this long
+    lease_seconds: Optional[float] = None
 
-pipeline = RequirementsPipeline()
+class SpeculateInput(BaseModel):
+    transcript: str
 
 class JiraSyncRequest(BaseModel):
     payload: dict   # approved payload from frontend
@@ -26,30 +92,489 @@ class JiraSyncRequest(BaseModel):
 def root():
     return {"status": "ok", "message": "Agentic Requirements API running"}
 
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Stage breakdown of a stored profile (its files are served by
+    /api/profiles/{profile_id}/files/{name}).
+    """
+    summary = profiling.load_summary(profile_id)
+    if summary is None:
+        return {"success": False, "error": f"Profile {profile_id} not found"}
+    return {"success": True, "result": summary}
+
+@app.get("/api/profiles/{profile_id}/files/{name}")
+def get_profile_file(profile_id: str, name: str):
+    """
+    Downloads one of a stored profile's files: profile.pstats,
+    profile.txt, stacks.collapsed or stages.json.
+    """
+    path = profiling.file_path(profile_id, name)
+    if path is None:
+        return {"success": False, "error": f"File {name} not found in profile {profile_id}"}
+    if name == "stages.json":
+        # through load_summary: older profiles recorded their server-side directory
+        return Response(
+            json_utils.dumps(profiling.load_summary(profile_id), indent=True), media_type=profiling.PROFILE_FILES[name],
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}-{name}"'},
+        )
+    return FileResponse(path, media_type=profiling.PROFILE_FILES[name], filename=f"{profile_id}-{name}")
+
+@app.get("/api/metrics/upstreams")
+async def upstream_metrics():
+    """
+    Retry counters and circuit breaker state for Mistral / Jira calls
+    (per worker process).
+    """
+    return {"success": True, "result": resilience.metrics()}
+
+
+@app.get("/api/metrics/admission")
+async def admission_metrics():
+    """
+    Running/queued pipeline runs and rejection counters (per worker process).
+    """
+    return {"success": True, "result": admission.stats()}
+
+
+@app.get("/api/metrics/speculation")
+async def speculation_metrics():
+    """
+    Speculative planning counters (per worker process): claimed plans
+    saved a planner call, discarded/expired ones were spent for nothing.
+    """
+    return {"success": True, "result": dict(pipeline.speculation_stats(), enabled=SPECULATIVE_PLANNING)}
+
+
+def client_id(request: Request) -> str:
+    """
+    Key for per-client limits: X-Client-Id when the caller sends one (the
+    Streamlit server sends one per browser session), else the peer address.
+    """
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+def run_deadline(input_data: TranscriptInput) -> Optional[float]:
+    if input_data.deadline_seconds is not None:
+        return input_data.deadline_seconds if input_data.deadline_seconds > 0 else None
+    return INTERACTIVE_DEADLINE if input_data.priority == INTERACTIVE else None
+
+class ClientDisconnected(Exception):
+    pass
+
+async def cancel_on_disconnect(request: Request, coro):
+    """
+    Awaits coro, cancelling it as soon as the client disconnects
+    (Starlette doesn't cancel handlers on disconnect), so an abandoned
+    synchronous run stops making LLM calls.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+
+def rejected(e: AdmissionRejected):
+    return DefaultResponse(
+        {"success": False, "error": str(e)},
+        status_code=e.status_code,
+        headers={"Retry-After": str(e.retry_after)},
+    )
 
 @app.post("/api/process")
-def process_transcript(input_data: TranscriptInput):
+async def process_transcript(input_data: TranscriptInput, request: Request, profile: bool = False):
     """
     Accept transcript text and run the full Planner + Reviewer pipeline.
+
+    Runs go through admission control: 503 + Retry-After when the queue
+    is full (or no slot frees up within ADMISSION_QUEUE_TIMEOUT), 429
+    when this client already has too many runs in progress.
+
+    With a deadline (deadline_seconds, or INTERACTIVE_DEADLINE_SECONDS)
+    the result may be "partial"; a deferred review then runs as a
+    background job (partial.review_job_id) producing a completed run.
+
+    ?profile=1 (or header X-Profile: 1) profiles this run: the result gets
+    a "profile" summary with per-stage wall/CPU time, and cProfile stats +
+    flamegraph stacks can be downloaded from /api/profiles/{profile_id}/files.
     """
+    received = time.monotonic()
+    deadline = run_deadline(input_data)
     try:
-        result = pipeline.run(input_data.transcript)
-        return {"success": True, "result": result}
+        ticket = admission.admit(client_id(request), input_data.priority)
+        await ticket.acquire(timeout=QUEUE_TIMEOUT if deadline is None else min(QUEUE_TIMEOUT, deadline))
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    try:
+        # time spent queued counts against the deadline
+        if deadline is not None:
+            deadline -= time.monotonic() - received
+        if not (profile or profiling.is_enabled(request.headers.get("x-profile"))):
+            result = await cancel_on_disconnect(request, pipeline.run_async(
+                input_data.transcript, previous_run_id=input_data.previous_run_id, deadline=deadline
+            ))
+            defer_review(result)
+            return {"success": True, "result": result}
+
+        profiler = profiling.RunProfiler("api-process")
+        with profiler:
+            result = await cancel_on_disconnect(request, pipeline.run_async(
+                input_data.transcript, progress=profiler.progress,
+                previous_run_id=input_data.previous_run_id, deadline=deadline
+            ))
+        defer_review(result)
+        # copy: the result object may be shared with coalesced callers
+        return {"success": True, "result": dict(result, profile=profiler.summary)}
+    except ClientDisconnected:
+        print("Client disconnected, pipeline run cancelled")
+        return {"success": False, "error": "Client disconnected"}
     except Exception as e:
         print("\n\n===== BACKEND EXCEPTION (PLAIN TEXT) =====")
         traceback.print_exc()
         print("===== END EXCEPTION =====\n\n")
         return {"success": False, "error": str(e)}
+    finally:
+        ticket.close()
+
+def defer_review(result):
+    """
+    Queues the review a partial run deferred (once, even when the result
+    is shared by coalesced callers) and records the job in result["partial"].
+    """
+    partial = result.get("partial") or {}
+    if partial.get("review_deferred") and result.get("run_id") and "review_job_id" not in partial:
+        partial["review_job_id"] = jobs.submit("review", complete_review, result["run_id"])
+
+def run_summary(result):
+    """What a job reports about a stored run: id, counts and the partial marker."""
+    if not result.get("run_id"):
+        raise RuntimeError("Pipeline finished but the run could not be stored")
+    epics = result["planner_output"].get("epics", [])
+    return {
+        "run_id": result["run_id"],
+        "epic_count": len(epics),
+        "story_count": sum(len(e.get("stories", [])) for e in epics),
+        "partial": result.get("partial"),
+    }
+
+async def run_and_store(transcript: str, previous_run_id=None, ticket=None, deadline_at=None, progress=None):
+    """
+    Job body for /api/process/jobs. The full result stays server-side;
+    the job only reports the run id and counts, and clients page through
+    the run with the /api/runs endpoints.
+
+    ticket: the admission ticket taken at submit time (the job's cleanup
+    closes it too, in case this never starts); the job waits
+    (stage "queued") until it gets a run slot.
+    deadline_at: time.monotonic() by which the run must be done.
+    """
+    if ticket is not None:
+        progress("queued")
+        await ticket.acquire()
+    try:
+        deadline = None if deadline_at is None else deadline_at - time.monotonic()
+        result = await pipeline.run_async(
+            transcript, progress=progress, previous_run_id=previous_run_id, deadline=deadline
+        )
+    finally:
+        if ticket is not None:
+            ticket.close()
+    defer_review(result)
+    return run_summary(result)
+
+async def complete_review(run_id: str, progress=None):
+    """
+    Job body for deferred reviews: stores the fully reviewed run as a new
+    run and reports it like a pipeline job.
+    """
+    return run_summary(await pipeline.complete_review_async(run_id, progress=progress))
+
+@app.post("/api/process/jobs")
+async def submit_process_job(input_data: TranscriptInput, request: Request):
+    """
+    Queue a pipeline run and return its job id immediately.
+    Poll GET /api/process/jobs/{job_id} for progress and the result.
+
+    Admission is decided here, before anything is queued: 503/429 with
+    Retry-After when the run queue or the client's limit is full.
+    With lease_seconds the run is cancelled once the client stops polling.
+    """
+    if not input_data.transcript.strip():
+        return {"success": False, "error": "Transcript is empty"}
+    try:
+        ticket = admission.admit(client_id(request), input_data.priority)
+    except AdmissionRejected as e:
+        return rejected(e)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    deadline = run_deadline(input_data)
+    job_id = jobs.submit(
+        "process", run_and_store, input_data.transcript, input_data.previous_run_id, ticket=ticket,
+        deadline_at=None if deadline is None else time.monotonic() + deadline,
+        lease_seconds=input_data.lease_seconds,
+        # also when the job is cancelled/fails before run_and_store takes the ticket
+        cleanup=ticket.close,
+    )
+    return {"success": True, "result": {"job_id": job_id}}
+
+@app.get("/api/process/jobs/{job_id}")
+async def get_process_job(job_id: str):
+    """
+    Returns job status, progress and (once finished) the pipeline result.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return {"success": False, "error": f"Job {job_id} not found"}
+    return {"success": True, "result": job}
+
+async def cancel_job(job_id: str, kinds):
+    job = jobs.get(job_id)
+    if job is None or job["kind"] not in kinds:
+        return {"success": False, "error": f"Job {job_id} not found"}
+    if not await jobs.cancel(job_id):
+        return {"success": False, "error": f"Job {job_id} already {job['status']}"}
+    return {"success": True, "result": jobs.get(job_id)}
+
+@app.delete("/api/process/jobs/{job_id}")
+async def cancel_process_job(job_id: str):
+    """
+    Cancels a queued or running pipeline job (e.g. the user uploaded a
+    different file). In-flight LLM calls are aborted, unless an identical
+    run from another caller is sharing them; its admission slot is freed.
+    """
+    return await cancel_job(job_id, ("process", "review"))
+
+@app.post("/api/process/speculate")
+async def speculate(input_data: SpeculateInput, request: Request):
+    """
+    Starts planning an uploaded transcript before the user asks for a run
+    (opt-in: SPECULATIVE_PLANNING). A later run of the same transcript
+    claims the plan instead of waiting for the planner. One speculation
+    per client: a different transcript replaces the previous one.
+
+    Only started when no run is queued, so speculation never delays
+    runs that were actually requested.
+    """
+    if not SPECULATIVE_PLANNING:
+        return {"success": False, "error": "Speculative planning is disabled"}
+    if not input_data.transcript.strip():
+        return {"success": False, "error": "Transcript is empty"}
+    if admission.queued > 0:
+        return {"success": True, "result": {"started": False, "reason": "busy"}}
+    started = pipeline.speculate(input_data.transcript, client_id(request))
+    return {"success": True, "result": {"started": started}}
+
+@app.delete("/api/process/speculate")
+async def discard_speculation(request: Request):
+    """
+    Drops this client's speculative plan (the upload was removed).
+    """
+    return {"success": True, "result": {"discarded": pipeline.discard_speculation(client_id(request))}}
+
+async def sync_to_jira(payload: dict, previous=None, progress=None):
+    """
+    Job body for /api/jira/sync/jobs: creates the approved items and
+    returns the per-item report (created / failed / skipped).
+    """
+    jira = JiraClient(discover=False)
+    try:
+        return await jira.sync_approved_payload_async(payload, progress=progress, previous=previous)
+    finally:
+        await jira.aclose()
+
+@app.post("/api/jira/sync/jobs")
+async def submit_jira_sync_job(req: JiraSyncRequest):
+    """
+    Queue a Jira sync of the approved payload and return its job id.
+    Poll GET /api/jira/sync/jobs/{job_id} for per-item progress.
+    """
+    if not req.payload.get("epics"):
+        return {"success": False, "error": "No approved epics to sync"}
+    job_id = jobs.submit("jira_sync", sync_to_jira, req.payload)
+    return {"success": True, "result": {"job_id": job_id}}
+
+def resume_base(job_id: str, job):
+    """
+    The report a resume of a finished sync job starts from: its own, or
+    for a job that crashed outright (no report) what it resumed from.
+    """
+    inputs = jobs.get_inputs(job_id)
+    return job["result"] or (inputs[1].get("previous") if inputs else None)
+
+@app.get("/api/jira/sync/jobs/{job_id}")
+async def get_jira_sync_job(job_id: str):
+    """
+    Returns sync status, progress counts and (once finished) the per-item
+    report, plus "remaining" (items of the report still to retry) and
+    "resumable" (POST .../resume would start a new job).
+    """
+    job = jobs.get(job_id)
+    if job is None or job["kind"] != "jira_sync":
+        return {"success": False, "error": f"Jira sync job {job_id} not found"}
+    previous = resume_base(job_id, job) if job["status"] in TERMINAL_STATES else None
+    job["remaining"] = remaining_items(job["result"])
+    job["resumable"] = job["status"] in TERMINAL_STATES and (not previous or remaining_items(previous) > 0)
+    return {"success": True, "result": job}
+
+@app.delete("/api/jira/sync/jobs/{job_id}")
+async def cancel_jira_sync_job(job_id: str):
+    """
+    Stops a running Jira sync; in-flight Jira requests are aborted. Items
+    created so far are found again (by label) when the sync is resumed.
+    """
+    return await cancel_job(job_id, ("jira_sync",))
+
+@app.post("/api/jira/sync/jobs/{job_id}/resume")
+async def resume_jira_sync_job(job_id: str):
+    """
+    Starts a new sync job for the same payload that reuses everything the
+    given job created and retries only its failed/skipped items.
+    """
+    job = jobs.get(job_id)
+    inputs = jobs.get_inputs(job_id)
+    if job is None or inputs is None or job["kind"] != "jira_sync":
+        return {"success": False, "error": f"Jira sync job {job_id} not found"}
+    if job["status"] not in TERMINAL_STATES:
+        return {"success": False, "error": "Sync is still running"}
+
+    (payload,), _ = inputs
+    previous = resume_base(job_id, job)
+    if previous and not remaining_items(previous):
+        return {"success": False, "error": "Nothing to resume: every item is in Jira"}
+
+    new_job_id = jobs.submit("jira_sync", sync_to_jira, payload, previous=previous)
+    return {"success": True, "result": {"job_id": new_job_id}}
 
 @app.post("/api/jira/sync")
-def jira_sync(req: JiraSyncRequest):
+async def jira_sync(req: JiraSyncRequest):
+    jira = None
     try:
-        jira = JiraClient()
+        jira = JiraClient(discover=False)
         # payload should be the approved payload (epics with approved stories)
-        result = jira.sync_approved_payload(req.payload)
+        result = await jira.sync_approved_payload_async(req.payload)
         return {"success": True, "result": result}
     except Exception as e:
         # return useful error
-        import traceback
         traceback.print_exc()
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+    finally:
+        if jira is not None:
+            await jira.aclose()
+
+# History/run endpoints below stay plain `def`: sqlite calls block, so
+# FastAPI runs them in its threadpool instead of on the event loop.
+
+@app.get("/api/history")
+def search_history(q: str = "", page: int = 1, page_size: int = 20):
+    """
+    Search previously generated epics/stories (full-text, ranked).
+    Without a query, lists stored runs newest first.
+    """
+    try:
+        if q.strip():
+            result = history.search(q, page=page, page_size=page_size)
+        else:
+            result = history.list_runs(page=page, page_size=page_size)
+        return {"success": True, "result": result}
+    except Exception as e:
+        traceback.print_exc()
+        return {"success": False, "error": str(e)}
+
+@app.get("/api/history/{run_id}")
+def get_history_run(run_id: str):
+    """
+    Fetch a stored pipeline run (transcript + full result).
+    """
+    run = history.get_run(run_id)
+    if run is None:
+        return {"success": False, "error": f"Run {run_id} not found"}
+    return {"success": True, "result": run}
+
+
+def conditional_response(request: Request, etag: str, payload):
+    """
+    Returns 304 when the client already has this version (If-None-Match),
+    otherwise the payload with its ETag.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return DefaultResponse(payload, headers=headers)
+
+@app.get("/api/runs/{run_id}")
+def get_run_summary(run_id: str, request: Request):
+    """
+    Run metadata and counts, without epics or stories.
+    """
+    summary = history.get_run_summary(run_id)
+    if summary is None:
+        return {"success": False, "error": f"Run {run_id} not found"}
+    return conditional_response(request, make_etag(run_id, "summary"), {"success": True, "result": summary})
+
+@app.get("/api/runs/{run_id}/epics")
+def list_run_epics(run_id: str, request: Request, page: int = 1, page_size: int = 50):
+    """
+    Lightweight, paginated epic list (epic fields + story_count only).
+    """
+    result = history.list_epics(run_id, page=page, page_size=page_size)
+    if result is None:
+        return {"success": False, "error": f"Run {run_id} not found"}
+    etag = make_etag(run_id, "epics", result["page"], result["page_size"])
+    return conditional_response(request, etag, {"success": True, "result": result})
+
+@app.get("/api/runs/{run_id}/index")
+def get_run_index(run_id: str, request: Request):
+    """
+    Story ids, priorities and labels for every epic (no text), used to
+    build approval state and filters.
+    """
+    result = history.get_run_index(run_id)
+    if result is None:
+        return {"success": False, "error": f"Run {run_id} not found"}
+    return conditional_response(request, make_etag(run_id, "index"), {"success": True, "result": result})
+
+@app.get("/api/runs/{run_id}/epics/{epic_id}")
+def get_run_epic(run_id: str, epic_id: str, request: Request):
+    """
+    One epic with its stories and reviewer entry, loaded on demand.
+    """
+    epic = history.get_epic(run_id, epic_id)
+    if epic is None:
+        return {"success": False, "error": f"Epic {epic_id} not found in run {run_id}"}
+    return conditional_response(request, make_etag(run_id, "epic", epic_id), {"success": True, "result": epic})
+
+@app.get("/api/export")
+def export_runs(run_id: List[str] = Query(...), format: str = "csv"):
+    """
+    Streams epics/stories of one or more runs as csv, jsonl or xlsx.
+    Rows are read and written incrementally, never held in memory at once.
+    """
+    if format not in FORMATS:
+        return {"success": False, "error": f"Unsupported export format: {format}"}
+    missing = [r for r in run_id if not history.run_exists(r)]
+    if missing:
+        return {"success": False, "error": f"Run(s) not found: {', '.join(missing)}"}
+
+    media_type, extension = FORMATS[format]
+    name = run_id[0] if len(run_id) == 1 else f"{len(run_id)}-runs"
+    return StreamingResponse(
+        export_stream(history, run_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="requirements-{name}.{extension}"'},
+    )
+
+@app.get("/api/runs/{run_id}/export")
+def export_run(run_id: str, format: str = "csv"):
+    """
+    Single-run shortcut for /api/export.
+    """
+    return export_runs([run_id], format)
@@ -0,0 +1,237 @@
+# backend/models/requirements.py
+# Typed requirement models (the SCHEMA_JSON shapes) used between agents.
+#
+# Models are slots dataclasses (no per-instance __dict__), validated in a
+# single compiled pass by pydantic TypeAdapters at each agent boundary.
+# Common LLM deviations are coerced instead of failing the run:
+#   - ids given as numbers                     -> str
+#   - "HIGH", "p1", "critical", "highest"      -> "High" / "Medium" / "Low"
+#   - acceptance criteria as one bulleted string -> list of lines
+#   - labels / dependencies as "a, b" or a single string -> list
+#   - "5 points", "5"                          -> 5
+#   - null text fields                         -> ""
+#   - malformed source_span                    -> None
+#   - "user_stories" instead of "stories", review wrapped in {"review": ...}
+# Plain dicts (JSON) are still what gets stored and served: use to_dict().
+
+import re
+from dataclasses import dataclass, field, is_dataclass
+from typing import Annotated, Any, Dict, List, Optional
+
+from pydantic import BeforeValidator, TypeAdapter
+
+PRIORITIES = ("High", "Medium", "Low")
+
+PRIORITY_ALIASES = {
+    "highest": "High", "critical": "High", "blocker": "High", "urgent": "High", "must": "High",
+    "p0": "High", "p1": "High",
+    "normal": "Medium", "moderate": "Medium", "should": "Medium", "p2": "Medium",
+    "lowest": "Low", "minor": "Low", "trivial": "Low", "could": "Low", "p3": "Low", "p4": "Low",
+}
+
+BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def _priority(value):
+    if value is None:
+        return None
+    word = str(value).strip().lower().replace("priority", "").strip(" :-")
+    if not word:
+        return None
+    for p in PRIORITIES:
+        if word == p.lower():
+            return p
+    return PRIORITY_ALIASES.get(word)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(v) for v in value if v is not None)
+    return str(value)
+
+
+def _item_text(item) -> str:
+    # [{"criterion": "..."}] style entries: keep the text value(s)
+    if isinstance(item, dict):
+        return " ".join(str(v) for v in item.values() if isinstance(v, (str, int, float)))
+    return str(item)
+
+
+def _lines(value):
+    """Acceptance criteria: list, or one string with one criterion per line/bullet."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.splitlines()
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    items = (BULLET_RE.sub("", _item_text(v)).strip() for v in value if v is not None)
+    return [v for v in items if v]
+
+
+def _csv_list(value):
+    """Labels / dependencies: list, or "a, b" / single string."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    items = (_item_text(v).strip() for v in value if v is not None)
+    return [v for v in items if v]
+
+
+def _id(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _points(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.search(r"\d+", str(value))
+    return int(match.group()) if match else None
+
+
+def _span(value):
+    if isinstance(value, SourceSpan):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        value = {"start_char": value[0], "end_char": value[1]}
+    if not isinstance(value, dict):
+        return None
+    try:
+        start, end = int(value.get("start_char")), int(value.get("end_char"))
+    except (TypeError, ValueError):
+        return None
+    return {"start_char": start, "end_char": end} if 0 <= start <= end else None
+
+
+def _epic(value):
+    if isinstance(value, dict) and "stories" not in value and "user_stories" in value:
+        value = dict(value, stories=value["user_stories"])
+    return value
+
+
+def _review(value):
+    if isinstance(value, dict) and isinstance(value.get("review"), dict):
+        return value["review"]
+    return value
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+Id = Annotated[str, BeforeValidator(_id)]
+Text = Annotated[str, BeforeValidator(_text)]
+Priority = Annotated[Optional[str], BeforeValidator(_priority)]
+Lines = Annotated[List[str], BeforeValidator(_lines)]
+StrList = Annotated[List[str], BeforeValidator(_csv_list)]
+Points = Annotated[Optional[int], BeforeValidator(_points)]
+AnyDict = Annotated[Dict[str, Any], BeforeValidator(_dict)]
+
+
+@dataclass(slots=True)
+class SourceSpan:
+    start_char: int
+    end_char: int
+
+
+Span = Annotated[Optional[SourceSpan], BeforeValidator(_span)]
+
+
+@dataclass(slots=True)
+class Story:
+    id: Id = ""
+    title: Text = ""
+    description: Text = ""
+    acceptance_criteria: Lines = field(default_factory=list)
+    priority: Priority = None
+    dependencies: StrList = field(default_factory=list)
+    labels: StrList = field(default_factory=list)
+    estimated_points: Points = None
+    assignee: Optional[str] = None
+    epic_id: Optional[Id] = None
+    source_span: Span = None
+
+
+@dataclass(slots=True)
+class Epic:
+    id: Id = ""
+    title: Text = ""
+    description: Text = ""
+    priority: Priority = None
+    labels: StrList = field(default_factory=list)
+    notes: Optional[str] = None
+    stories: List[Story] = field(default_factory=list)
+    source_span: Span = None
+
+
+EpicIn = Annotated[Epic, BeforeValidator(_epic)]
+
+
+@dataclass(slots=True)
+class Plan:
+    epics: List[EpicIn] = field(default_factory=list)
+    metadata: AnyDict = field(default_factory=dict)
+    context: AnyDict = field(default_factory=dict)
+    errors: Optional[List[str]] = None
+
+
+@dataclass(slots=True)
+class EpicReview:
+    id: Id = ""
+    clarity_ok: Optional[bool] = None
+    missing_fields: StrList = field(default_factory=list)
+    notes: Text = ""
+
+
+@dataclass(slots=True)
+class Review:
+    epics: List[EpicReview] = field(default_factory=list)
+    context: AnyDict = field(default_factory=dict)
+
+
+PLAN = TypeAdapter(Plan)
+EPICS = TypeAdapter(List[EpicIn])
+STORIES = TypeAdapter(List[Story])
+REVIEW = TypeAdapter(Annotated[Review, BeforeValidator(_review)])
+
+_ADAPTERS = {Plan: PLAN, Story: TypeAdapter(Story), Epic: TypeAdapter(Epic), Review: REVIEW,
+             EpicReview: TypeAdapter(EpicReview), SourceSpan: TypeAdapter(SourceSpan)}
+
+
+def parse_plan(data) -> Plan:
+    """Validates planner output ({"epics": [...], ...}); raises ValueError."""
+    return PLAN.validate_python(data)
+
+
+def parse_epics(data) -> List[Epic]:
+    return EPICS.validate_python(data or [])
+
+
+def parse_stories(data) -> List[Story]:
+    """Validates story generator output; a single story object is accepted too."""
+    if isinstance(data, dict):
+        data = data.get("stories", [data])
+    return STORIES.validate_python(data)
+
+
+def parse_review(data) -> Review:
+    """Validates reviewer output, with or without the {"review": ...} wrapper."""
+    return REVIEW.validate_python(data or {})
+
+
+def to_dict(value):
+    """Model (or list of models) -> plain JSON-ready dicts."""
+    if isinstance(value, list):
+        return [to_dict(v) for v in value]
+    if is_dataclass(value) and type(value) in _ADAPTERS:
+        return _ADAPTERS[type(value)].dump_python(value)
+    return value
@@ -0,0 +1,36 @@
+# backend/server.py
+# Production entry point: python -m backend.server
+#
+# One worker already holds hundreds of concurrent pipeline runs (they are
+# I/O bound on Mistral/Jira); add workers to use more CPU cores. Each
+# worker process runs backend.main's lifespan and builds its own pipeline.
+#
+# Environment:
+#   HOST (default 0.0.0.0), PORT (default 8000)
+#   WEB_CONCURRENCY   number of worker processes (default 1)
+#   UVICORN_RELOAD=1  dev auto-reload (forces a single worker)
+
+import os
+
+import uvicorn
+
+
+def main():
+    reload = os.getenv("UVICORN_RELOAD") == "1"
+    workers = 1 if reload else max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+    uvicorn.run(
+        # import string (not the app object) so each worker imports it itself
+        "backend.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        reload=reload,
+        loop="auto",
+        http="auto",
+        timeout_keep_alive=30,
+    )
+
+
+if __name__ == "__main__":
+    main()
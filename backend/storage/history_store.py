@@ -0,0 +1,430 @@
+# backend/storage/history_store.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from backend.utils import json_utils
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DB_PATH = os.path.join(ROOT_DIR, "data", "requirements_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    model TEXT,
+    transcript TEXT NOT NULL,
+    result TEXT NOT NULL,
+    epic_count INTEGER NOT NULL,
+    story_count INTEGER NOT NULL,
+    context TEXT,
+    review_context TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs(created_at DESC);
+
+CREATE TABLE IF NOT EXISTS items (
+    rowid INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    epic_id TEXT,
+    item_id TEXT,
+    title TEXT,
+    description TEXT,
+    acceptance_criteria TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_items_run_id ON items(run_id);
+
+CREATE TABLE IF NOT EXISTS run_epics (
+    run_id TEXT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    epic_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    skeleton TEXT NOT NULL,
+    detail TEXT NOT NULL,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_run_epics_epic ON run_epics(run_id, epic_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title,
+    description,
+    acceptance_criteria,
+    content='items',
+    content_rowid='rowid',
+    tokenize='porter unicode61'
+);
+"""
+
+# Columns added to runs after its first release: (name, type)
+RUNS_ADDED_COLUMNS = (("context", "TEXT"), ("review_context", "TEXT"))
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Turns free text into a safe FTS5 MATCH expression.
+    Every term is quoted (so user input can't inject FTS syntax)
+    and the last term is prefix-matched for search-as-you-type.
+    """
+    terms = [t.replace('"', '""') for t in query.split() if t.strip()]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag for stored run data. Runs are immutable once written,
+    so the identity of the resource (run id + what was asked for) is
+    enough to version it.
+    """
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def split_epic(epic: Dict[str, Any], review: Optional[Dict[str, Any]]):
+    """
+    Splits one epic into the three shapes served lazily:
+      - summary:  epic fields + story count (epic list)
+      - skeleton: story ids / priority / labels only (approval index)
+      - detail:   full epic with stories and its review entry
+    """
+    stories = epic.get("stories", []) or []
+    summary = {k: v for k, v in epic.items() if k != "stories"}
+    summary["story_count"] = len(stories)
+    skeleton = {
+        "id": epic.get("id"),
+        "title": epic.get("title"),
+        "labels": epic.get("labels", []),
+        "stories": [
+            {"id": s.get("id"), "priority": s.get("priority"), "labels": s.get("labels", [])}
+            for s in stories
+        ],
+    }
+    detail = dict(epic)
+    detail["review"] = review
+    return summary, skeleton, detail
+
+
+def review_by_epic(reviewer_output: Dict[str, Any]) -> Dict[Any, Dict[str, Any]]:
+    """Maps epic id -> reviewer entry (reviewer output is {"review": {"epics": [...]}})."""
+    review = (reviewer_output or {}).get("review", reviewer_output or {})
+    return {r.get("id"): r for r in review.get("epics", []) or [] if isinstance(r, dict)}
+
+
+def run_contexts(result: Dict[str, Any]):
+    """(planner context, reviewer run-level context) of a pipeline result."""
+    reviewer_output = result.get("reviewer_output", {}) or {}
+    review = reviewer_output.get("review", reviewer_output) or {}
+    return (result.get("planner_output", {}) or {}).get("context", {}), review.get("context", {})
+
+
+class HistoryStore:
+    """
+    Persistent SQLite store for pipeline runs.
+    Epic/story text is indexed with FTS5 so prior requirements can be
+    looked up with an indexed query instead of re-running the pipeline.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("HISTORY_DB_PATH", DEFAULT_DB_PATH)
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        # sqlite connections can't be shared across threads; FastAPI runs
+        # sync endpoints in a threadpool, so keep one connection per thread
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        with self._init_lock:
+            conn = self._conn()
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Adds columns missing from databases created by older versions."""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+        with conn:
+            for name, kind in RUNS_ADDED_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {name} {kind}")
+
+    # -----------------------
+    # WRITE
+    # -----------------------
+    def save_run(self, transcript: str, result: Dict[str, Any], model: Optional[str] = None) -> str:
+        """
+        Stores a pipeline result and indexes its epics/stories.
+        Returns the new run id.
+        """
+        run_id = uuid.uuid4().hex
+        epics = result.get("planner_output", {}).get("epics", [])
+
+        rows = []
+        story_count = 0
+        for epic in epics:
+            rows.append((
+                run_id, "epic", epic.get("id"), epic.get("id"),
+                epic.get("title"), epic.get("description"), None
+            ))
+            for story in epic.get("stories", []):
+                story_count += 1
+                rows.append((
+                    run_id, "story", epic.get("id"), story.get("id"),
+                    story.get("title"), story.get("description"),
+                    "\n".join(str(ac) for ac in story.get("acceptance_criteria", []) or [])
+                ))
+
+        context, review_context = run_contexts(result)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO runs (id, created_at, model, transcript, result, epic_count, story_count, "
+                "context, review_context) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, time.time(), model, transcript, json_utils.dumps(result), len(epics), story_count,
+                 json_utils.dumps(context), json_utils.dumps(review_context))
+            )
+            self._insert_epics(conn, run_id, result)
+            for row in rows:
+                cur = conn.execute(
+                    "INSERT INTO items (run_id, kind, epic_id, item_id, title, description, acceptance_criteria) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                conn.execute(
+                    "INSERT INTO items_fts (rowid, title, description, acceptance_criteria) VALUES (?, ?, ?, ?)",
+                    (cur.lastrowid, row[4], row[5], row[6])
+                )
+        return run_id
+
+    def _insert_epics(self, conn: sqlite3.Connection, run_id: str, result: Dict[str, Any]):
+        planner_output = result.get("planner_output", {})
+        reviews = review_by_epic(result.get("reviewer_output", {}))
+        for position, epic in enumerate(planner_output.get("epics", [])):
+            summary, skeleton, detail = split_epic(epic, reviews.get(epic.get("id")))
+            # OR IGNORE: two requests may backfill the same old run at once
+            conn.execute(
+                "INSERT OR IGNORE INTO run_epics (run_id, position, epic_id, summary, skeleton, detail) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, position, str(epic.get("id")), json_utils.dumps(summary), json_utils.dumps(skeleton), json_utils.dumps(detail))
+            )
+
+    def _ensure_epics(self, run_id: str) -> bool:
+        """
+        Makes sure per-epic rows exist for a run (runs stored before the
+        lazy endpoints existed only have the result blob). Returns False
+        if the run doesn't exist.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM run_epics WHERE run_id = ? LIMIT 1", (run_id,)).fetchone():
+            return True
+        row = conn.execute("SELECT result FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return False
+        with conn:
+            self._insert_epics(conn, run_id, json_utils.loads(row["result"]))
+        return True
+
+    # -----------------------
+    # READ
+    # -----------------------
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the full stored run, or None if it doesn't exist."""
+        row = self._conn().execute(
+            "SELECT id, created_at, model, transcript, result FROM runs WHERE id = ?",
+            (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": row["id"],
+            "created_at": row["created_at"],
+            "model": row["model"],
+            "transcript": row["transcript"],
+            "result": json_utils.loads(row["result"]),
+        }
+
+    def list_runs(self, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """Lists run summaries, newest first."""
+        page, page_size = max(page, 1), max(min(page_size, 100), 1)
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, created_at, model, epic_count, story_count, substr(transcript, 1, 200) AS preview "
+            "FROM runs ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (page_size, (page - 1) * page_size)
+        ).fetchall()
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "runs": [
+                {
+                    "run_id": r["id"],
+                    "created_at": r["created_at"],
+                    "model": r["model"],
+                    "epic_count": r["epic_count"],
+                    "story_count": r["story_count"],
+                    "preview": r["preview"],
+                }
+                for r in rows
+            ],
+        }
+
+    def search(self, query: str, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
+        """
+        Full-text search over epic/story titles, descriptions and
+        acceptance criteria. Results are ranked by bm25.
+        """
+        page, page_size = max(page, 1), max(min(page_size, 100), 1)
+        match = build_fts_query(query)
+        if not match:
+            return {"page": page, "page_size": page_size, "total": 0, "hits": []}
+
+        conn = self._conn()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM items_fts WHERE items_fts MATCH ?", (match,)
+        ).fetchone()[0]
+        rows = conn.execute(
+            """
+            SELECT i.run_id, i.kind, i.epic_id, i.item_id, i.title,
+                   snippet(items_fts, -1, '[', ']', '…', 16) AS snippet,
+                   r.created_at
+            FROM items_fts
+            JOIN items i ON i.rowid = items_fts.rowid
+            JOIN runs r ON r.id = i.run_id
+            WHERE items_fts MATCH ?
+            ORDER BY items_fts.rank
+            LIMIT ? OFFSET ?
+            """,
+            (match, page_size, (page - 1) * page_size)
+        ).fetchall()
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "hits": [
+                {
+                    "run_id": r["run_id"],
+                    "kind": r["kind"],
+                    "epic_id": r["epic_id"],
+                    "id": r["item_id"],
+                    "title": r["title"],
+                    "snippet": r["snippet"],
+                    "created_at": r["created_at"],
+                }
+                for r in rows
+            ],
+        }
+
+    # -----------------------
+    # LAZY RUN RETRIEVAL
+    # -----------------------
+    def get_run_summary(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Run metadata without epics/stories: counts, context and the
+        reviewer's run-level context (read from their own columns; only
+        runs stored before those existed fall back to the result blob).
+        """
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT id, created_at, model, epic_count, story_count, context, review_context FROM runs WHERE id = ?",
+            (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row["context"] is None:
+            result_row = conn.execute("SELECT result FROM runs WHERE id = ?", (run_id,)).fetchone()
+            context, review_context = run_contexts(json_utils.loads(result_row["result"]))
+        else:
+            context, review_context = json_utils.loads(row["context"]), json_utils.loads(row["review_context"])
+        return {
+            "run_id": row["id"],
+            "created_at": row["created_at"],
+            "model": row["model"],
+            "epic_count": row["epic_count"],
+            "story_count": row["story_count"],
+            "context": context,
+            "review_context": review_context,
+        }
+
+    def list_epics(self, run_id: str, page: int = 1, page_size: int = 50) -> Optional[Dict[str, Any]]:
+        """Paginated epic summaries (no stories) for a run."""
+        if not self._ensure_epics(run_id):
+            return None
+        page, page_size = max(page, 1), max(min(page_size, 200), 1)
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM run_epics WHERE run_id = ?", (run_id,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT summary FROM run_epics WHERE run_id = ? ORDER BY position LIMIT ? OFFSET ?",
+            (run_id, page_size, (page - 1) * page_size)
+        ).fetchall()
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "epics": [json_utils.loads(r["summary"]) for r in rows],
+        }
+
+    def get_run_index(self, run_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Every epic with story ids/priority/labels only: enough to build
+        approval state and filters without loading story text.
+        """
+        if not self._ensure_epics(run_id):
+            return None
+        rows = self._conn().execute(
+            "SELECT skeleton FROM run_epics WHERE run_id = ? ORDER BY position", (run_id,)
+        ).fetchall()
+        return [json_utils.loads(r["skeleton"]) for r in rows]
+
+    def get_epic(self, run_id: str, epic_id: str) -> Optional[Dict[str, Any]]:
+        """One epic with its stories and review entry."""
+        if not self._ensure_epics(run_id):
+            return None
+        row = self._conn().execute(
+            "SELECT detail FROM run_epics WHERE run_id = ? AND epic_id = ? ORDER BY position LIMIT 1",
+            (run_id, str(epic_id))
+        ).fetchone()
+        return json_utils.loads(row["detail"]) if row else None
+
+    def iter_epics(self, run_id: str, batch_size: int = 50):
+        """
+        Yields every epic of a run (with stories) in order, reading
+        batch_size rows at a time by keyset on position. Each batch is a
+        fresh query on the calling thread's connection, so a streaming
+        response may advance the generator from any worker thread.
+        """
+        if not self._ensure_epics(run_id):
+            return
+        last = -1
+        while True:
+            rows = self._conn().execute(
+                "SELECT position, detail FROM run_epics WHERE run_id = ? AND position > ? "
+                "ORDER BY position LIMIT ?",
+                (run_id, last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield json_utils.loads(row["detail"])
+            last = rows[-1]["position"]
+
+    def run_exists(self, run_id: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone() is not None
@@ -0,0 +1,36 @@
+# backend/utils/file_utils.py
+
+import io
+
+from backend.utils import transcript_formats
+
+# vtt/srt captions and Slack/Teams json exports are normalized by transcript_formats
+SUPPORTED_EXTENSIONS = ["txt", "pdf", "docx", "md", *transcript_formats.EXTENSIONS]
+
+
+def extract_text(filename: str, data: bytes) -> str:
+    """
+    Extracts plain text from an uploaded transcript file.
+    Takes raw bytes (not a file handle) so callers can cache on the content.
+    """
+    filename = filename.lower()
+
+    if filename.endswith(".txt") or filename.endswith(".md"):
+        return data.decode("utf-8", errors="replace")
+
+    if filename.endswith(".pdf"):
+        import PyPDF2
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return "\n".join(
+            page.extract_text() or ""
+            for page in pdf_reader.pages
+        )
+
+    if filename.endswith(".docx"):
+        import docx2txt
+        return docx2txt.process(io.BytesIO(data))
+
+    if transcript_formats.is_supported(filename):
+        return transcript_formats.normalize_transcript(filename, io.BytesIO(data)).text
+
+    return ""
@@ -0,0 +1,40 @@
+# backend/utils/json_utils.py
+# Single place for JSON encode/decode. Uses orjson when it's installed
+# (several times faster on large nested results) and falls back to the
+# stdlib json module otherwise, with identical output types.
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(obj, indent: bool = False) -> str:
+    """Serializes obj to a JSON string (compact unless indent=True)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None, separators=None if indent else (",", ":"), ensure_ascii=False)
+
+
+def dumps_bytes(obj) -> bytes:
+    """Serializes obj to UTF-8 JSON bytes (for HTTP bodies / blobs)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return dumps(obj).encode("utf-8")
+
+
+def loads(data):
+    """Parses JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Parse errors raised by loads(); orjson.JSONDecodeError subclasses
+# json.JSONDecodeError, so callers can catch this either way.
+JSONDecodeError = json.JSONDecodeError
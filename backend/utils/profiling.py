@@ -0,0 +1,195 @@
+# backend/utils/profiling.py
+# Opt-in profiling of a single pipeline run / Streamlit rerun.
+#
+# Nothing here runs unless a caller creates a RunProfiler, so leaving the
+# hooks in production costs one flag check per request. A profile
+# captures, in PROFILE_DIR/<profile_id>/:
+#   - profile.pstats    cProfile stats (load with pstats / snakeviz)
+#   - profile.txt       top functions by cumulative time
+#   - stacks.collapsed  sampled stacks, one "a;b;c count" line per stack,
+#                       ready for flamegraph.pl / speedscope
+#   - stages.json       per-stage wall and CPU time + the summary above
+# Clients only ever get the profile id and the stage breakdown; the files
+# are served by id (GET /api/profiles/{id}/files/{name}), never by path.
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from backend import config
+from backend.utils import json_utils
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROFILE_DIR = config.get("PROFILE_DIR", os.path.join(ROOT_DIR, "data", "profiles"))
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(config.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+TOP_FUNCTIONS = 40
+
+# Files written per profile -> media type they are served with
+PROFILE_FILES = {
+    "profile.pstats": "application/octet-stream",
+    "profile.txt": "text/plain",
+    "stacks.collapsed": "text/plain",
+    "stages.json": "application/json",
+}
+
+
+def is_enabled(value) -> bool:
+    """Truthy flag values for the profile header / query param / env switch."""
+    return str(value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every interval and counts the
+    collapsed stacks. Unlike cProfile it also shows where the thread was
+    waiting (e.g. the event loop's selector while LLM calls are pending).
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RunProfiler:
+    """
+    Profiles everything that runs on the calling thread between start()
+    and stop() (use as a context manager), with named stages.
+
+    In the API the pipeline runs on the event loop, so cProfile and the
+    sampler also see other requests' work that interleaves with the run;
+    profile on a quiet worker for clean numbers. cpu_thread_s is the
+    profiled thread's CPU time, cpu_process_s the whole process's (it
+    includes asyncio.to_thread work such as span anchoring / sqlite).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.stages: List[Dict[str, Any]] = []
+        self._profile = cProfile.Profile()
+        self._sampler: Optional[StackSampler] = None
+        self._current = None
+        self._started = None
+        self.summary: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def _clock():
+        return time.perf_counter(), time.thread_time(), time.process_time()
+
+    def start(self):
+        self._started = self._clock()
+        self._sampler = StackSampler(threading.get_ident())
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def mark(self, stage: str):
+        """Ends the current stage (if any) and starts a new one."""
+        now = self._clock()
+        if self._current is not None:
+            name, (wall, thread_cpu, process_cpu) = self._current
+            self.stages.append({
+                "stage": name,
+                "wall_s": round(now[0] - wall, 4),
+                "cpu_thread_s": round(now[1] - thread_cpu, 4),
+                "cpu_process_s": round(now[2] - process_cpu, 4),
+            })
+        self._current = (stage, now) if stage is not None else None
+
+    def progress(self, stage: str, done: int = 0, total: int = 0, **detail):
+        """Pipeline progress callback: every stage change starts a new stage."""
+        if self._current is None or self._current[0] != stage:
+            self.mark(stage)
+
+    def stop(self) -> Dict[str, Any]:
+        self._profile.disable()
+        self._sampler.stop()
+        self.mark(None)
+        end = self._clock()
+        self.summary = {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "total": {
+                "wall_s": round(end[0] - self._started[0], 4),
+                "cpu_thread_s": round(end[1] - self._started[1], 4),
+                "cpu_process_s": round(end[2] - self._started[2], 4),
+            },
+            "stages": self.stages,
+            "samples": sum(self._sampler.stacks.values()),
+        }
+        try:
+            self._save()
+        except Exception as e:
+            print(f"Failed to write profile {self.profile_id}: {e}")
+        return self.summary
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _save(self):
+        out_dir = os.path.join(PROFILE_DIR, self.profile_id)
+        os.makedirs(out_dir, exist_ok=True)
+
+        self._profile.dump_stats(os.path.join(out_dir, "profile.pstats"))
+        text = io.StringIO()
+        pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(os.path.join(out_dir, "profile.txt"), "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        with open(os.path.join(out_dir, "stacks.collapsed"), "w", encoding="utf-8") as f:
+            f.write(self._sampler.collapsed())
+        with open(os.path.join(out_dir, "stages.json"), "w", encoding="utf-8") as f:
+            f.write(json_utils.dumps(self.summary, indent=True))
+
+
+def file_path(profile_id: str, name: str) -> Optional[str]:
+    """Server-side path of one of a stored profile's files, or None if unknown."""
+    if name not in PROFILE_FILES or not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id, name)
+    return path if os.path.isfile(path) else None
+
+
+def load_summary(profile_id: str) -> Optional[Dict[str, Any]]:
+    """Reads a stored profile's stages.json, or None if unknown."""
+    path = file_path(profile_id, "stages.json")
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        summary = json_utils.loads(f.read())
+    # profiles written by older versions recorded their directory
+    summary.pop("dir", None)
+    return summary
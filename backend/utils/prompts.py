@@ -16,7 +16,7 @@ Requirements:
 - Only produce JSON — do NOT include any explanatory text, commentary or markdown.
 - If you are unsure about a field (e.g., priority), set it to null rather than guessing.
 - Keep story titles concise (<= 12 words) and ensure acceptance_criteria is a short list (1–5 bullet items).
-- Preserve traceability by attaching source_span (start_char, end_char) where each artifact came from in the transcript, if available.
+- Do NOT output source_span or character offsets; traceability spans are computed from the transcript after generation.
 """
 
 SYSTEM_REVIEWER = """
@@ -54,8 +54,7 @@ Schema: AnalysisOutput
           "estimated_points": "integer or null",
           "assignee": "string or null",
           "labels": ["string", ...] or [],
-          "dependencies": ["story_id", ...] or [],
-          "source_span": {"start_char": int, "end_char": int} or null
+          "dependencies": ["story_id", ...] or []
         }
       ],
       "notes": "string or null"
@@ -128,7 +127,6 @@ Instructions:
    - acceptance_criteria (min 3 items)
    - priority (guess if missing)
    - dependencies (guess if missing)
-   - source_span (can be approximate)
 7) Your job is to INFER and EXPAND. 
    - If transcript gives one line: “Admin should manage drivers”, 
      → create 3 stories automatically:
@@ -0,0 +1,363 @@
+# backend/utils/resilience.py
+# Shared retry / circuit-breaker layer for upstream calls (Mistral, Jira).
+#
+#  - jittered exponential backoff ("full jitter") between attempts
+#  - Retry-After honoured on 429/503
+#  - a per-endpoint deadline bounding all attempts together
+#  - one circuit breaker per upstream that fails fast while it's down
+#  - counters for retries and breaker state, exposed via metrics()
+#  - an optional caller deadline (deadline_scope) that bounds every call
+#    made inside it, on top of the endpoint's own deadline
+#
+# Works with requests, httpx and mistralai exceptions without importing
+# any of them: status codes / headers are read off the exception.
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+from backend import config
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+# Statuses that guarantee the request was not processed, so even
+# non-idempotent calls (POST create issue) can be retried safely
+REJECTED_STATUS = frozenset({429, 503})
+
+# Exception class names (from requests / httpx / stdlib) for network failures
+CONNECT_ERRORS = frozenset({"ConnectError", "ConnectTimeout", "ConnectionRefusedError", "PoolTimeout"})
+TRANSIENT_ERRORS = CONNECT_ERRORS | frozenset({
+    "ConnectionError", "Timeout", "TimeoutError", "ReadTimeout", "WriteTimeout",
+    "TimeoutException", "TransportError", "RemoteProtocolError", "ReadError", "ChunkedEncodingError",
+})
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# time.monotonic() by which the current caller needs its answer. A context
+# variable so it follows the work into tasks started with gather(); an LLM
+# call coalesced by SingleFlight runs under the first caller's deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar("upstream_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while its circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline ran out; says nothing about upstream health."""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """
+    Every upstream call made inside the block must finish within seconds
+    from now (None: no limit). Nested scopes can only tighten the deadline.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the current deadline_scope expires, or None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive transient failures; while
+    open every call fails fast. After reset_timeout one trial call is let
+    through (half-open): success closes the breaker, failure re-opens it.
+    Thread-safe, since blocking clients call from worker threads.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.short_circuits = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)) if self.state == OPEN else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "short_circuits": self.short_circuits,
+            "retry_in_seconds": round(self.retry_in(), 1),
+        }
+
+
+def _status_and_headers(exc: BaseException):
+    """Status code and response headers from requests/httpx/mistralai errors."""
+    # `is None`, not `or`: a requests.Response is falsy for 4xx/5xx (__bool__ is .ok)
+    response = getattr(exc, "response", None)
+    if response is None:
+        response = getattr(exc, "raw_response", None)
+    status = getattr(exc, "status_code", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        headers = {}
+    return status, headers
+
+
+def _error_names(exc: BaseException):
+    return {cls.__name__ for cls in type(exc).__mro__}
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Parses Retry-After (delta-seconds or HTTP-date)."""
+    value = headers.get("Retry-After") or headers.get("retry-after") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException, idempotent: bool = True):
+    """
+    Returns (transient, retryable, retry_after). transient means upstream
+    looks unhealthy (counts against the breaker). Client errors (4xx other
+    than 429) are neither; non-idempotent calls only retry when the
+    request is known not to have been processed.
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return True, idempotent, None
+    status, headers = _status_and_headers(exc)
+    if status is not None:
+        transient = status in RETRYABLE_STATUS
+        retryable = transient if idempotent else status in REJECTED_STATUS
+        return transient, retryable, retry_after_seconds(headers)
+    names = _error_names(exc)
+    if names & CONNECT_ERRORS:
+        return True, True, None
+    if names & TRANSIENT_ERRORS:
+        return True, idempotent, None
+    return False, False, None
+
+
+class Endpoint:
+    """
+    Retry policy for one upstream endpoint, sharing its upstream's breaker.
+    Use call() for blocking functions and call_async() for coroutines.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, deadline: float = 60.0, idempotent: bool = True):
+        self.name = name
+        self.breaker = breaker
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idempotent = idempotent
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _check_deadline(self):
+        left = time_left()
+        if left is not None and left <= 0:
+            self._count("deadline_exceeded")
+            self._count("failures")
+            raise DeadlineExceeded(f"{self.name}: caller deadline exceeded")
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._count("failures")
+            raise CircuitOpenError(
+                f"{self.breaker.name} circuit open, failing fast (retry in {self.breaker.retry_in():.0f}s)"
+            )
+
+    def _next_delay(self, exc: BaseException, attempt: int, started: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up and re-raise."""
+        transient, retryable, retry_after = classify(exc, self.idempotent)
+        if transient:
+            self.breaker.record_failure()
+        else:
+            # upstream answered (e.g. 400/404): it is healthy, the request isn't
+            self.breaker.record_success()
+        # the breaker tripping mid-call also ends the retries (original error surfaces)
+        if not retryable or attempt >= self.max_attempts or self.breaker.state == OPEN:
+            return None
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        left = time_left()
+        if time.monotonic() - started + delay >= self.deadline or (left is not None and delay >= left):
+            self._count("deadline_exceeded")
+            return None
+        self._count("retries")
+        print(f"[{self.name}] attempt {attempt} failed ({type(exc).__name__}: {exc}); retrying in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            # a blocking call can't be interrupted, only not started late
+            self._check_deadline()
+            self._check_breaker()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(e, attempt, started)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    async def call_async(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self._count("calls")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._check_deadline()
+            self._check_breaker()
+            remaining = self.deadline - (time.monotonic() - started)
+            left = time_left()
+            caller_bound = left is not None and left < remaining
+            timeout = left if caller_bound else remaining
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=max(timeout, 0.001))
+            except asyncio.CancelledError:
+                # caller went away: release a half-open trial slot without judging upstream
+                self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if caller_bound and isinstance(e, asyncio.TimeoutError):
+                    # the caller's budget ran out, not upstream's patience
+                    self.breaker.release_trial()
+                    self._count("deadline_exceeded")
+                    self._count("failures")
+                    raise DeadlineExceeded(f"{self.name}: caller deadline exceeded") from None
+                delay = self._next_delay(e, attempt, started)
+                if delay is None:
+                    self._count("failures")
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({"upstream": self.breaker.name, "deadline_seconds": self.deadline, "max_attempts": self.max_attempts})
+        return stats
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_endpoints: Dict[str, Endpoint] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(upstream: str) -> CircuitBreaker:
+    """Shared breaker per upstream; thresholds from <UPSTREAM>_BREAKER_* config."""
+    with _registry_lock:
+        if upstream not in _breakers:
+            prefix = upstream.upper()
+            _breakers[upstream] = CircuitBreaker(
+                upstream,
+                failure_threshold=int(config.get(f"{prefix}_BREAKER_FAILURES", 5)),
+                reset_timeout=float(config.get(f"{prefix}_BREAKER_RESET_SECONDS", 30)),
+            )
+        return _breakers[upstream]
+
+
+def endpoint(name: str, upstream: str, **policy) -> Endpoint:
+    """
+    Registered Endpoint named e.g. "jira.create_issue". The deadline and
+    attempt count can be overridden with <UPSTREAM>_DEADLINE_SECONDS and
+    <UPSTREAM>_MAX_ATTEMPTS.
+    """
+    shared = breaker(upstream)
+    with _registry_lock:
+        if name not in _endpoints:
+            prefix = upstream.upper()
+            if config.get(f"{prefix}_DEADLINE_SECONDS"):
+                policy["deadline"] = float(config.get(f"{prefix}_DEADLINE_SECONDS"))
+            if config.get(f"{prefix}_MAX_ATTEMPTS"):
+                policy["max_attempts"] = int(config.get(f"{prefix}_MAX_ATTEMPTS"))
+            _endpoints[name] = Endpoint(name, shared, **policy)
+        return _endpoints[name]
+
+
+def metrics() -> Dict[str, Any]:
+    """Per-process retry counters and breaker states."""
+    return {
+        "breakers": {name: b.stats() for name, b in _breakers.items()},
+        "endpoints": {name: e.stats() for name, e in _endpoints.items()},
+    }
@@ -0,0 +1,67 @@
+# backend/utils/singleflight.py
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+from backend.utils import json_utils
+
+
+def make_key(*parts) -> str:
+    """Stable hash key from JSON-serializable parts (e.g. transcript + config)."""
+    return hashlib.sha256(json_utils.dumps_bytes(list(parts))).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls with the same key onto one execution.
+
+    The first caller for a key starts the work as its own task; callers
+    arriving while it's in flight attach to that task and all receive the
+    same result (or exception). The work is cancelled only if every
+    attached caller goes away. Nothing is cached after completion.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._flights[key] = flight
+            self.executions += 1
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: one caller being cancelled must not cancel shared work
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "executions": self.executions, "coalesced": self.coalesced}
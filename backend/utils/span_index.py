@@ -0,0 +1,148 @@
+# backend/utils/span_index.py
+# Local source_span anchoring. Instead of asking the LLM to guess character
+# offsets, index the transcript once and locate each epic/story by the
+# densest region of its (fuzzily matched) words.
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from backend.models.requirements import Epic, SourceSpan, Story
+
+TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an the and or but if then else when while of to in on at by for with from into onto over under
+is are was were be been being am do does did doing have has had having can could should would will
+shall may might must it its this that these those there here i me my we our you your he she they them
+their his her as so not no yes also just than too very all any each some such only own same more most
+other user users able want wants need needs story epic system should
+""".split())
+
+SUFFIXES = ("ations", "ation", "ments", "ment", "ings", "ing", "ness", "ers", "ies", "ied", "ed", "er", "es", "ly", "s")
+
+# Largest region (in tokens) a single story is expected to come from
+STORY_WINDOW_TOKENS = 120
+# Minimum number of distinct query stems that must match to trust a span
+MIN_MATCHED_STEMS = 2
+
+
+def stem(word: str) -> str:
+    """Cheap suffix-stripping stemmer: 'drivers'/'driver', 'exporting'/'export'."""
+    word = word.lower()
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def content_stems(text: str) -> List[str]:
+    return [stem(m.group()) for m in TOKEN_RE.finditer(text or "") if m.group().lower() not in STOPWORDS]
+
+
+class TranscriptIndex:
+    """
+    Inverted index over stemmed transcript tokens (unigrams + bigrams)
+    with character offsets, built once per transcript.
+    """
+
+    def __init__(self, transcript: str):
+        self.transcript = transcript
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+
+        prev = None
+        for m in TOKEN_RE.finditer(transcript):
+            word = m.group()
+            if word.lower() in STOPWORDS:
+                continue
+            pos = len(self.starts)
+            self.starts.append(m.start())
+            self.ends.append(m.end())
+            s = stem(word)
+            self.postings.setdefault(s, []).append(pos)
+            if prev is not None:
+                self.postings.setdefault(prev + " " + s, []).append(pos - 1)
+            prev = s
+
+        self.n_tokens = len(self.starts)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log((self.n_tokens + 1) / (df + 0.5)) if df else 0.0
+
+    def locate(self, text: str, window: int = STORY_WINDOW_TOKENS) -> Optional[SourceSpan]:
+        """
+        Returns the span of the transcript region that best matches text,
+        or None when the match is too weak to trust.
+        """
+        stems = content_stems(text)
+        if not stems or not self.n_tokens:
+            return None
+
+        terms = set(stems) | {a + " " + b for a, b in zip(stems, stems[1:])}
+        weights = {t: self._idf(t) * (2.0 if " " in t else 1.0) for t in terms}
+
+        # (token position, term) for every occurrence of a query term
+        hits: List[Tuple[int, str]] = sorted(
+            (pos, term) for term in terms if weights[term] > 0 for pos in self.postings[term]
+        )
+        if not hits:
+            return None
+
+        # Densest window: two pointers over hits, counting each term once
+        best_score, best = 0.0, None
+        counts: Dict[str, int] = {}
+        score, left = 0.0, 0
+        for right, (pos, term) in enumerate(hits):
+            counts[term] = counts.get(term, 0) + 1
+            if counts[term] == 1:
+                score += weights[term]
+            while pos - hits[left][0] >= window:
+                left_term = hits[left][1]
+                counts[left_term] -= 1
+                if counts[left_term] == 0:
+                    score -= weights[left_term]
+                left += 1
+            if score > best_score:
+                best_score, best = score, (left, right)
+
+        if best is None:
+            return None
+        left, right = best
+        matched_unigrams = {t for _, t in hits[left:right + 1] if " " not in t}
+        if len(matched_unigrams) < min(MIN_MATCHED_STEMS, len(set(stems))):
+            return None
+
+        first_pos, last_pos = hits[left][0], hits[right][0]
+        if " " in hits[right][1]:  # bigram hit covers the next token too
+            last_pos = min(last_pos + 1, self.n_tokens - 1)
+        return SourceSpan(self.starts[first_pos], self.ends[last_pos])
+
+
+def story_text(story: Story) -> str:
+    return " ".join([story.title, story.description] + story.acceptance_criteria)
+
+
+def anchor_spans(epics: List[Epic], transcript: str, index: Optional[TranscriptIndex] = None):
+    """
+    Sets source_span on every epic and story in place. A story's span is
+    its best-matching region; an epic's span covers its own match and
+    all its stories' spans. Unlocatable items get None.
+    """
+    index = index or TranscriptIndex(transcript)
+    for epic in epics:
+        spans = []
+        for story in epic.stories:
+            story.source_span = index.locate(story_text(story))
+            if story.source_span:
+                spans.append(story.source_span)
+
+        own = index.locate(f"{epic.title} {epic.description}", window=4 * STORY_WINDOW_TOKENS)
+        if own:
+            spans.append(own)
+        epic.source_span = SourceSpan(
+            min(s.start_char for s in spans), max(s.end_char for s in spans)
+        ) if spans else None
+    return epics
@@ -0,0 +1,413 @@
+# backend/utils/transcript_formats.py
+# Streaming parsers for caption files (WebVTT / SRT) and chat exports
+# (Slack / Teams JSON).
+#
+# Meeting recordings come as multi-hour captions where every cue is a
+# couple of seconds of one speaker, wrapped in timing lines, cue ids and
+# styling tags. The parsers read the upload incrementally (line by line,
+# or one JSON message at a time) and write one "Speaker: text" line per
+# speaker turn:
+#   - consecutive cues/messages of the same speaker are merged
+#   - timing lines, cue ids, NOTE/STYLE/REGION blocks, inline timestamps,
+#     markup and rolling-caption repeats are dropped
+# Memory is bounded by the normalized text plus one small offsets entry
+# per turn, never by the size of the upload.
+
+import codecs
+import html
+import io
+import json
+import re
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+CAPTION_EXTENSIONS = ("vtt", "srt")
+CHAT_EXTENSIONS = ("json",)
+EXTENSIONS = CAPTION_EXTENSIONS + CHAT_EXTENSIONS
+
+# Bytes decoded per read
+CHUNK_SIZE = 64 * 1024
+# Same-speaker cues further apart than this start a new turn
+MERGE_GAP_MS = 5 * 60 * 1000
+# Longer turns are split (captions without speakers would otherwise
+# become one line)
+MAX_TURN_CHARS = 2000
+# A single chat message larger than this means the JSON isn't an export
+MAX_JSON_ITEM_CHARS = 16 * 1024 * 1024
+# Keys holding the message array in Teams / Graph exports
+JSON_MESSAGE_KEYS = ("value", "messages")
+
+TIMESTAMP_RE = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})(?:[.,](\d{1,3}))?")
+VOICE_RE = re.compile(r"<v(?:\.[^\s>]*)?\s+([^>]+)>")
+TAG_RE = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+# "Name: text" caption lines: up to four capitalized words ("Dr. Jane Doe",
+# "Speaker 2"), so "Next step: ..." isn't taken for a speaker
+SPEAKER_PREFIX_RE = re.compile(r"^([A-Z][\w.'\-]*(?: (?:[A-Z][\w.'\-]*|\d+)){0,3}):\s+(.*)$")
+# Capitalized prefixes that label a line rather than name a speaker
+NOT_SPEAKERS = frozenset((
+    "action", "actions", "agenda", "answer", "decision", "decisions", "example", "fyi", "important",
+    "next", "note", "notes", "question", "re", "summary", "todo", "update", "warning",
+))
+SEPARATOR_RE = re.compile(r"[\s,]*")
+SLACK_LINK_RE = re.compile(r"<([^|>]+)\|([^>]+)>|<([^>]+)>")
+
+# Slack message subtypes that aren't part of the conversation
+SLACK_SKIP_SUBTYPES = frozenset((
+    "channel_join", "channel_leave", "channel_topic", "channel_purpose", "channel_name",
+    "channel_archive", "channel_unarchive", "group_join", "group_leave", "pinned_item", "unpinned_item",
+))
+
+
+class TranscriptOffsets:
+    """
+    Maps positions in the normalized text back to the source: one entry
+    per speaker turn (text offset, start/end time in ms, source line or
+    message number), stored in flat arrays. Caption times are relative to
+    the recording start, chat times are Unix epoch ms; -1 when unknown.
+    """
+
+    def __init__(self):
+        self.text_starts = array("q")
+        self.start_ms = array("q")
+        self.end_ms = array("q")
+        self.source_lines = array("q")
+
+    def __len__(self):
+        return len(self.text_starts)
+
+    def add(self, text_start: int, start_ms: Optional[int], end_ms: Optional[int], source_line: int):
+        self.text_starts.append(text_start)
+        self.start_ms.append(-1 if start_ms is None else start_ms)
+        self.end_ms.append(-1 if end_ms is None else end_ms)
+        self.source_lines.append(source_line)
+
+    def locate(self, char_offset: int) -> Optional[dict]:
+        """The turn containing char_offset: {turn, text_start, start_ms, end_ms, source_line}."""
+        i = bisect_right(self.text_starts, char_offset) - 1
+        if i < 0:
+            return None
+        return {
+            "turn": i,
+            "text_start": self.text_starts[i],
+            "start_ms": self.start_ms[i],
+            "end_ms": self.end_ms[i],
+            "source_line": self.source_lines[i],
+        }
+
+
+@dataclass(slots=True)
+class NormalizedTranscript:
+    text: str
+    offsets: TranscriptOffsets
+    format: str
+    cues: int
+    speakers: int
+    duration_ms: Optional[int] = None
+
+
+# (speaker or None, text, start_ms, end_ms, source line / message number)
+Cue = Tuple[Optional[str], str, Optional[int], Optional[int], int]
+
+
+def is_supported(filename: str) -> bool:
+    return filename.lower().rsplit(".", 1)[-1] in EXTENSIONS
+
+
+def _iter_lines(stream) -> Iterator[str]:
+    """Decoded lines of a binary stream, CHUNK_SIZE bytes at a time (BOM dropped)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        pending += decoder.decode(chunk, final=not chunk)
+        lines = pending.splitlines(keepends=True)
+        # the last piece may be cut mid-line (or between \r and \n)
+        pending = lines.pop() if lines and chunk and not lines[-1].endswith("\n") else ""
+        for line in lines:
+            yield line.rstrip("\r\n")
+        if not chunk:
+            if pending:
+                yield pending
+            return
+
+
+def _iter_chunks(stream) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def parse_timestamp(value: str) -> Optional[int]:
+    """'01:02:03.450' / '02:03,450' / '1:02:03' -> milliseconds."""
+    match = TIMESTAMP_RE.search(value)
+    if not match:
+        return None
+    hours, minutes, seconds, millis = match.groups()
+    millis = (millis or "0").ljust(3, "0")
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def _clean(text: str) -> str:
+    """Markup and entities removed, whitespace collapsed (plain lines skip the regex)."""
+    if "<" in text or "{" in text:
+        text = TAG_RE.sub("", text)
+    if "&" in text:
+        text = html.unescape(text)
+    return " ".join(text.split())
+
+
+# -----------------------
+# Captions (WebVTT / SRT)
+# -----------------------
+def _caption_cue(block, line_no: int, previous):
+    """
+    (cue or None, (speaker, payload lines)) of one blank-line separated
+    block; previous is the last cue's (speaker, payload lines).
+    """
+    timing_at = next((i for i, line in enumerate(block) if "-->" in line), None)
+    if timing_at is None:
+        return None, previous
+    start, _, end = block[timing_at].partition("-->")
+    speaker, lines = None, []
+    for line in block[timing_at + 1:]:
+        voice = VOICE_RE.search(line)
+        if voice:
+            speaker = " ".join(voice.group(1).split())
+        text = _clean(line).lstrip("- ").strip()
+        if not voice and speaker is None:
+            named = SPEAKER_PREFIX_RE.match(text)
+            if named and named.group(1).split()[0].lower().rstrip(".") not in NOT_SPEAKERS:
+                speaker, text = named.group(1), named.group(2)
+        if text:
+            lines.append(text)
+    # rolling captions repeat the previous cue's lines before the new one
+    repeated = previous[1] if previous[0] == speaker else ()
+    new = [text for text in lines if text not in repeated]
+    if not new:
+        return None, (speaker, lines)
+    cue = (speaker, " ".join(new), parse_timestamp(start), parse_timestamp(end), line_no + timing_at)
+    return cue, (speaker, lines)
+
+
+def iter_caption_cues(lines: Iterable[str]) -> Iterator[Cue]:
+    """
+    Cues of a WebVTT or SRT file, in order. Blocks without a timing line
+    (the WEBVTT header, NOTE / STYLE / REGION) are skipped; the speaker
+    comes from a <v Name> voice tag or a "Name: " prefix.
+    """
+    block, block_line, previous = [], 0, (None, ())
+    for line_no, line in enumerate(lines, start=1):
+        if line.strip():
+            if not block:
+                block_line = line_no
+            block.append(line)
+            continue
+        if block:
+            cue, previous = _caption_cue(block, block_line, previous)
+            if cue is not None:
+                yield cue
+            block = []
+    if block:
+        cue, _ = _caption_cue(block, block_line, previous)
+        if cue is not None:
+            yield cue
+
+
+# -----------------------
+# Chat exports (Slack / Teams JSON)
+# -----------------------
+def iter_json_items(chunks: Iterable[str]) -> Iterator:
+    """
+    Messages of a chat export, decoded one at a time. A Slack channel
+    export is a top-level array; Teams / Graph exports wrap it as
+    {"value": [...]} or {"messages": [...]}, and the other keys of the
+    object are skipped (their values may contain arrays too). Only the
+    element being decoded is buffered. stdlib json: orjson can't decode
+    a prefix.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    # start -> [object: key -> colon -> value, repeated] -> items
+    state, key = "start", None
+    chunks = iter(chunks)
+    while True:
+        chunk = next(chunks, None)
+        eof = chunk is None
+        # keep only the undecoded tail, then append the new text
+        buffer = buffer[pos:] + (chunk or "")
+        pos = 0
+
+        while True:
+            pos = SEPARATOR_RE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+            if state == "start":
+                if char not in "[{":
+                    raise ValueError("JSON export must be an array or an object")
+                state = "items" if char == "[" else "key"
+                pos += 1
+                continue
+            if state == "colon":
+                if char != ":":
+                    raise ValueError("Invalid JSON export: expected ':' after an object key")
+                state = "value"
+                pos += 1
+                continue
+            if (state == "items" and char == "]") or (state == "key" and char == "}"):
+                return
+            if state == "value" and char == "[" and key in JSON_MESSAGE_KEYS:
+                state = "items"
+                pos += 1
+                continue
+            try:
+                item, pos_after = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid or truncated JSON export: {e}") from None
+                if len(buffer) - pos > MAX_JSON_ITEM_CHARS:
+                    raise ValueError("JSON export element too large") from None
+                break
+            if pos_after == len(buffer) and not eof:
+                break  # a number may continue in the next chunk
+            pos = pos_after
+            if state == "items":
+                yield item
+            elif state == "key":
+                if not isinstance(item, str):
+                    raise ValueError("Invalid JSON export: object keys must be strings")
+                state, key = "colon", item
+            else:
+                state = "key"
+        if eof:
+            if state != "start":
+                raise ValueError("Invalid or truncated JSON export")
+            return
+
+
+def _epoch_ms(value) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    try:
+        return int(float(value) * 1000)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+def _slack_text(text: str) -> str:
+    # <https://x|label> -> label, <@U123> -> @U123, <#C1|general> -> general
+    text = SLACK_LINK_RE.sub(lambda m: m.group(2) or m.group(3), text)
+    return " ".join(html.unescape(text).split())
+
+
+def chat_cue(message, number: int) -> Optional[Cue]:
+    """One Slack or Teams message -> cue; None for system / empty messages."""
+    if not isinstance(message, dict):
+        return None
+    if "body" in message or "from" in message:
+        # Teams (Microsoft Graph chatMessage)
+        if message.get("messageType", "message") != "message" or message.get("deletedDateTime"):
+            return None
+        sender = message.get("from") or {}
+        who = sender.get("user") or sender.get("application") or {}
+        body = message.get("body") or {}
+        content = body.get("content") or ""
+        text = _clean(content) if body.get("contentType") == "html" else " ".join(content.split())
+        speaker = who.get("displayName")
+        time_ms = _epoch_ms(message.get("createdDateTime"))
+    else:
+        # Slack
+        if message.get("subtype") in SLACK_SKIP_SUBTYPES:
+            return None
+        profile = message.get("user_profile") or {}
+        speaker = (profile.get("real_name") or profile.get("display_name")
+                   or message.get("user_name") or message.get("username") or message.get("user"))
+        text = _slack_text(message.get("text") or "")
+        time_ms = _epoch_ms(message.get("ts"))
+    if not text:
+        return None
+    return speaker, text, time_ms, time_ms, number
+
+
+def iter_chat_cues(chunks: Iterable[str]) -> Iterator[Cue]:
+    for number, message in enumerate(iter_json_items(chunks), start=1):
+        cue = chat_cue(message, number)
+        if cue is not None:
+            yield cue
+
+
+# -----------------------
+# Normalized output
+# -----------------------
+def merge_turns(cues: Iterable[Cue], out, offsets: TranscriptOffsets):
+    """
+    Writes one "Speaker: text" line per turn of consecutive same-speaker
+    cues to out and records each turn in offsets. Returns (cues, speakers,
+    first start_ms, last end_ms).
+    """
+    position, count, speakers = 0, 0, set()
+    first_ms = last_ms = None
+    turn = None  # [speaker, parts, chars, start_ms, end_ms, source_line]
+
+    def flush():
+        nonlocal position
+        speaker, parts, _, start_ms, end_ms, source_line = turn
+        line = (f"{speaker}: " if speaker else "") + " ".join(parts) + "\n"
+        offsets.add(position, start_ms, end_ms, source_line)
+        out.write(line)
+        position += len(line)
+
+    for speaker, text, start_ms, end_ms, source_line in cues:
+        count += 1
+        if speaker:
+            speakers.add(speaker)
+        if first_ms is None:
+            first_ms = start_ms
+        last_ms = end_ms if end_ms is not None else last_ms
+
+        if turn is not None:
+            gap = None if start_ms is None or turn[4] is None else start_ms - turn[4]
+            if turn[0] == speaker and turn[2] + len(text) < MAX_TURN_CHARS and (gap is None or gap <= MERGE_GAP_MS):
+                turn[1].append(text)
+                turn[2] += len(text) + 1
+                turn[4] = end_ms if end_ms is not None else turn[4]
+                continue
+            flush()
+        turn = [speaker, [text], len(text), start_ms, end_ms, source_line]
+
+    if turn is not None:
+        flush()
+    return count, len(speakers), first_ms, last_ms
+
+
+def normalize_transcript(filename: str, stream) -> NormalizedTranscript:
+    """
+    Parses a caption file or chat export from a binary stream (read
+    incrementally) into normalized transcript text + offsets.
+    """
+    kind = filename.lower().rsplit(".", 1)[-1]
+    if kind in CAPTION_EXTENSIONS:
+        cues = iter_caption_cues(_iter_lines(stream))
+    elif kind in CHAT_EXTENSIONS:
+        cues = iter_chat_cues(_iter_chunks(stream))
+    else:
+        raise ValueError(f"Unsupported transcript format: {filename}")
+
+    out, offsets = io.StringIO(), TranscriptOffsets()
+    count, speakers, first_ms, last_ms = merge_turns(cues, out, offsets)
+    duration = last_ms - first_ms if first_ms is not None and last_ms is not None else None
+    return NormalizedTranscript(
+        text=out.getvalue(), offsets=offsets, format=kind, cues=count, speakers=speakers, duration_ms=duration,
+    )
@@ -0,0 +1,121 @@
+# benchmarks/bench_json_transport.py
+# Micro-benchmark for the JSON transport path of /api/process results:
+# serialize / deserialize time and payload size (raw, gzip, brotli),
+# stdlib json (old path) vs backend.utils.json_utils (orjson).
+#
+# Usage: python benchmarks/bench_json_transport.py [--stories 500] [--repeat 20]
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from backend.utils import json_utils
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = (
+    "admin driver fleet vehicle attendance employee report export dashboard filter "
+    "notification role permission schedule route check-in gps geo-fence approval "
+    "invoice search audit history settings profile manager shift payroll"
+).split()
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def make_result(total_stories: int, stories_per_epic: int = 10, seed: int = 7) -> dict:
+    """Builds a pipeline result shaped like RequirementsPipeline.run output."""
+    rng = random.Random(seed)
+    epics, reviews = [], []
+    n_epics = max(1, total_stories // stories_per_epic)
+    for e in range(n_epics):
+        epic_id = f"epic-{e + 1}"
+        stories = []
+        for s in range(stories_per_epic):
+            stories.append({
+                "id": f"story-{e + 1}-{s + 1}",
+                "title": sentence(rng, 6),
+                "description": "As a user, " + sentence(rng, 30),
+                "acceptance_criteria": [sentence(rng, 12) for _ in range(rng.randint(3, 5))],
+                "priority": rng.choice(["High", "Medium", "Low"]),
+                "dependencies": [],
+                "labels": rng.sample(WORDS, 2),
+                "source_span": {"start_char": rng.randint(0, 50000), "end_char": rng.randint(50000, 90000)},
+            })
+        epics.append({
+            "id": epic_id,
+            "title": sentence(rng, 5),
+            "description": sentence(rng, 40),
+            "priority": rng.choice(["high", "medium", "low"]),
+            "labels": rng.sample(WORDS, 3),
+            "stories": stories,
+        })
+        reviews.append({"id": epic_id, "clarity_ok": rng.random() > 0.3, "missing_fields": [], "notes": sentence(rng, 15)})
+    return {
+        "planner_output": {"epics": epics, "context": {}},
+        "reviewer_output": {"review": {"epics": reviews, "context": {}}},
+        "run_id": "0" * 32,
+    }
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON transport micro-benchmark")
+    parser.add_argument("--stories", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = {"success": True, "result": make_result(args.stories)}
+
+    # Old path: FastAPI's default encoder ends in json.dumps; reviewer used indent=2
+    old_body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    new_body = json_utils.dumps_bytes(payload)
+
+    rows = [
+        ("stdlib json", lambda: json.dumps(payload, ensure_ascii=False).encode("utf-8"), lambda: json.loads(old_body)),
+        ("json_utils (" + ("orjson" if json_utils.orjson else "stdlib fallback") + ")",
+         lambda: json_utils.dumps_bytes(payload), lambda: json_utils.loads(new_body)),
+    ]
+
+    print(f"Result with {args.stories} stories, best of {args.repeat} runs\n")
+    print(f"{'encoder':34} {'serialize ms':>13} {'deserialize ms':>15}")
+    for name, enc, dec in rows:
+        print(f"{name:34} {timed(enc, args.repeat):13.2f} {timed(dec, args.repeat):15.2f}")
+
+    reviewer_old = len(json.dumps(payload["result"]["planner_output"], indent=2))
+    reviewer_new = len(json_utils.dumps(payload["result"]["planner_output"]))
+    print(f"\nReviewer prompt payload: {reviewer_old:,} chars (indent=2) -> {reviewer_new:,} chars (compact)")
+
+    print(f"\n{'encoding':34} {'bytes':>13} {'encode ms':>15}")
+    print(f"{'identity':34} {len(new_body):13,} {'-':>15}")
+    gz = gzip.compress(new_body, compresslevel=9)
+    print(f"{'gzip (level 9)':34} {len(gz):13,} {timed(lambda: gzip.compress(new_body, compresslevel=9), 5):15.2f}")
+    if brotli is not None:
+        br = brotli.compress(new_body, quality=4)
+        print(f"{'brotli (quality 4)':34} {len(br):13,} {timed(lambda: brotli.compress(new_body, quality=4), 5):15.2f}")
+    else:
+        print(f"{'brotli':34} {'(brotli not installed)':>13}")
+
+
+if __name__ == "__main__":
+    main()
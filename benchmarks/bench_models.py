@@ -0,0 +1,486 @@
+# benchmarks/bench_models.py
+# Model / prompt comparison on the golden transcripts (benchmarks/golden):
+# every (model, prompt variant) pair runs the full RequirementsPipeline over
+# the corpus and the variants are reported side by side: latency, prompt /
+# completion tokens, JSON parse failures, stories per epic, schema
+# conformance, review coverage and keyword recall (expectations.json).
+#
+# Where responses come from (--mode):
+#   live    Mistral, or a local Mistral-compatible stand-in server when
+#           MISTRAL_SERVER_URL is set; --record saves every response
+#   replay  responses recorded by a live --record run (offline, repeatable)
+#   stub    synthetic schema-valid responses: no network, checks the
+#           harness and measures pipeline overhead (quality numbers are
+#           meaningless)
+#
+# A prompt variant is a JSON file of overrides for backend/utils/prompts.py
+# ({"REVIEWER_FEW_SHOT": "..."}; "story_generator.SYSTEM_PROMPT" for the
+# story generator's prompt). "baseline" runs the prompts unchanged.
+#
+# Usage: python benchmarks/bench_models.py [--mode replay] [--model mistral-small-latest ...]
+#            [--prompts baseline --prompts benchmarks/prompt_variants/reviewer_no_few_shot.json]
+#            [--repeat 1] [--record] [--story-batching] [--json report.json]
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import functools
+import glob
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+BENCH_DIR = os.path.join(ROOT_DIR, "benchmarks")
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+RECORDINGS_PATH = os.path.join(BENCH_DIR, "recordings", "responses.jsonl")
+
+from backend.agents import story_generator
+from backend.agents.pipeline import RequirementsPipeline
+from backend.agents.planner import PlannerAgent
+from backend.agents.reviewer import ReviewerAgent, clean_json_output, extract_json_block
+from backend.agents.story_generator import StoryGeneratorAgent, estimate_tokens
+from backend.llm.llm_client import FINISH_LENGTH, LLMClient
+from backend.models.requirements import PRIORITIES
+from backend.storage.history_store import HistoryStore
+from backend.utils import json_utils, prompts
+from backend.utils.singleflight import make_key
+
+# Modules a prompt variant may override constants of
+PROMPT_MODULES = {"prompts": prompts, "story_generator": story_generator}
+# The planner prompt asks for at least this many acceptance criteria per story
+MIN_CRITERIA = 3
+
+# Agent making the current LLM call (set around the agents' entry points;
+# single-flight tasks inherit it)
+current_agent = contextvars.ContextVar("bench_agent", default="other")
+
+AGENT_METHODS = [
+    (PlannerAgent, "generate_requirements_async", "planner"),
+    (StoryGeneratorAgent, "generate_stories_for_epic_async", "stories"),
+    (StoryGeneratorAgent, "generate_stories_for_epics_async", "stories"),
+    (ReviewerAgent, "review_requirements_async", "reviewer"),
+]
+
+
+class MissingRecording(Exception):
+    """Replay mode got a request that was never recorded."""
+
+
+def tag_agents():
+    for cls, name, agent in AGENT_METHODS:
+        original = getattr(cls, name)
+
+        @functools.wraps(original)
+        async def tagged(self, *args, _original=original, _agent=agent, **kwargs):
+            token = current_agent.set(_agent)
+            try:
+                return await _original(self, *args, **kwargs)
+            finally:
+                current_agent.reset(token)
+
+        setattr(cls, name, tagged)
+
+
+def parses_as_json(content: str) -> bool:
+    """Whether the agents' cleanup (fences, prose around the JSON) yields valid JSON."""
+    cleaned = clean_json_output(content)
+    try:
+        json_utils.loads(cleaned)
+        return True
+    except Exception:
+        pass
+    try:
+        json_utils.loads(extract_json_block(cleaned))
+        return True
+    except Exception:
+        return False
+
+
+class Recordings:
+    """Responses by request key, persisted as JSON lines (the last line for a key wins)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json_utils.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def add(self, entry):
+        self.entries[entry["key"]] = entry
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json_utils.dumps(entry) + "\n")
+
+
+# -----------------------
+# Stub responses
+# -----------------------
+def _stub_story(n: int, topic: str, epic_id: str = None):
+    story = {
+        "id": f"S{n}",
+        "title": f"{topic} ({n})",
+        "description": f"As a user, I want {topic.lower()} so that the workflow is covered.",
+        "acceptance_criteria": ["Given the screen is open", "When the user acts", "Then the change is saved"],
+        "priority": PRIORITIES[n % len(PRIORITIES)],
+        "dependencies": [],
+    }
+    if epic_id:
+        story["epic_id"] = epic_id
+    return story
+
+
+def stub_content(agent: str, messages) -> str:
+    user = messages[1]["content"]
+    if agent == "planner":
+        match = re.search(r'Transcript:\s*"""(.*?)"""', user, re.S)
+        lines = [line.split(":", 1)[-1].strip() for line in (match.group(1) if match else user).splitlines()]
+        lines = [line for line in lines if line]
+        epics, stories = [], []
+        for i in range(max(1, min(4, len(lines) // 3))):
+            topic = " ".join(lines[i * 3].split()[:6]) if lines else "Requirements"
+            epics.append({"id": f"E{i + 1}", "title": topic, "description": " ".join(lines[i * 3:i * 3 + 3]),
+                          "priority": "High" if i == 0 else "Medium"})
+            stories.append(_stub_story(i + 1, topic, f"E{i + 1}"))
+        return json_utils.dumps({"epics": epics, "stories": stories})
+    if agent == "stories":
+        epic_ids = re.findall(r'"epic_id":\s*"([^"]+)"', user)
+        if epic_ids:
+            return json_utils.dumps({e: [_stub_story(n, f"Story for {e}") for n in range(1, 4)] for e in epic_ids})
+        title = re.search(r"EPIC TITLE: (.*)", user)
+        topic = title.group(1).strip() if title else "Story"
+        return json_utils.dumps([_stub_story(n, topic) for n in range(1, 4)])
+    if agent == "reviewer":
+        plan = json_utils.loads(user.split("HERE IS THE INPUT:\n", 1)[1])
+        return json_utils.dumps({"review": {"epics": [
+            {"id": epic.get("id"), "clarity_ok": True, "missing_fields": [], "notes": ""} for epic in plan.get("epics", [])
+        ]}})
+    return "{}"
+
+
+# -----------------------
+# SDK client stand-in
+# -----------------------
+class BenchClient:
+    """
+    Takes the place of the mistralai async client behind LLMClient:
+    answers chat.complete_async() from Mistral, the recordings or the stub,
+    and logs one entry per call for the report.
+    """
+
+    def __init__(self, mode: str, recordings: Recordings, record: bool = False, replay_latency: bool = False):
+        self.mode = mode
+        self.recordings = recordings
+        self.record = record
+        self.replay_latency = replay_latency
+        self.chat = self
+        self.calls = []
+        self._live = None
+
+    def _live_client(self):
+        if self._live is None:
+            self._live = LLMClient()._new_client()
+        return self._live
+
+    async def complete_async(self, model, messages, temperature, max_tokens, **kwargs):
+        key = make_key(model, messages, temperature, max_tokens)
+        agent = current_agent.get()
+        started = time.perf_counter()
+
+        if self.mode == "replay":
+            entry = self.recordings.get(key)
+            if entry is None:
+                raise MissingRecording(f"No recorded {agent} response for {model}; record it with --mode live --record")
+            if self.replay_latency:
+                await asyncio.sleep(entry["latency_s"])
+        elif self.mode == "stub":
+            content = stub_content(agent, messages)
+            entry = {"content": content, "finish_reason": "stop", "prompt_tokens": None,
+                     "completion_tokens": estimate_tokens(content)}
+        else:
+            response = await self._live_client().chat.complete_async(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **kwargs
+            )
+            usage = getattr(response, "usage", None)
+            choice = response.choices[0]
+            entry = {
+                "key": key, "model": model, "agent": agent,
+                "content": choice.message.content or "", "finish_reason": choice.finish_reason,
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+                "latency_s": round(time.perf_counter() - started, 4),
+            }
+            if self.record:
+                self.recordings.add(entry)
+
+        content = entry["content"]
+        prompt_tokens = entry.get("prompt_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        # Only a whole answer can be judged: continuations and cut-off parts are partial JSON
+        complete = not messages[-1].get("prefix") and entry["finish_reason"] != FINISH_LENGTH
+        self.calls.append({
+            "agent": agent,
+            "latency_s": time.perf_counter() - started,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": entry.get("completion_tokens") or estimate_tokens(content),
+            "truncated": entry["finish_reason"] == FINISH_LENGTH,
+            "json_ok": parses_as_json(content) if complete else None,
+        })
+
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=entry["finish_reason"])])
+
+
+# -----------------------
+# Variants and corpus
+# -----------------------
+def load_variant(spec: str):
+    """'baseline' or a JSON overrides file -> (name, overrides)."""
+    if spec == "baseline":
+        return "baseline", {}
+    with open(spec, encoding="utf-8") as f:
+        overrides = json_utils.loads(f.read())
+    for name in overrides:
+        module_name, _, attr = name.rpartition(".")
+        module = PROMPT_MODULES.get(module_name or "prompts")
+        if module is None or not hasattr(module, attr):
+            raise SystemExit(f"{spec}: unknown prompt {name}")
+    return os.path.splitext(os.path.basename(spec))[0], overrides
+
+
+@contextlib.contextmanager
+def prompt_overrides(overrides):
+    saved = []
+    try:
+        for name, text in overrides.items():
+            module_name, _, attr = name.rpartition(".")
+            module = PROMPT_MODULES[module_name or "prompts"]
+            saved.append((module, attr, getattr(module, attr)))
+            setattr(module, attr, text)
+        yield
+    finally:
+        for module, attr, value in reversed(saved):
+            setattr(module, attr, value)
+
+
+def load_corpus(directory: str):
+    """[(name, transcript, expectations)] for every golden .txt file."""
+    expectations = {}
+    path = os.path.join(directory, "expectations.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            expectations = json_utils.loads(f.read())
+    corpus = []
+    for txt in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        name = os.path.splitext(os.path.basename(txt))[0]
+        with open(txt, encoding="utf-8") as f:
+            corpus.append((name, f.read(), expectations.get(name, {})))
+    return corpus
+
+
+# -----------------------
+# Scoring
+# -----------------------
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("-", " ").split())
+
+
+def story_conforms(story) -> bool:
+    return bool(
+        story.get("title") and story.get("description")
+        and len(story.get("acceptance_criteria") or []) >= MIN_CRITERIA
+        and story.get("priority") in PRIORITIES
+    )
+
+
+def score_result(result, expected):
+    epics = result["planner_output"].get("epics", [])
+    stories = [s for epic in epics for s in epic.get("stories") or []]
+    reviewed = {r.get("id") for r in result["reviewer_output"]["review"].get("epics", [])}
+    text = _normalize(json_utils.dumps(epics))
+    keywords = expected.get("keywords", [])
+    return {
+        "epics": len(epics),
+        "stories": len(stories),
+        "conforming": sum(story_conforms(s) for s in stories),
+        "reviewed": sum(epic.get("id") in reviewed for epic in epics),
+        "keywords": len(keywords),
+        "keyword_hits": sum(_normalize(k) in text for k in keywords),
+        "below_min_epics": len(epics) < expected.get("min_epics", 1),
+    }
+
+
+def error_kind(exc: Exception) -> str:
+    message = str(exc)
+    if isinstance(exc, MissingRecording):
+        return "missing_recording"
+    if re.search(r"not valid JSON|invalid JSON|JSON parse failed|Could not extract JSON", message):
+        return "json"
+    if "does not match the schema" in message:
+        return "schema"
+    return type(exc).__name__
+
+
+async def run_variant(client: BenchClient, model: str, overrides, corpus, repeat: int, story_batching: bool, db_path: str):
+    pipeline = RequirementsPipeline(model=model, history_store=HistoryStore(db_path), story_batching=story_batching)
+    runs = []
+    with prompt_overrides(overrides):
+        for _ in range(repeat):
+            for name, transcript, expected in corpus:
+                client.calls = []
+                started = time.perf_counter()
+                run = {"transcript": name}
+                try:
+                    result = await pipeline.run_async(transcript)
+                    run.update(score_result(result, expected), ok=True)
+                except Exception as e:
+                    run.update(ok=False, error=error_kind(e))
+                    print(f"  {model} / {name}: {run['error']}: {str(e).splitlines()[0][:160]}")
+                run["latency_s"] = time.perf_counter() - started
+                run["calls"] = client.calls
+                runs.append(run)
+    return runs
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(runs):
+    ok = [r for r in runs if r["ok"]]
+    calls = [c for r in runs for c in r["calls"]]
+    judged = [c for c in calls if c["json_ok"] is not None]
+    epics = sum(r["epics"] for r in ok)
+    stories = sum(r["stories"] for r in ok)
+    keywords = sum(r["keywords"] for r in ok)
+    errors = {}
+    for r in runs:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    per_run = max(1, len(runs))
+    return {
+        "runs": len(runs),
+        "runs_ok": len(ok),
+        "errors": errors,
+        "latency_p50_s": round(statistics.median([r["latency_s"] for r in ok]) if ok else 0.0, 3),
+        "latency_p95_s": round(percentile([r["latency_s"] for r in ok], 95), 3),
+        "llm_calls_per_run": round(len(calls) / per_run, 1),
+        "prompt_tokens_per_run": round(sum(c["prompt_tokens"] for c in calls) / per_run),
+        "completion_tokens_per_run": round(sum(c["completion_tokens"] for c in calls) / per_run),
+        "json_checked": len(judged),
+        "json_failures": sum(not c["json_ok"] for c in judged),
+        "json_failure_rate": round(sum(not c["json_ok"] for c in judged) / len(judged), 4) if judged else 0.0,
+        "truncated_calls": sum(c["truncated"] for c in calls),
+        "epics_per_run": round(epics / len(ok), 2) if ok else 0.0,
+        "stories_per_epic": round(stories / epics, 2) if epics else 0.0,
+        "schema_conformance": round(sum(r["conforming"] for r in ok) / stories, 4) if stories else 0.0,
+        "review_coverage": round(sum(r["reviewed"] for r in ok) / epics, 4) if epics else 0.0,
+        "keyword_recall": round(sum(r["keyword_hits"] for r in ok) / keywords, 4) if keywords else 0.0,
+        "below_min_epics": sum(r["below_min_epics"] for r in ok),
+    }
+
+
+ROWS = [
+    ("runs ok", lambda s: f"{s['runs_ok']}/{s['runs']}"),
+    ("failed runs", lambda s: ", ".join(f"{k} {v}" for k, v in sorted(s["errors"].items())) or "-"),
+    ("latency p50 (s)", lambda s: f"{s['latency_p50_s']:.2f}"),
+    ("latency p95 (s)", lambda s: f"{s['latency_p95_s']:.2f}"),
+    ("LLM calls / run", lambda s: f"{s['llm_calls_per_run']:.1f}"),
+    ("prompt tokens / run", lambda s: f"{s['prompt_tokens_per_run']}"),
+    ("completion tokens / run", lambda s: f"{s['completion_tokens_per_run']}"),
+    ("JSON parse failures", lambda s: f"{s['json_failure_rate']:.1%} ({s['json_failures']}/{s['json_checked']})"),
+    ("truncated responses", lambda s: f"{s['truncated_calls']}"),
+    ("epics / run", lambda s: f"{s['epics_per_run']:.1f}"),
+    ("stories / epic", lambda s: f"{s['stories_per_epic']:.2f}"),
+    ("schema conformance", lambda s: f"{s['schema_conformance']:.1%}"),
+    ("review coverage", lambda s: f"{s['review_coverage']:.1%}"),
+    ("keyword recall", lambda s: f"{s['keyword_recall']:.1%}"),
+    ("runs below min epics", lambda s: f"{s['below_min_epics']}"),
+]
+
+
+def print_table(summaries):
+    names = list(summaries)
+    cells = [[label] + [fmt(summaries[n]) for n in names] for label, fmt in ROWS]
+    header = ["metric"] + names
+    widths = [max(len(row[i]) for row in cells + [header]) for i in range(len(header))]
+    line = lambda row: "  ".join(cell.ljust(w) if i == 0 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths)))
+    print(line(header))
+    print("  ".join("-" * w for w in widths))
+    for row in cells:
+        print(line(row))
+
+
+async def main_async(args):
+    corpus = load_corpus(args.golden)
+    if not corpus:
+        raise SystemExit(f"No golden transcripts (*.txt) in {args.golden}")
+    variants = [load_variant(spec) for spec in args.prompts or ["baseline"]]
+    models = args.model or ["mistral-small-latest"]
+
+    client = BenchClient(args.mode, Recordings(args.recordings), record=args.record, replay_latency=args.replay_latency)
+    LLMClient._get_async_client = lambda self: client
+    tag_agents()
+
+    summaries = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for model in models:
+            for variant, overrides in variants:
+                name = f"{model}/{variant}"
+                print(f"Running {name} on {len(corpus)} transcript(s) x {args.repeat} ({args.mode})")
+                runs = await run_variant(client, model, overrides, corpus, args.repeat, args.story_batching,
+                                         os.path.join(tmp, "history.db"))
+                summaries[name] = summarize(runs)
+
+    print()
+    print_table(summaries)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(json_utils.dumps({"mode": args.mode, "transcripts": [c[0] for c in corpus],
+                                      "repeat": args.repeat, "variants": summaries}, indent=True))
+        print(f"\nReport written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model / prompt variant comparison on the golden transcripts")
+    parser.add_argument("--mode", choices=("live", "replay", "stub"), default="replay")
+    parser.add_argument("--model", action="append", help="model to compare (repeatable)")
+    parser.add_argument("--prompts", action="append",
+                        help="'baseline' or a prompt variant JSON file (repeatable)")
+    parser.add_argument("--golden", default=GOLDEN_DIR, help="directory of golden transcripts")
+    parser.add_argument("--recordings", default=RECORDINGS_PATH, help="recorded responses (JSON lines)")
+    parser.add_argument("--record", action="store_true", help="live mode: save responses for replay")
+    parser.add_argument("--replay-latency", action="store_true", help="replay mode: wait the recorded latency")
+    parser.add_argument("--story-batching", action="store_true", help="pack several epics per story request")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="also write the summaries to this file")
+    args = parser.parse_args()
+    if args.record and args.mode != "live":
+        parser.error("--record needs --mode live")
+    if args.mode != "live":
+        # Offline modes never reach Mistral, but LLMClient insists on a key
+        os.environ.setdefault("MISTRAL_API_KEY", "offline")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_startup.py
+# Cold-start benchmark for the API worker: measures, in fresh
+# interpreter processes,
+#   - import time of backend.main (and the slowest modules it pulls in)
+#   - lifespan startup (pipeline / store / job manager construction)
+#   - first-request latency (GET /) through the ASGI app
+#
+# Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15]
+#
+# Needs the backend's dependencies installed (fastapi, httpx). Set
+# MISTRAL_API_KEY to any value if no config is present; no network
+# calls are made.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a child process so every measurement is a cold start
+CHILD = r"""
+import time
+t0 = time.perf_counter()
+import backend.main as main
+t1 = time.perf_counter()
+
+import asyncio
+import httpx
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        t2 = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            r = await client.get("/")
+            r.raise_for_status()
+        t3 = time.perf_counter()
+    return t2, t3
+
+t2, t3 = asyncio.run(first_request())
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f} {(t3 - t2) * 1000:.1f}")
+"""
+
+
+def run_child(env):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return [float(x) for x in out.stdout.strip().splitlines()[-1].split()]
+
+
+def import_profile(env, top):
+    """Top modules by cumulative import time from python -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):  # nested import; keep top-level only
+            continue
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API worker cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("MISTRAL_API_KEY", "bench-placeholder")
+    env.setdefault("HISTORY_DB_PATH", os.path.join(ROOT_DIR, "data", "bench_startup.db"))
+
+    samples = [run_child(env) for _ in range(args.runs)]
+    columns = list(zip(*samples))
+
+    print(f"Cold start over {args.runs} runs (median / min, ms)\n")
+    for label, values in zip(["import backend.main", "lifespan startup", "first request (GET /)"], columns):
+        print(f"{label:24} {statistics.median(values):9.1f} {min(values):9.1f}")
+    total = [sum(s) for s in samples]
+    print(f"{'total':24} {statistics.median(total):9.1f} {min(total):9.1f}")
+
+    print("\nSlowest top-level imports (cumulative ms):")
+    for cumulative_us, name in import_profile(env, args.top):
+        print(f"  {cumulative_us / 1000:8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,259 @@
 # frontend/api_client.py
 
+import copy
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
 import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
 
-API_BASE = "http://127.0.0.1:8000"
+from backend.utils import json_utils
 
-def process_transcript(transcript: str):
+API_BASE = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+# Base URL the user's browser uses for direct downloads (the backend may
+# only be reachable from the Streamlit server under API_BASE_URL)
+PUBLIC_API_BASE = os.getenv("PUBLIC_API_BASE_URL", API_BASE)
+
+JOB_TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+# Pipeline jobs are cancelled by the backend when nobody polls them for
+# this long (the user closed or left the Upload page)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+
+# Start planning on the backend as soon as an upload is extracted (the
+# backend must run with SPECULATIVE_PLANNING too)
+SPECULATIVE_PLANNING = os.getenv("SPECULATIVE_PLANNING", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
     """
-    Sends transcript text to the backend /api/process endpoint.
-    Returns the parsed JSON.
+    One pooled HTTP session shared by every Streamlit session/rerun,
+    so backend calls reuse keep-alive connections.
     """
-    url = f"{API_BASE}/api/process"
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-    response = requests.post(url, json={"transcript": transcript})
+class ETagCache:
+    """
+    Small LRU of (etag, result) per URL, shared by all sessions.
+    GETs send If-None-Match and reuse the cached body on 304.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url, etag, result):
+        with self._lock:
+            self._entries[url] = (etag, result)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def get_etag_cache() -> ETagCache:
+    return ETagCache()
+
+
+def _conditional_get(url: str, params=None):
+    """
+    GET with If-None-Match; returns the (possibly cached) result payload.
+    The cache is shared by every session, so callers get their own copy
+    and can edit it without leaking changes into other sessions.
+    """
+    if params:
+        url = requests.Request("GET", url, params=params).prepare().url
+    cache = get_etag_cache()
+    cached = cache.get(url)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+
+    response = get_session().get(url, headers=headers, timeout=30)
+    if response.status_code == 304 and cached:
+        return copy.deepcopy(cached[1])
+
+    result = _unwrap(response)
+    etag = response.headers.get("ETag")
+    if etag:
+        cache.put(url, etag, copy.deepcopy(result))
+    return result
+
+
+def client_headers():
+    """
+    Identifies this browser session to the backend, so its per-client run
+    limit applies per user rather than to the whole Streamlit server.
+    """
+    if "api_client_id" not in st.session_state:
+        st.session_state.api_client_id = uuid.uuid4().hex
+    return {"X-Client-Id": st.session_state.api_client_id}
+
+
+def _unwrap(response):
+    """Checks status + success flag and returns the result payload."""
+    if response.status_code in (429, 503):
+        # admission control: the backend is full, nothing was started
+        try:
+            error = json_utils.loads(response.content).get("error")
+        except Exception:
+            error = None
+        retry_after = response.headers.get("Retry-After", "a few")
+        raise Exception(f"{error or 'Backend is busy'}. Please retry in {retry_after} seconds.")
 
     if response.status_code != 200:
         raise Exception(f"Backend returned status {response.status_code}")
 
-    data = response.json()
+    data = json_utils.loads(response.content)
 
     if not data.get("success"):
         raise Exception(f"Backend error: {data.get('error')}")
 
     return data["result"]
+
+
+def process_transcript(transcript: str):
+    """
+    Sends transcript text to the backend /api/process endpoint.
+    Returns the parsed JSON.
+    """
+    url = f"{API_BASE}/api/process"
+    response = get_session().post(url, json={"transcript": transcript}, headers=client_headers())
+    return _unwrap(response)
+
+
+def submit_transcript(transcript: str, previous_run_id: str = None) -> str:
+    """
+    Queues a pipeline run on the backend and returns the job id.
+    With previous_run_id, only the parts of the transcript that changed
+    since that run are re-processed.
+    """
+    url = f"{API_BASE}/api/process/jobs"
+    body = {"transcript": transcript, "previous_run_id": previous_run_id, "lease_seconds": JOB_LEASE_SECONDS}
+    response = get_session().post(url, json=body, headers=client_headers(), timeout=30)
+    return _unwrap(response)["job_id"]
+
+
+def speculate(transcript: str) -> bool:
+    """
+    Lets the backend start planning the transcript before the user clicks
+    "Process Transcript"; the run submitted later picks the plan up.
+    Returns whether a new speculation was started.
+    """
+    url = f"{API_BASE}/api/process/speculate"
+    response = get_session().post(url, json={"transcript": transcript}, headers=client_headers(), timeout=10)
+    return _unwrap(response)["started"]
+
+
+def discard_speculation():
+    """
+    Drops this session's speculative plan (the upload was removed).
+    """
+    url = f"{API_BASE}/api/process/speculate"
+    response = get_session().delete(url, headers=client_headers(), timeout=10)
+    return _unwrap(response)["discarded"]
+
+
+def get_job(job_id: str):
+    """
+    Returns the job snapshot: status, progress and result when finished.
+    """
+    url = f"{API_BASE}/api/process/jobs/{job_id}"
+    response = get_session().get(url, timeout=10)
+    return _unwrap(response)
+
+
+def cancel_job(job_id: str):
+    """
+    Cancels a queued/running pipeline job; returns its snapshot.
+    """
+    url = f"{API_BASE}/api/process/jobs/{job_id}"
+    response = get_session().delete(url, timeout=10)
+    return _unwrap(response)
+
+
+def get_run_summary(run_id: str):
+    """Run metadata and counts (no epics/stories)."""
+    return _conditional_get(f"{API_BASE}/api/runs/{run_id}")
+
+
+def list_run_epics(run_id: str, page: int = 1, page_size: int = 50):
+    """One page of epic summaries: {page, page_size, total, epics}."""
+    return _conditional_get(
+        f"{API_BASE}/api/runs/{run_id}/epics",
+        params={"page": page, "page_size": page_size}
+    )
+
+
+def get_run_index(run_id: str):
+    """Every epic with story ids/priority/labels only."""
+    return _conditional_get(f"{API_BASE}/api/runs/{run_id}/index")
+
+
+def get_run_epic(run_id: str, epic_id: str):
+    """One epic with its stories and review entry."""
+    return _conditional_get(f"{API_BASE}/api/runs/{run_id}/epics/{epic_id}")
+
+
+def export_url(run_id: str, fmt: str) -> str:
+    """
+    Download link for a run export (csv / jsonl / xlsx). The browser
+    fetches it straight from the backend, which streams the file, so
+    nothing is buffered in Streamlit.
+    """
+    return f"{PUBLIC_API_BASE}/api/runs/{run_id}/export?{urlencode({'format': fmt})}"
+
+
+def submit_jira_sync(payload) -> str:
+    """
+    Queues a Jira sync of the approved payload and returns the job id.
+    """
+    url = f"{API_BASE}/api/jira/sync/jobs"
+    response = get_session().post(url, json={"payload": payload}, timeout=30)
+    return _unwrap(response)["job_id"]
+
+
+def get_jira_sync(job_id: str):
+    """
+    Returns the sync job snapshot: status, progress counts and, when
+    finished, the per-item report with "remaining" (items still to retry)
+    and "resumable" (resume_jira_sync would start a new job).
+    """
+    url = f"{API_BASE}/api/jira/sync/jobs/{job_id}"
+    response = get_session().get(url, timeout=10)
+    return _unwrap(response)
+
+
+def resume_jira_sync(job_id: str) -> str:
+    """
+    Retries only the failed/skipped items of a finished sync job and
+    returns the new job id.
+    """
+    url = f"{API_BASE}/api/jira/sync/jobs/{job_id}/resume"
+    response = get_session().post(url, timeout=30)
+    return _unwrap(response)["job_id"]
+
+
+def cancel_jira_sync(job_id: str):
+    """
+    Stops a running sync; what was created so far is reused on resume.
+    """
+    url = f"{API_BASE}/api/jira/sync/jobs/{job_id}"
+    response = get_session().delete(url, timeout=10)
+    return _unwrap(response)
@@ -1,18 +1,50 @@
+import os
+import sys
+
 import streamlit as st
 
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from backend.utils import profiling
+
+# PROFILE_STREAMLIT=1 profiles every page rerun (stats under PROFILE_DIR)
+PROFILE_PAGES = profiling.is_enabled(os.getenv("PROFILE_STREAMLIT"))
+
 st.set_page_config(
     page_title="Agentic Requirements Assistant",
     page_icon="🤖",
     layout="wide"
 )
 
-st.title("🤖 Agentic Requirements Elicitation Assistant")
 
-st.markdown("""
-Welcome!  
-Use the navigation menu on the left to:
+def home():
+    st.title("🤖 Agentic Requirements Elicitation Assistant")
+
+    st.markdown("""
+    Welcome!
+    Use the navigation menu on the left to:
+
+    1. 📤 Upload your transcript
+    2. 🧠 View AI-generated epics & user stories
+    3. ✅ Review, edit, and approve
+    """)
+
+
+# Explicit navigation (instead of pages/ auto-discovery) so every page
+# rerun goes through this script and can be wrapped by the profiler
+page = st.navigation([
+    st.Page(home, title="Home", icon="🤖", default=True),
+    st.Page("pages/1_Upload.py", title="Upload"),
+    st.Page("pages/2_Generated_Requirements.py", title="Generated Requirements"),
+    st.Page("pages/3_Review_and_Approve.py", title="Review and Approve"),
+])
 
-1. 📤 Upload your transcript  
-2. 🧠 View AI-generated epics & user stories  
-3. ✅ Review, edit, and approve  
-""")
+if PROFILE_PAGES:
+    # st.stop()/st.rerun() raise through here; the profile is still saved
+    with profiling.RunProfiler(f"streamlit-{page.title}") as profiler:
+        profiler.mark("render")
+        page.run()
+else:
+    page.run()
@@ -0,0 +1,202 @@
+# frontend/components/approval_index.py
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+UNSET = "(none)"
+
+
+def story_key(epic_id, story_id) -> str:
+    return f"{epic_id}_{story_id}"
+
+
+def epic_key(epic_id) -> str:
+    return f"epic_{epic_id}"
+
+
+def apply_epic_edits(epic: Dict[str, Any], edited_items: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a shallow view of the epic with saved edits applied (no deepcopy)."""
+    updates = edited_items.get(epic_key(epic["id"]))
+    if not updates:
+        return epic
+    return {**epic, **{k: v for k, v in updates.items() if k in ("title", "description", "priority", "labels")}}
+
+
+def apply_story_edits(epic_id, story: Dict[str, Any], edited_items: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a shallow view of the story with saved edits applied (no deepcopy)."""
+    updates = edited_items.get(story_key(epic_id, story["id"]))
+    if not updates:
+        return story
+    return {**story, **{k: v for k, v in updates.items() if k in ("title", "description", "acceptance_criteria")}}
+
+
+class ApprovalIndex:
+    """
+    Approval state for the Review page, indexed so every interaction
+    costs O(size of the thing touched) instead of O(backlog):
+
+      - epic -> story keys, story key -> epic
+      - per-epic approved story counts + global totals, kept incrementally
+      - priority / label -> story keys, for filtering and bulk approval
+    """
+
+    def __init__(self, epics: List[Dict[str, Any]], edited_items: Optional[Dict[str, Any]] = None):
+        """
+        epics: epic skeletons (id, title, labels, stories[{id, priority, labels}])
+        as served by /api/runs/{run_id}/index; full epics work too.
+        """
+        edited_items = edited_items or {}
+
+        self.epic_ids: List[Any] = []
+        self.epic_pos: Dict[Any, int] = {}
+        self.epic_stories: Dict[Any, List[str]] = {}
+        self.story_epic: Dict[str, Any] = {}
+        self.story_pos: Dict[str, int] = {}
+
+        self.by_priority: Dict[str, Set[str]] = {}
+        self.by_label: Dict[str, Set[str]] = {}
+
+        self.approved_epics: Set[Any] = set()
+        self.approved_stories: Set[str] = set()
+        self.approved_per_epic: Dict[Any, int] = {}
+
+        for i, raw_epic in enumerate(epics):
+            epic = apply_epic_edits(raw_epic, edited_items)
+            epic_id = epic["id"]
+            self.epic_ids.append(epic_id)
+            self.epic_pos[epic_id] = i
+            self.approved_per_epic[epic_id] = 0
+
+            keys = []
+            epic_labels = epic.get("labels") or []
+            for j, raw_story in enumerate(epic.get("stories", [])):
+                story = apply_story_edits(epic_id, raw_story, edited_items)
+                sk = story_key(epic_id, story["id"])
+                keys.append(sk)
+                self.story_epic[sk] = epic_id
+                self.story_pos[sk] = j
+
+                priority = (story.get("priority") or UNSET).strip().lower() or UNSET
+                self.by_priority.setdefault(priority, set()).add(sk)
+                for label in set(story.get("labels") or []) | set(epic_labels):
+                    if label:
+                        self.by_label.setdefault(label, set()).add(sk)
+            self.epic_stories[epic_id] = keys
+
+    # -----------------------
+    # QUERIES
+    # -----------------------
+    @property
+    def approved_epic_count(self) -> int:
+        return len(self.approved_epics)
+
+    @property
+    def approved_story_count(self) -> int:
+        return len(self.approved_stories)
+
+    def is_epic_approved(self, epic_id) -> bool:
+        return epic_id in self.approved_epics
+
+    def is_story_approved(self, sk: str) -> bool:
+        return sk in self.approved_stories
+
+    def priorities(self) -> List[str]:
+        return sorted(self.by_priority)
+
+    def labels(self) -> List[str]:
+        return sorted(self.by_label)
+
+    def matching_stories(self, priorities: Iterable[str] = (), labels: Iterable[str] = ()) -> Optional[Set[str]]:
+        """
+        Story keys matching every active filter (priority OR-ed, label OR-ed,
+        the two groups AND-ed). Returns None when no filter is active.
+        """
+        result = None
+        priorities, labels = list(priorities), list(labels)
+        if priorities:
+            result = set().union(*(self.by_priority.get(p, set()) for p in priorities))
+        if labels:
+            by_label = set().union(*(self.by_label.get(l, set()) for l in labels))
+            result = by_label if result is None else result & by_label
+        return result
+
+    def visible_epics(self, matches: Optional[Set[str]]) -> List[Any]:
+        """Epic ids to render, in original order, given a filter match set."""
+        if matches is None:
+            return self.epic_ids
+        epic_ids = {self.story_epic[sk] for sk in matches}
+        return sorted(epic_ids, key=self.epic_pos.__getitem__)
+
+    # -----------------------
+    # MUTATIONS
+    # -----------------------
+    def set_story(self, sk: str, value: bool):
+        """Approve/unapprove one story; the epic follows 'any story approved'."""
+        epic_id = self.story_epic[sk]
+        if value and sk not in self.approved_stories:
+            self.approved_stories.add(sk)
+            self.approved_per_epic[epic_id] += 1
+        elif not value and sk in self.approved_stories:
+            self.approved_stories.discard(sk)
+            self.approved_per_epic[epic_id] -= 1
+
+        if self.approved_per_epic[epic_id] > 0:
+            self.approved_epics.add(epic_id)
+        else:
+            self.approved_epics.discard(epic_id)
+
+    def set_epic(self, epic_id, value: bool) -> List[str]:
+        """Approve/unapprove an epic and all its stories. Returns touched story keys."""
+        keys = self.epic_stories[epic_id]
+        if value:
+            self.approved_stories.update(keys)
+            self.approved_per_epic[epic_id] = len(keys)
+            self.approved_epics.add(epic_id)
+        else:
+            self.approved_stories.difference_update(keys)
+            self.approved_per_epic[epic_id] = 0
+            self.approved_epics.discard(epic_id)
+        return keys
+
+    def set_many(self, keys: Iterable[str], value: bool) -> List[str]:
+        """Bulk approve/unapprove a set of stories. Returns touched story keys."""
+        touched = []
+        for sk in keys:
+            self.set_story(sk, value)
+            touched.append(sk)
+        return touched
+
+    def copy_approvals_from(self, other: "ApprovalIndex"):
+        """Carries approvals over from a previous index of the same run."""
+        for epic_id in other.approved_epics:
+            if epic_id in self.epic_pos and not other.approved_per_epic.get(epic_id):
+                # epic approved on its own (it has no approved stories)
+                self.approved_epics.add(epic_id)
+        self.set_many((sk for sk in other.approved_stories if sk in self.story_epic), True)
+
+    # -----------------------
+    # PAYLOAD
+    # -----------------------
+    def build_payload(self, load_epic: Callable[[Any], Dict[str, Any]], edited_items: Dict[str, Any], context=None) -> Dict[str, Any]:
+        """
+        Approved subset for Jira: approved epics (edits applied) with
+        only their approved stories. Walks approved items only, and only
+        loads full epic details (via load_epic) for approved epics.
+        """
+        payload = {"epics": [], "context": context or {}}
+        for epic_id in sorted(self.approved_epics, key=self.epic_pos.__getitem__):
+            epic = apply_epic_edits(load_epic(epic_id), edited_items)
+            stories = epic.get("stories", [])
+            epic_copy = {
+                "id": epic["id"],
+                "title": epic["title"],
+                "description": epic.get("description", ""),
+                "priority": epic.get("priority") or "Medium",
+                "labels": epic.get("labels", []),
+                "stories": [
+                    apply_story_edits(epic_id, stories[self.story_pos[sk]], edited_items)
+                    for sk in self.epic_stories[epic_id]
+                    if sk in self.approved_stories
+                ]
+            }
+            payload["epics"].append(epic_copy)
+        return payload
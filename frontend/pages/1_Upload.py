@@ -1,64 +1,261 @@
 import sys
 import os
+import hashlib
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
 import streamlit as st
-#from api_client import process_transcript
-from backend.agents.pipeline import RequirementsPipeline
+from frontend import api_client
+from backend.utils import transcript_formats
+from backend.utils.file_utils import SUPPORTED_EXTENSIONS, extract_text
+
+# Longer transcripts are only partly shown in the preview
+PREVIEW_CHARS = 50_000
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_extract_text(filename: str, data: bytes) -> str:
+    # Reruns (every widget click) would otherwise re-parse the PDF/DOCX
+    return extract_text(filename, data)
+
+
+@st.cache_resource(max_entries=4, show_spinner="Reading transcript...")
+def cached_normalize(filename: str, file_id: str, _file):
+    """
+    Captions / chat exports can be hundreds of MB: they are parsed
+    straight from the upload buffer (no getvalue() copy, no hashing of
+    the bytes; the upload's file_id is the cache key), and cached as a
+    resource so reruns don't unpickle a copy of the text.
+    """
+    _file.seek(0)
+    transcript = transcript_formats.normalize_transcript(filename, _file)
+    summary = {"format": transcript.format, "cues": transcript.cues, "turns": len(transcript.offsets),
+               "speakers": transcript.speakers, "duration_ms": transcript.duration_ms}
+    return transcript.text, summary
+
+
+def show_normalized(summary):
+    text = (f"{summary['format'].upper()}: {summary['cues']:,} cues/messages merged into "
+            f"{summary['turns']:,} speaker turns from {summary['speakers']} speaker(s)")
+    if summary["duration_ms"] and summary["format"] in transcript_formats.CAPTION_EXTENSIONS:
+        minutes = summary["duration_ms"] // 60000
+        text += f", {minutes // 60}h {minutes % 60:02d}m"
+    st.caption(text)
+
+
+STAGE_LABELS = {
+    "queued": "Waiting for a worker...",
+    "planning": "Planning epics...",
+    "generating_stories": "Generating stories",
+    "reviewing": "Reviewing epics...",
+    "saving": "Saving results...",
+}
+
+
+def cancel_pipeline_job():
+    """Stops the running job so it doesn't keep spending LLM calls."""
+    job_id = st.session_state.pop("pipeline_job_id", None)
+    st.session_state.pop("pipeline_job_content", None)
+    if job_id:
+        try:
+            api_client.cancel_job(job_id)
+        except Exception as e:
+            # it may have just finished; nothing left to stop
+            print(f"Could not cancel job {job_id}: {e}")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def speculate(content: str):
+    """
+    Lets the backend start planning this upload while the user reads the
+    preview (once per content; a new upload replaces the previous one).
+    """
+    digest = content_hash(content)
+    if st.session_state.get("speculated_content") == digest:
+        return
+    st.session_state["speculated_content"] = digest
+    try:
+        api_client.speculate(content)
+    except Exception as e:
+        # only saves time: the run plans the transcript itself otherwise
+        print(f"Could not start speculative planning: {e}")
+
+
+def discard_speculation():
+    if st.session_state.pop("speculated_content", None):
+        try:
+            api_client.discard_speculation()
+        except Exception as e:
+            print(f"Could not discard speculative planning: {e}")
+
+
+@st.fragment(run_every=1.0)
+def job_status():
+    """
+    Polls the backend job once per tick. Only this fragment reruns,
+    so the page stays interactive while the pipeline runs server-side.
+    """
+    job_id = st.session_state.get("pipeline_job_id")
+    if not job_id:
+        return
+
+    try:
+        job = api_client.get_job(job_id)
+    except Exception as e:
+        st.error(f"Could not fetch job status: {e}")
+        return
+
+    if job["status"] == "succeeded":
+        # Only the run id is kept per session; pages load epics on demand
+        st.session_state["run_id"] = job["result"]["run_id"]
+        st.session_state["run_partial"] = job["result"].get("partial")
+        st.session_state.pop("pipeline_job_id", None)
+        st.rerun()
+
+    if job["status"] == "failed":
+        st.session_state.pop("pipeline_job_id", None)
+        st.error(f"Processing failed: {job['error']}")
+        return
+
+    if job["status"] == "cancelled":
+        st.session_state.pop("pipeline_job_id", None)
+        st.info(f"Processing stopped: {job['error']}")
+        return
+
+    if st.button("Cancel", key="cancel_pipeline_job"):
+        cancel_pipeline_job()
+        st.rerun(scope="app")
+
+    progress = job["progress"]
+    label = STAGE_LABELS.get(progress["stage"], progress["stage"])
+    if progress["total"]:
+        label = f"{label} ({progress['done']}/{progress['total']})"
+        st.progress(progress["done"] / progress["total"], text=label)
+    else:
+        st.progress(0, text=label)
+
+
+@st.fragment(run_every=2.0)
+def deferred_review_status(partial):
+    """
+    A run that hit its deadline may still be getting reviewed in the
+    background; offers the reviewed version once that job is done.
+    """
+    job_id = partial.get("review_job_id")
+    if not job_id:
+        return
+    try:
+        job = api_client.get_job(job_id)
+    except Exception as e:
+        st.caption(f"Could not fetch review status: {e}")
+        return
+
+    if job["status"] == "failed":
+        st.caption(f"Background review failed: {job['error']}")
+    elif job["status"] == "succeeded":
+        if st.button("Load reviewed version"):
+            st.session_state["run_id"] = job["result"]["run_id"]
+            st.session_state["run_partial"] = job["result"].get("partial")
+            st.rerun(scope="app")
+    else:
+        st.caption("⏳ Review is finishing in the background...")
+
+
+def show_partial(partial):
+    notes = []
+    if partial.get("stories_kept"):
+        notes.append(f"{len(partial['stories_kept'])} epic(s) kept the planner's stories")
+    if partial.get("review_deferred"):
+        notes.append(f"{len(partial['review_deferred'])} epic(s) were not reviewed yet")
+    st.warning("Results were shortened to answer in time: " + "; ".join(notes) + ".")
+    deferred_review_status(partial)
+
 
 st.title("Upload Transcript")
 
 uploaded_file = st.file_uploader(
     "Upload transcript file",
-    type=["txt", "pdf", "docx", "md"]
+    type=SUPPORTED_EXTENSIONS
 )
 
+# The file that is being processed was removed: stop its run
+if uploaded_file is None and "pipeline_job_id" in st.session_state:
+    cancel_pipeline_job()
+if uploaded_file is None:
+    discard_speculation()
+
 # Only proceed if file is uploaded
 if uploaded_file is not None:
 
-    import docx2txt
-    import PyPDF2
-
-    content = ""
-
     # Extract text based on file type
-    filename = uploaded_file.name.lower()
-
-    if filename.endswith(".txt"):
-        content = uploaded_file.read().decode("utf-8")
-
-    elif filename.endswith(".pdf"):
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-        content = "\n".join(
-            page.extract_text() or ""
-            for page in pdf_reader.pages
-        )
-
-    elif filename.endswith(".docx"):
-        content = docx2txt.process(uploaded_file)
-
-    elif filename.endswith(".md"):
-        content = uploaded_file.read().decode("utf-8")
+    summary = None
+    if transcript_formats.is_supported(uploaded_file.name):
+        try:
+            content, summary = cached_normalize(uploaded_file.name, uploaded_file.file_id, uploaded_file)
+        except ValueError as e:
+            st.error(f"Could not read {uploaded_file.name}: {e}")
+            st.stop()
+    else:
+        content = cached_extract_text(uploaded_file.name, uploaded_file.getvalue())
 
     # Validate extraction
     if not content.strip():
         st.error("Could not extract text from the uploaded file.")
         st.stop()
 
+    # A different file was uploaded while the previous one is processing
+    running_for = st.session_state.get("pipeline_job_content")
+    if running_for and "pipeline_job_id" in st.session_state and running_for != content_hash(content):
+        cancel_pipeline_job()
+        st.info("Stopped processing the previous file.")
+
     # Show transcript preview
     st.write("### Transcript Preview")
-    st.text_area("Raw Transcript", content, height=300)
+    if summary:
+        show_normalized(summary)
+    if len(content) > PREVIEW_CHARS:
+        st.caption(f"Showing the first {PREVIEW_CHARS:,} of {len(content):,} characters")
+    st.text_area("Raw Transcript", content[:PREVIEW_CHARS], height=300)
+
+    # Offer incremental re-processing when a previous run exists
+    # (corrected transcript or appended follow-up meeting)
+    previous_run_id = st.session_state.get("run_id")
+    incremental = previous_run_id and st.checkbox(
+        "Only re-process what changed since the previous run",
+        value=True,
+        help="Keeps epics/stories from the previous run whose source text is unchanged."
+    )
+
+    # Opt-in: plan the upload now, the run below picks the plan up
+    # (incremental runs re-plan only the changed parts, so they don't)
+    if api_client.SPECULATIVE_PLANNING and "pipeline_job_id" not in st.session_state:
+        if incremental:
+            discard_speculation()
+        else:
+            speculate(content)
 
     # Button to process
-    if st.button("Process Transcript"):
-        with st.spinner("Processing with AI..."):
-            #result = process_transcript(content)
-            pipeline = RequirementsPipeline()
-            result = pipeline.run(content)
+    if st.button("Process Transcript", disabled="pipeline_job_id" in st.session_state):
+        try:
+            st.session_state["pipeline_job_id"] = api_client.submit_transcript(
+                content, previous_run_id=previous_run_id if incremental else None
+            )
+            st.session_state["pipeline_job_content"] = content_hash(content)
+            # claimed by the run now
+            st.session_state.pop("speculated_content", None)
+            st.session_state.pop("run_id", None)
+            st.session_state.pop("run_partial", None)
+        except Exception as e:
+            st.error(f"Could not submit transcript: {e}")
 
-        st.session_state["pipeline_result"] = result
+    job_status()
 
+    if st.session_state.get("run_id") and "pipeline_job_id" not in st.session_state:
         st.success("Processing complete! Go to 'Generated Requirements' page.")
+        if st.session_state.get("run_partial"):
+            show_partial(st.session_state["run_partial"])
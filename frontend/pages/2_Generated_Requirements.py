@@ -1,3 +1,4 @@
+import math
 import streamlit as st
 import json
 import sys
@@ -6,29 +7,45 @@ import os
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
-    
+
+from frontend import api_client
+
+EPICS_PER_PAGE = 10
+
 # Initialize editable storage for requirements
 if "edited_requirements" not in st.session_state:
     st.session_state.edited_requirements = {}
 
-# Load pipeline result from session
-result = st.session_state.get("pipeline_result")
+# Only the run id lives in the session; epics/stories are fetched on demand
+run_id = st.session_state.get("run_id")
 
 st.title("📘 Generated Requirements")
 
-if not result:
+if not run_id:
     st.warning("Please upload and process a transcript first.")
     st.stop()
 
-planner_output = result.get("planner_output", {})
-epics = planner_output.get("epics", [])
+summary = api_client.get_run_summary(run_id)
 
 # Display context
 with st.expander("ℹ️ Context"):
-    st.json(planner_output.get("context", {}))
+    st.json(summary.get("context", {}))
+
+# Export streams from the backend straight to the browser
+EXPORT_FORMATS = {"CSV": "csv", "Excel (XLSX)": "xlsx", "JSON Lines": "jsonl"}
+with st.expander("⬇️ Export"):
+    export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+    st.link_button(
+        f"Download {summary['story_count']} stories as {export_format}",
+        api_client.export_url(run_id, EXPORT_FORMATS[export_format])
+    )
 
 st.subheader("📌 Epics & Stories")
 
+pages = max(1, math.ceil(summary["epic_count"] / EPICS_PER_PAGE))
+page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+epics = api_client.list_run_epics(run_id, page=page, page_size=EPICS_PER_PAGE)["epics"]
+
 for epic in epics:
     with st.expander(f"🟦 Epic: {epic['title']}"):
         # Unique key for this epic
@@ -38,7 +55,7 @@ for epic in epics:
         edited_epic = st.session_state.edited_requirements.get(epic_key, {
             "title": epic["title"],
             "description": epic.get("description", ""),
-            "priority": epic.get("priority", "Medium"),
+            "priority": epic.get("priority") or "Medium",
             "labels": epic.get("labels", [])
         })
 
@@ -59,7 +76,7 @@ for epic in epics:
         edited_epic_priority = st.selectbox(
             "Priority",
             ["High", "Medium", "Low"],
-            index=["High", "Medium", "Low"].index(edited_epic.get("priority", "Medium")),
+            index=["High", "Medium", "Low"].index(edited_epic.get("priority") or "Medium"),
             key=f"epic_priority_{epic_key}"
         )
 
@@ -91,11 +108,21 @@ for epic in epics:
                 "priority": edited_epic_priority,
                 "labels": edited_epic_labels
             }
+            st.session_state.edits_version = st.session_state.get("edits_version", 0) + 1
             st.success("Epic saved!")
 
-        stories = epic.get("stories", [])
         st.markdown("---")
 
+        if not epic.get("story_count"):
+            st.info("No stories were generated for this epic.")
+            continue
+
+        # Stories are only fetched once the user asks for them
+        if not st.toggle(f"Show {epic['story_count']} stories", key=f"show_stories_{epic_key}"):
+            continue
+
+        stories = api_client.get_run_epic(run_id, epic["id"]).get("stories", [])
+
         if not stories:
             st.info("No stories were generated for this epic.")
             continue
@@ -164,4 +191,5 @@ for epic in epics:
                         "description": edited_desc,
                         "acceptance_criteria": edited_ac_list
                     }
+                    st.session_state.edits_version = st.session_state.get("edits_version", 0) + 1
                     st.success("Saved!")
@@ -1,174 +1,166 @@
 # frontend/pages/3_Review_and_Approve.py
+import math
 import streamlit as st
-import json
-import copy
-import requests
-from streamlit import session_state as ss
 import sys
 import os
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
-    
-from backend.jira.jira_client import JiraClient
+
+from frontend import api_client
+from frontend.components.approval_index import (
+    ApprovalIndex,
+    apply_epic_edits,
+    apply_story_edits,
+    epic_key,
+)
+
+EPICS_PER_PAGE_OPTIONS = [5, 10, 25, 50]
 
 st.title("📝 Review & Approve Requirements")
 
 # Preconditions
-if "pipeline_result" not in st.session_state:
+if "run_id" not in st.session_state:
     st.warning("Please upload and process a transcript first.")
     st.stop()
 
-# Initialize approvals store
-if "approvals" not in st.session_state:
-    st.session_state.approvals = {}
+# Only the run id + edits live in the session (edits are applied as shallow
+# views); epic details are fetched from the backend for what's on screen.
+run_id = st.session_state.run_id
+edited_items = st.session_state.get("edited_requirements", {})
 
-# Helper callbacks for checkbox behavior
-def toggle_epic(epic_key, story_keys):
-    """When epic checkbox toggled, toggle all stories to same value."""
-    epic_checkbox_key = f"approve_{epic_key}"
-    new_val = st.session_state.get(epic_checkbox_key, False)
-    # ensure approvals mapping exists
-    st.session_state.approvals[epic_key] = new_val
-    for sk in story_keys:
-        st.session_state.approvals[sk] = new_val
-        st.session_state[f"approve_{sk}"] = new_val
-    st.rerun()
-
-def toggle_story(epic_key, story_key, story_keys):
-    """When a story checkbox toggled, update epic based on story states."""
-    story_checkbox_key = f"approve_{story_key}"
-    new_val = st.session_state.get(story_checkbox_key, False)
+def load_epic(epic_id):
+    return api_client.get_run_epic(run_id, epic_id)
 
-    st.session_state.approvals[story_key] = new_val
+# Build (or reuse) the approval index from the lightweight run index. It's
+# rebuilt only when the run or the saved edits change; approvals carry over.
+index_id = (run_id, st.session_state.get("edits_version", 0))
+if st.session_state.get("approval_index_id") != index_id:
+    previous = st.session_state.get("approval_index")
+    index = ApprovalIndex(api_client.get_run_index(run_id), edited_items)
+    if previous is not None and st.session_state.get("approval_index_id", (None,))[0] == index_id[0]:
+        index.copy_approvals_from(previous)
+    st.session_state.approval_index = index
+    st.session_state.approval_index_id = index_id
 
-    epic_checkbox_key = f"approve_{epic_key}"
+index: ApprovalIndex = st.session_state.approval_index
 
-    # FUTURE STATE: check how many stories are approved
-    approved_stories = [
-        st.session_state.get(f"approve_{sk}", False) 
-        for sk in story_keys
-    ]
 
-    if any(approved_stories):
-        # At least ONE story approved → epic must be approved
-        st.session_state.approvals[epic_key] = True
-        st.session_state[epic_checkbox_key] = True
-    else:
-        # No approved stories → epic must be unapproved
-        st.session_state.approvals[epic_key] = False
-        st.session_state[epic_checkbox_key] = False
+# Helper callbacks for checkbox behavior. They only touch the epic/stories
+# involved, and don't call st.rerun(): the fragment reruns by itself.
+def _sync_widgets(keys):
+    for sk in keys:
+        widget = f"approve_{sk}"
+        if widget in st.session_state:
+            st.session_state[widget] = index.is_story_approved(sk)
 
-    st.rerun()
+def toggle_epic(epic_id):
+    """When epic checkbox toggled, toggle all stories to same value."""
+    new_val = st.session_state.get(f"approve_{epic_key(epic_id)}", False)
+    _sync_widgets(index.set_epic(epic_id, new_val))
+
+def toggle_story(epic_id, sk):
+    """When a story checkbox toggled, update epic based on story states."""
+    index.set_story(sk, st.session_state.get(f"approve_{sk}", False))
+    st.session_state[f"approve_{epic_key(epic_id)}"] = index.is_epic_approved(epic_id)
+
+def bulk_set(keys, value):
+    touched = index.set_many(keys, value)
+    _sync_widgets(touched)
+    for eid in {index.story_epic[sk] for sk in touched}:
+        widget = f"approve_{epic_key(eid)}"
+        if widget in st.session_state:
+            st.session_state[widget] = index.is_epic_approved(eid)
 
-# Read planner + edited items
-planner_output = st.session_state.pipeline_result.get("planner_output", {})
-edited_items = st.session_state.get("edited_requirements", {})
 
 st.info("Only the epics and stories you approve (checked) will be updated in JIRA. Use the checkboxes below to select what you want to push.")
 
-final_output = copy.deepcopy(planner_output)
-
-# UI: iterate epics similar to Generated Requirements page
-for epic in final_output.get("epics", []):
-    epic_key = f"epic_{epic['id']}"
-
-    # Apply any epic edits (if saved)
-    if epic_key in edited_items:
-        updates = edited_items[epic_key]
-        epic["title"] = updates.get("title", epic["title"])
-        epic["description"] = updates.get("description", epic.get("description", ""))
-        epic["priority"] = updates.get("priority", epic.get("priority", "Medium"))
-        epic["labels"] = updates.get("labels", epic.get("labels", []))
-
-    # Prepare list of story keys for callbacks
-    story_keys = []
-    for s in epic.get("stories", []):
-        story_keys.append(f"{epic['id']}_{s['id']}")
-
-    # Initialize approval states if missing
-    if epic_key not in st.session_state.approvals:
-        st.session_state.approvals[epic_key] = False
-    for sk in story_keys:
-        if sk not in st.session_state.approvals:
-            st.session_state.approvals[sk] = False
-
-    # Ensure checkbox widgets are present with callback binding
-    with st.expander(f"🟦 Epic: {epic['title']}"):
-        st.write(f"**ID:** {epic.get('id')}")
-        st.write(f"**Description:** {epic.get('description')}")
-        st.write(f"**Priority:** {epic.get('priority', 'Medium')}")
-        st.write(f"**Labels:** {', '.join(epic.get('labels', []))}")
-
-        # Epic checkbox (on_change triggers toggle_epic)
-        st.checkbox(
-            "✔ Approve Epic",
-            value=st.session_state.approvals[epic_key],
-            key=f"approve_{epic_key}",
-            on_change=toggle_epic,
-            args=(epic_key, story_keys)
+
+@st.fragment
+def approval_list():
+    """
+    Filters, bulk actions and the current page of epics. Interactions here
+    rerun only this fragment, and only one page of epics is rendered.
+    """
+    f1, f2 = st.columns(2)
+    priorities = f1.multiselect("Filter by priority", index.priorities(), key="filter_priority")
+    labels = f2.multiselect("Filter by label", index.labels(), key="filter_label")
+    matches = index.matching_stories(priorities, labels)
+
+    if matches is not None:
+        b1, b2, _ = st.columns([2, 2, 4])
+        b1.button(
+            f"✔ Approve {len(matches)} matching",
+            on_click=bulk_set, args=(matches, True), key="bulk_approve"
+        )
+        b2.button(
+            f"✖ Unapprove {len(matches)} matching",
+            on_click=bulk_set, args=(matches, False), key="bulk_unapprove"
         )
 
-        st.markdown("---")
-        st.write("### Stories")
+    visible = index.visible_epics(matches)
+
+    p1, p2 = st.columns(2)
+    per_page = p1.selectbox("Epics per page", EPICS_PER_PAGE_OPTIONS, index=1, key="epics_per_page")
+    pages = max(1, math.ceil(len(visible) / per_page))
+    page = p2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="epics_page")
+
+    for epic_id in visible[(page - 1) * per_page: page * per_page]:
+        epic = apply_epic_edits(load_epic(epic_id), edited_items)
+        ekey = epic_key(epic_id)
+        story_keys = index.epic_stories[epic_id]
+        if matches is not None:
+            story_keys = [sk for sk in story_keys if sk in matches]
+
+        with st.expander(f"🟦 Epic: {epic['title']} ({index.approved_per_epic[epic_id]}/{len(index.epic_stories[epic_id])} approved)"):
+            st.write(f"**ID:** {epic.get('id')}")
+            st.write(f"**Description:** {epic.get('description')}")
+            st.write(f"**Priority:** {epic.get('priority') or 'Medium'}")
+            st.write(f"**Labels:** {', '.join(epic.get('labels', []))}")
+
+            # Epic checkbox (on_change triggers toggle_epic)
+            st.checkbox(
+                "✔ Approve Epic",
+                value=index.is_epic_approved(epic_id),
+                key=f"approve_{ekey}",
+                on_change=toggle_epic,
+                args=(epic_id,)
+            )
+
+            st.markdown("---")
+            st.write("### Stories")
+
+            # Stories: a checkbox + compact details per story
+            stories = epic.get("stories", [])
+            for sk in story_keys:
+                story = apply_story_edits(epic_id, stories[index.story_pos[sk]], edited_items)
 
-        # Stories
-        for story in epic.get("stories", []):
-            story_key = f"{epic['id']}_{story['id']}"
-
-            # Apply story edits if present
-            if story_key in edited_items:
-                updates = edited_items[story_key]
-                story["title"] = updates.get("title", story.get("title"))
-                story["description"] = updates.get("description", story.get("description"))
-                story["acceptance_criteria"] = updates.get("acceptance_criteria", story.get("acceptance_criteria", []))
-
-            # Each story expander with approval checkbox
-            with st.expander(f"📝 {story['id']} — {story['title']}"):
-                st.write(f"**Description:** {story.get('description','')}")
-                st.write("**Acceptance Criteria:**")
-                for ac in story.get("acceptance_criteria", []):
-                    st.markdown(f"- {ac}")
-
-                # Story checkbox with on_change callback to toggle_story
                 st.checkbox(
-                    "✔ Approve Story",
-                    value=st.session_state.approvals[story_key],
-                    key=f"approve_{story_key}",
+                    f"📝 {story['id']} — {story['title']}",
+                    value=index.is_story_approved(sk),
+                    key=f"approve_{sk}",
                     on_change=toggle_story,
-                    args=(epic_key, story_key, story_keys)
+                    args=(epic_id, sk)
                 )
+                with st.popover("Details"):
+                    st.write(f"**Description:** {story.get('description','')}")
+                    st.write("**Acceptance Criteria:**")
+                    for ac in story.get("acceptance_criteria", []):
+                        st.markdown(f"- {ac}")
 
-# Approval summary & preview
-st.markdown("---")
-approved_items = [k for k, v in st.session_state.approvals.items() if v]
-approved_epics = [k for k in approved_items if k.startswith("epic_")]
-approved_stories = [k for k in approved_items if not k.startswith("epic_")]
+    # Approval summary (counts are maintained incrementally)
+    st.markdown("---")
+    st.success(f"Approved: {index.approved_epic_count} epics, {index.approved_story_count} stories.")
+
+
+approval_list()
 
-st.success(f"Approved: {len(approved_epics)} epics, {len(approved_stories)} stories.")
 
 # Preview what will be sent to JIRA (approved subset)
 def build_approved_payload():
-    payload = {"epics": [], "context": final_output.get("context", {})}
-    for epic in final_output.get("epics", []):
-        epic_key = f"epic_{epic['id']}"
-        if st.session_state.approvals.get(epic_key):
-            # include epic and only approved stories
-            epic_copy = {
-                "id": epic["id"],
-                "title": epic["title"],
-                "description": epic.get("description",""),
-                "priority": epic.get("priority","Medium"),
-                "labels": epic.get("labels", []),
-                "stories": []
-            }
-            for s in epic.get("stories", []):
-                sk = f"{epic['id']}_{s['id']}"
-                if st.session_state.approvals.get(sk):
-                    epic_copy["stories"].append(s)
-            payload["epics"].append(epic_copy)
-    return payload
+    context = api_client.get_run_summary(run_id).get("context", {})
+    return index.build_payload(load_epic, edited_items, context)
 
 if st.button("🔍 Preview Approved Payload for JIRA"):
     approved_payload = build_approved_payload()
@@ -177,42 +169,99 @@ if st.button("🔍 Preview Approved Payload for JIRA"):
     else:
         st.json(approved_payload)
 
-# JIRA sync button
+# JIRA sync runs as a backend job; the page only polls its progress
+STATUS_ICONS = {"created": "✅", "reused": "♻️", "failed": "❌", "skipped": "⏭️"}
+
+def render_sync_report(report):
+    counts = report["counts"]
+    st.subheader("Created / Reused Jira Issues")
+    st.write(
+        f"Created: {counts['created']} · Reused: {counts['reused']} · "
+        f"Failed: {counts['failed']} · Skipped: {counts['skipped']} (of {counts['total']})"
+    )
+
+    for epic in report.get("epics", []):
+        icon = STATUS_ICONS[epic["status"]]
+        if epic.get("jira_key"):
+            st.markdown(f"### {icon} Epic: [{epic['jira_key']}]({epic['jira_url']})")
+        else:
+            st.markdown(f"### {icon} Epic {epic['requested_epic_id']}: {epic.get('error')}")
+
+        for story in epic.get("stories", []):
+            icon = STATUS_ICONS[story["status"]]
+            if story.get("jira_key"):
+                st.markdown(f"- {icon} Story: [{story['jira_key']}]({story['jira_url']})")
+            else:
+                st.markdown(f"- {icon} Story {story['requested_story_id']}: {story.get('error')}")
+
+
+@st.fragment(run_every=1.0)
+def jira_sync_status():
+    """
+    Polls the running sync job once per tick; when it finishes the job is
+    kept as the last sync and the page reruns to show its report.
+    """
+    job_id = st.session_state.get("jira_sync_job_id")
+    if not job_id:
+        return
+
+    try:
+        job = api_client.get_jira_sync(job_id)
+    except Exception as e:
+        st.error(f"Could not fetch Jira sync status: {e}")
+        return
+
+    if job["status"] in api_client.JOB_TERMINAL_STATES:
+        st.session_state["jira_sync_last_job"] = job
+        st.session_state.pop("jira_sync_job_id", None)
+        st.rerun()
+
+    if st.button("Stop sync", key="cancel_jira_sync"):
+        try:
+            api_client.cancel_jira_sync(job_id)
+        except Exception as e:
+            st.error(f"Could not stop the sync: {e}")
+        st.rerun(scope="fragment")
+
+    progress = job["progress"]
+    counts = progress.get("counts", {})
+    label = f"Syncing to JIRA ({progress['done']}/{progress['total']}, {counts.get('failed', 0)} failed)"
+    st.progress(progress["done"] / progress["total"] if progress["total"] else 0, text=label)
+
+
+def start_sync(submit):
+    try:
+        st.session_state["jira_sync_job_id"] = submit()
+        st.session_state.pop("jira_sync_last_job", None)
+    except Exception as e:
+        st.error(f"Jira sync error: {e}")
+
+
 if st.button("🔁 Sync Approved Items to JIRA"):
     approved_payload = build_approved_payload()
-    
+
     if not approved_payload["epics"]:
         st.warning("No approved epics/stories to sync.")
         st.stop()
 
-    with st.spinner("Syncing approved items to JIRA..."):
-        try:
-            jira = JiraClient()
-            sync_result = jira.sync_approved_payload(approved_payload)
+    start_sync(lambda: api_client.submit_jira_sync(approved_payload))
 
-            # Store full sync result
-            st.session_state["jira_sync_result"] = sync_result
+jira_sync_status()
 
+last_job = st.session_state.get("jira_sync_last_job")
+if last_job and not st.session_state.get("jira_sync_job_id"):
+    report = last_job["result"]
+    if last_job["status"] != "succeeded":
+        st.error(f"Jira sync {last_job['status']}: {last_job['error']}")
+    else:
+        st.session_state["jira_sync_result"] = report
+        if last_job["remaining"]:
+            st.warning("Jira sync finished with errors.")
+        else:
             st.success("Jira sync complete!")
+        render_sync_report(report)
 
-            # --------------------------
-            # SHOW CLICKABLE LINKS (SUCCESS)
-            # --------------------------
-            JIRA_SITE = st.secrets["JIRA_SITE_URL"] + "/browse/"
-
-            st.subheader("Created / Reused Jira Issues")
-
-            # EPICS
-            for epic in sync_result.get("epics", []):
-                epic_key = epic.get("jira_key")
-                if epic_key:
-                    st.markdown(f"### 🟪 Epic: [{epic_key}]({JIRA_SITE}{epic_key})")
-
-                # STORIES under this epic
-                for story in epic.get("stories", []):
-                    story_key = story.get("jira_key")
-                    if story_key:
-                        st.markdown(f"- 🟩 Story: [{story_key}]({JIRA_SITE}{story_key})")
-
-        except Exception as e:
-            st.error(f"Jira sync error: {e}")
+    if last_job["resumable"]:
+        if st.button("🔁 Retry failed items"):
+            start_sync(lambda: api_client.resume_jira_sync(last_job["job_id"]))
+            st.rerun()
@@ -0,0 +1,131 @@
+# tests/test_admission.py
+
+import asyncio
+
+import pytest
+
+from backend.jobs.admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+def test_per_client_limit():
+    admission = AdmissionController(max_running=10, max_queue=10, max_per_client=2)
+    admission.admit("alice")
+    admission.admit("alice")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("alice")
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+
+    # other clients are not affected
+    admission.admit("bob")
+    assert admission.counters["rejected_client_limit"] == 1
+
+
+def test_global_limit_rejects_when_queue_is_full():
+    async def main():
+        admission = AdmissionController(max_running=2, max_queue=1, max_per_client=10)
+        for client in ("a", "b"):
+            await admission.admit(client).acquire()
+        admission.admit("c")  # the one queue place
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            admission.admit("d")
+        assert rejected.value.status_code == 503
+        assert admission.counters["rejected_queue_full"] == 1
+        assert admission.stats()["running"] == 2 and admission.stats()["queued"] == 1
+
+    asyncio.run(main())
+
+
+def test_batch_runs_only_fill_their_share_of_the_queue():
+    async def main():
+        admission = AdmissionController(max_running=1, max_queue=4, max_per_client=10, batch_queue_share=0.5)
+        await admission.admit("a").acquire()
+        admission.admit("b", BATCH)
+        admission.admit("c", BATCH)
+
+        with pytest.raises(AdmissionRejected):
+            admission.admit("d", BATCH)
+        admission.admit("e", INTERACTIVE)
+
+        with pytest.raises(ValueError):
+            admission.admit("f", "urgent")
+
+    asyncio.run(main())
+
+
+def test_ticket_release_frees_quota_and_hands_over_the_slot():
+    async def main():
+        admission = AdmissionController(max_running=1, max_queue=10, max_per_client=1)
+        first = admission.admit("alice")
+        await first.acquire()
+        assert admission.running == 1
+
+        batch = admission.admit("bob", BATCH)
+        interactive = admission.admit("carol", INTERACTIVE)
+        order = []
+
+        async def run(ticket, name):
+            async with ticket:
+                order.append(name)
+
+        waiting = [asyncio.create_task(run(batch, "batch")), asyncio.create_task(run(interactive, "interactive"))]
+        await asyncio.sleep(0)
+        assert order == []
+
+        first.close()
+        first.close()  # idempotent
+        await asyncio.gather(*waiting)
+
+        # interactive runs get the slot before batch runs
+        assert order == ["interactive", "batch"]
+        assert admission.running == 0 and admission.admitted == 0
+        assert admission.stats()["clients"] == 0
+        admission.admit("alice")  # quota is back
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_releases_its_ticket():
+    async def main():
+        admission = AdmissionController(max_running=1, max_queue=10, max_per_client=1)
+        holder = admission.admit("alice")
+        await holder.acquire()
+
+        ticket = admission.admit("bob")
+        waiter = asyncio.create_task(ticket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert ticket.closed and not ticket.running
+        assert admission.admitted == 1
+        admission.admit("bob").close()  # bob's quota is free again
+
+        # the cancelled waiter doesn't swallow the slot
+        holder.close()
+        assert admission.running == 0
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_rejects_and_releases_the_ticket():
+    async def main():
+        admission = AdmissionController(max_running=1, max_queue=10, max_per_client=1)
+        holder = admission.admit("alice")
+        await holder.acquire()
+
+        ticket = admission.admit("bob")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ticket.acquire(timeout=0.01)
+        assert rejected.value.status_code == 503
+        assert ticket.closed
+        assert admission.counters["queue_timeouts"] == 1
+        assert admission.admitted == 1
+
+        holder.close()
+        assert admission.running == 0
+
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+# tests/test_history_store.py
+
+import sqlite3
+import threading
+
+from backend.storage.history_store import HistoryStore
+from backend.utils import json_utils
+
+RESULT = {
+    "planner_output": {
+        "epics": [
+            {"id": "E1", "title": "Reports", "description": "Export reports", "stories": [
+                {"id": "S1", "title": "CSV export", "description": "As a user I export CSV",
+                 "acceptance_criteria": ["a csv file is downloaded"], "priority": "High"},
+            ]},
+            {"id": "E2", "title": "Alerts", "description": "Notify users", "stories": []},
+        ],
+        "context": {"product": "reporting"},
+    },
+    "reviewer_output": {"review": {"epics": [{"id": "E1", "notes": "ok"}], "context": {"overall": "good"}}},
+}
+
+# runs table as created before the context columns existed
+OLD_SCHEMA = """
+CREATE TABLE runs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    model TEXT,
+    transcript TEXT NOT NULL,
+    result TEXT NOT NULL,
+    epic_count INTEGER NOT NULL,
+    story_count INTEGER NOT NULL
+);
+"""
+
+
+def test_summary_reads_the_context_columns(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    run_id = store.save_run("transcript", RESULT, "model")
+
+    # the summary no longer needs the result blob
+    store._conn().execute("UPDATE runs SET result = '{}' WHERE id = ?", (run_id,))
+    summary = store.get_run_summary(run_id)
+    assert summary["epic_count"] == 2 and summary["story_count"] == 1
+    assert summary["context"] == {"product": "reporting"}
+    assert summary["review_context"] == {"overall": "good"}
+    assert store.get_run_summary("missing") is None
+
+
+def test_old_database_is_migrated_and_backfilled(tmp_path):
+    path = str(tmp_path / "history.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.execute(
+        "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ("old", 1.0, "model", "transcript", json_utils.dumps(RESULT), 2, 1),
+    )
+    conn.commit()
+    conn.close()
+
+    store = HistoryStore(path)
+    summary = store.get_run_summary("old")
+    assert summary["context"] == {"product": "reporting"}
+    assert summary["review_context"] == {"overall": "good"}
+
+    assert [e["id"] for e in store.list_epics("old")["epics"]] == ["E1", "E2"]
+    assert store.get_epic("old", "E1")["review"] == {"id": "E1", "notes": "ok"}
+
+
+def test_concurrent_backfills_of_the_same_run(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    run_id = store.save_run("transcript", RESULT, "model")
+    store._conn().execute("DELETE FROM run_epics WHERE run_id = ?", (run_id,))
+    store._conn().commit()
+
+    errors = []
+
+    def backfill():
+        try:
+            store.get_run_index(run_id)
+            # a second pass over an already backfilled run is a no-op too
+            with store._conn() as conn:
+                store._insert_epics(conn, run_id, RESULT)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=backfill) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [e["id"] for e in store.get_run_index(run_id)] == ["E1", "E2"]
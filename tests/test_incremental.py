@@ -0,0 +1,70 @@
+# tests/test_incremental.py
+
+from backend.agents import incremental
+from backend.models.requirements import Epic, SourceSpan, Story
+
+OLD = "".join(f"line {i} about topic {i}\n" for i in range(40))
+
+
+def edit_line(text, n, replacement):
+    lines = text.splitlines(keepends=True)
+    lines[n] = replacement
+    return "".join(lines)
+
+
+def line_span(text, first, last):
+    lines = text.splitlines(keepends=True)
+    start = sum(len(line) for line in lines[:first])
+    end = sum(len(line) for line in lines[:last + 1])
+    return SourceSpan(start, end)
+
+
+def test_classify_epics_by_span():
+    new = edit_line(OLD, 5, "line 5 was rewritten entirely\n")
+    diff = incremental.TranscriptDiff(OLD, new)
+    dirty = Epic(id="dirty", source_span=line_span(OLD, 4, 6))
+    restory = Epic(
+        id="restory",
+        source_span=line_span(OLD, 30, 35),
+        stories=[Story(id="s", source_span=line_span(OLD, 5, 5))],
+    )
+    kept = Epic(id="kept", source_span=line_span(OLD, 20, 25))
+
+    assert incremental.classify_epics([dirty, kept], diff) == ([dirty], [], [kept])
+    assert incremental.classify_epics([restory], diff)[1] == [restory]
+
+
+def test_span_less_epics_are_restoried_when_the_transcript_changed():
+    epic = Epic(id="nowhere")
+
+    changed = incremental.TranscriptDiff(OLD, edit_line(OLD, 5, "changed\n"))
+    assert incremental.classify_epics([epic], changed) == ([], [epic], [])
+
+    unchanged = incremental.TranscriptDiff(OLD, OLD)
+    assert incremental.classify_epics([epic], unchanged) == ([], [], [epic])
+
+
+def test_drop_overlapping_removes_reextracted_kept_epics():
+    new = edit_line(OLD, 10, "line 10 now talks about exports\n")
+    diff = incremental.TranscriptDiff(OLD, new)
+    kept = Epic(id="kept", source_span=line_span(new, 11, 14))
+
+    fresh = Epic(id="fresh", source_span=line_span(new, 9, 11))  # touches the change
+    duplicate = Epic(id="dup", source_span=line_span(new, 12, 13))  # context only
+    elsewhere = Epic(id="elsewhere", source_span=line_span(new, 30, 32))
+    unlocated = Epic(id="unlocated")
+
+    result = incremental.drop_overlapping([fresh, duplicate, elsewhere, unlocated], [kept], diff)
+    assert [e.id for e in result] == ["fresh", "elsewhere", "unlocated"]
+
+
+def test_replan_windows_cover_changes_and_dirty_spans():
+    new = edit_line(OLD, 5, "changed\n")
+    diff = incremental.TranscriptDiff(OLD, new)
+    dirty = Epic(id="dirty", source_span=line_span(OLD, 30, 31))
+
+    windows = incremental.replan_windows([dirty], diff)
+    change_start = diff.changes[0][1][0]
+    dirty_span = incremental.shift_span(dirty.source_span, diff)
+    assert any(s <= change_start < e for s, e in windows)
+    assert any(s <= dirty_span.start_char and dirty_span.end_char <= e for s, e in windows)
@@ -0,0 +1,134 @@
+# tests/test_job_manager.py
+
+import asyncio
+
+from backend.jobs import job_manager
+from backend.jobs.admission import AdmissionController, AdmissionRejected
+from backend.jobs.job_manager import CANCELLED, FAILED, QUEUED, SUCCEEDED, JobManager
+
+
+async def settle():
+    # let done callbacks run
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def run_with_ticket(ticket, progress=None):
+    """Same ticket handling as main.run_and_store, without the pipeline."""
+    await ticket.acquire()
+    try:
+        await asyncio.sleep(10)
+    finally:
+        ticket.close()
+
+
+def test_job_succeeds_and_runs_cleanup():
+    async def main():
+        jobs = JobManager()
+        cleaned = []
+
+        async def work(x, progress=None):
+            progress("working", 1, 2)
+            return x * 2
+
+        job_id = jobs.submit("t", work, 21, cleanup=lambda: cleaned.append(True))
+        await asyncio.sleep(0.01)
+        job = jobs.get(job_id)
+        assert job["status"] == SUCCEEDED and job["result"] == 42
+        assert cleaned == [True]
+        assert job_id not in jobs._tasks
+
+    asyncio.run(main())
+
+
+def test_failed_job_runs_cleanup():
+    async def main():
+        jobs = JobManager()
+        cleaned = []
+
+        async def work(progress=None):
+            raise RuntimeError("boom")
+
+        job_id = jobs.submit("t", work, cleanup=lambda: cleaned.append(True))
+        await asyncio.sleep(0.01)
+        assert jobs.get(job_id)["status"] == FAILED
+        assert jobs.get(job_id)["error"] == "boom"
+        assert cleaned == [True]
+
+    asyncio.run(main())
+
+
+def test_cancel_before_start_reaches_terminal_state():
+    async def main():
+        jobs = JobManager()
+        cleaned = []
+        job_id = jobs.submit("t", run_with_ticket, None, lease_seconds=30, cleanup=lambda: cleaned.append(True))
+        # cancelled before the task ever ran
+        assert await jobs.cancel(job_id, wait=0.1)
+        await settle()
+        job = jobs.get(job_id)
+        assert job["status"] == CANCELLED
+        assert cleaned == [True]
+        assert job_id not in jobs._tasks and job_id not in jobs._leases
+
+    asyncio.run(main())
+
+
+def test_cancel_while_waiting_for_job_slot():
+    async def main():
+        jobs = JobManager(max_concurrent=1)
+        blocker = jobs.submit("t", lambda progress=None: asyncio.sleep(10))
+        cleaned = []
+        waiting = jobs.submit("t", lambda progress=None: asyncio.sleep(0), cleanup=lambda: cleaned.append(True))
+        await asyncio.sleep(0.01)
+        assert jobs.get(waiting)["status"] == QUEUED
+
+        assert await jobs.cancel(waiting)
+        await settle()
+        assert jobs.get(waiting)["status"] == CANCELLED
+        assert cleaned == [True]
+        await jobs.shutdown()
+        assert jobs.get(blocker)["status"] == CANCELLED
+
+    asyncio.run(main())
+
+
+def test_cancelled_jobs_release_admission_tickets():
+    async def main():
+        jobs = JobManager()
+        admission = AdmissionController(max_running=1, max_queue=4, max_per_client=2)
+        for _ in range(2):
+            ticket = admission.admit("client")
+            job_id = jobs.submit("process", run_with_ticket, ticket, cleanup=ticket.close)
+            await jobs.cancel(job_id)
+            await settle()
+            assert jobs.get(job_id)["status"] == CANCELLED
+
+        assert admission.stats()["running"] == 0 and admission.stats()["queued"] == 0
+        # the client's quota is free again
+        admission.admit("client").close()
+
+    asyncio.run(main())
+
+
+def test_lease_expiry_while_queued_releases_ticket(monkeypatch):
+    monkeypatch.setattr(job_manager, "LEASE_CHECK_INTERVAL", 0.01)
+
+    async def main():
+        jobs = JobManager(max_concurrent=1)
+        admission = AdmissionController(max_running=4, max_per_client=1)
+        blocker = jobs.submit("t", lambda progress=None: asyncio.sleep(10))
+        ticket = admission.admit("client")
+        job_id = jobs.submit("process", run_with_ticket, ticket, lease_seconds=0.02, cleanup=ticket.close)
+        try:
+            admission.admit("client")
+            raise AssertionError("client limit not enforced")
+        except AdmissionRejected as e:
+            assert e.status_code == 429
+
+        await asyncio.sleep(0.1)
+        assert jobs.get(job_id)["status"] == CANCELLED
+        admission.admit("client").close()
+        await jobs.cancel(blocker)
+
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+# tests/test_profiling.py
+
+import os
+
+from backend.utils import json_utils, profiling
+
+
+def test_summary_has_no_server_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    with profiling.RunProfiler("test") as profiler:
+        profiler.progress("planning")
+        sum(range(1000))
+        profiler.progress("reviewing")
+
+    summary = profiler.summary
+    assert [s["stage"] for s in summary["stages"]] == ["planning", "reviewing"]
+    assert str(tmp_path) not in json_utils.dumps(summary)
+    assert profiling.load_summary(profiler.profile_id) == summary
+    for name in profiling.PROFILE_FILES:
+        assert os.path.isfile(profiling.file_path(profiler.profile_id, name))
+
+
+def test_file_path_only_serves_known_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path / "profiles"))
+    os.makedirs(tmp_path / "profiles" / "p1")
+    (tmp_path / "profiles" / "p1" / "profile.txt").write_text("stats")
+    (tmp_path / "secret.txt").write_text("secret")
+
+    assert profiling.file_path("p1", "profile.txt") == str(tmp_path / "profiles" / "p1" / "profile.txt")
+    assert profiling.file_path("p1", "stages.json") is None  # not written
+    assert profiling.file_path("p1", "other.txt") is None
+    assert profiling.file_path("..", "secret.txt") is None
+    assert profiling.file_path("../p1", "profile.txt") is None
+    assert profiling.load_summary("missing") is None
+
+
+def test_load_summary_drops_the_directory_of_old_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    os.makedirs(tmp_path / "old")
+    (tmp_path / "old" / "stages.json").write_text(json_utils.dumps({"profile_id": "old", "dir": str(tmp_path / "old")}))
+
+    assert profiling.load_summary("old") == {"profile_id": "old"}
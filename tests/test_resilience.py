@@ -0,0 +1,94 @@
+# tests/test_resilience.py
+
+import asyncio
+
+import pytest
+
+from backend.utils.resilience import classify
+
+
+class StandInRequestsResponse:
+    """Behaves like requests.Response where it matters: falsy for 4xx/5xx."""
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def __bool__(self):
+        return self.ok
+
+
+class HTTPError(Exception):
+    """Shape of requests.exceptions.HTTPError (status only on .response)."""
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} error")
+        self.response = response
+
+
+def requests_error(status, headers=None):
+    try:
+        import requests
+    except ImportError:
+        return HTTPError(StandInRequestsResponse(status, headers))
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.exceptions.HTTPError(response=response)
+
+
+def httpx_error(status, headers=None):
+    httpx = pytest.importorskip("httpx")
+    request = httpx.Request("POST", "https://example.invalid/rest/api/3/issue")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+@pytest.mark.parametrize("make_error", [requests_error, httpx_error])
+def test_rate_limit_is_transient_with_retry_after(make_error):
+    assert classify(make_error(429, {"Retry-After": "2"})) == (True, True, 2.0)
+
+
+@pytest.mark.parametrize("make_error", [requests_error, httpx_error])
+def test_unavailable_is_retried_even_when_not_idempotent(make_error):
+    transient, retryable, _ = classify(make_error(503), idempotent=False)
+    assert transient and retryable
+
+
+@pytest.mark.parametrize("make_error", [requests_error, httpx_error])
+def test_server_error_not_retried_when_not_idempotent(make_error):
+    assert classify(make_error(500), idempotent=False) == (True, False, None)
+    assert classify(make_error(500)) == (True, True, None)
+
+
+@pytest.mark.parametrize("make_error", [requests_error, httpx_error])
+def test_client_error_is_neither_transient_nor_retryable(make_error):
+    assert classify(make_error(404)) == (False, False, None)
+
+
+def test_status_code_on_the_exception_itself():
+    class SDKError(Exception):
+        status_code = 502
+        raw_response = None
+
+    assert classify(SDKError()) == (True, True, None)
+
+
+def test_network_errors_by_class_name():
+    class ConnectError(Exception):
+        pass
+
+    class ReadTimeout(Exception):
+        pass
+
+    assert classify(ConnectError()) == (True, True, None)
+    assert classify(ReadTimeout(), idempotent=False) == (True, False, None)
+    assert classify(asyncio.TimeoutError()) == (True, True, None)
+
+
+def test_unknown_errors_are_not_retried():
+    assert classify(ValueError("bad payload")) == (False, False, None)
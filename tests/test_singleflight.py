@@ -0,0 +1,134 @@
+# tests/test_singleflight.py
+
+import asyncio
+
+import pytest
+
+from backend.utils.singleflight import SingleFlight, make_key
+
+
+def test_make_key_is_stable_and_distinguishes_parts():
+    assert make_key("pipeline", "text", "model") == make_key("pipeline", "text", "model")
+    assert make_key("pipeline", "text", "model") != make_key("pipeline", "text", "other")
+    assert make_key("a", None) != make_key("a", "")
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def work(x):
+            calls.append(x)
+            await release.wait()
+            return {"value": x}
+
+        waiters = [asyncio.create_task(flights.do("k", work, 1)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.in_flight("k")
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert calls == [1]
+        assert results[0] is results[1] is results[2]
+        assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 2}
+
+    asyncio.run(main())
+
+
+def test_nothing_is_cached_after_completion():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(True)
+            return len(calls)
+
+        assert await flights.do("k", work) == 1
+        assert await flights.do("k", work) == 2
+        assert flights.stats()["executions"] == 2
+
+    asyncio.run(main())
+
+
+def test_error_is_raised_to_every_waiter():
+    async def main():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise ValueError("boom")
+
+        waiters = [asyncio.create_task(flights.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(r, ValueError) and str(r) == "boom" for r in results)
+        assert not flights.in_flight("k")
+
+        # a failed flight isn't remembered: the next call runs again
+        async def ok():
+            return "ok"
+
+        assert await flights.do("k", ok) == "ok"
+
+    asyncio.run(main())
+
+
+def test_cancelling_one_waiter_keeps_the_shared_work():
+    async def main():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        cancelled = []
+
+        async def work():
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", work))
+        second = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert flights.in_flight("k")
+
+        release.set()
+        assert await second == "done"
+        assert cancelled == []
+
+    asyncio.run(main())
+
+
+def test_cancelling_every_waiter_cancels_the_work():
+    async def main():
+        flights = SingleFlight()
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        waiters = [asyncio.create_task(flights.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert cancelled == [True]
+        assert not flights.in_flight("k")
+
+    asyncio.run(main())
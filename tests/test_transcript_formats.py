@@ -0,0 +1,131 @@
+# tests/test_transcript_formats.py
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from backend.utils import transcript_formats
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+EXPECTED = {
+    "meeting.vtt": (
+        "Alice Smith: We need to export reports as CSV. Finance asks for it every month — café team.\n"
+        "Bob: Should it include archived projects & drafts?\n"
+        "Alice Smith: Only active projects. Next step: draft the export screen.\n"
+    ),
+    "meeting.srt": (
+        "Alice Smith: We need to export reports as CSV. Finance asks for it every month.\n"
+        "Speaker 2: Should it include archived projects?\n"
+        "Next step: draft the export screen.\n"
+    ),
+    "slack_export.json": (
+        "Alice Smith: We need to export reports as CSV, see the reports page"
+        " Finance asks for it every month & at quarter end — café team\n"
+        "bob: Should reporting get a notification [when it's ready]?\n"
+    ),
+    "teams_export.json": (
+        "Alice Smith: We need to export reports as CSV.\n"
+        "Bob Jones: Including archived [old] projects?\n"
+    ),
+}
+
+
+def normalize(name):
+    with open(FIXTURES / name, "rb") as f:
+        return transcript_formats.normalize_transcript(name, f)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_fixture_is_normalized(name):
+    transcript = normalize(name)
+    assert transcript.text == EXPECTED[name]
+    assert transcript.format == name.rsplit(".", 1)[-1]
+    assert len(transcript.offsets) == transcript.text.count("\n")
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries_dont_change_the_result(monkeypatch, name, chunk_size):
+    # small chunks split the BOM, multi-byte characters, \r\n pairs,
+    # timing lines and JSON strings / numbers across reads
+    monkeypatch.setattr(transcript_formats, "CHUNK_SIZE", chunk_size)
+    transcript = normalize(name)
+    assert transcript.text == EXPECTED[name]
+
+
+def test_caption_offsets_map_text_back_to_cues():
+    transcript = normalize("meeting.vtt")
+    assert transcript.cues == 4 and transcript.speakers == 2
+    assert transcript.duration_ms == 11000
+
+    bob = transcript.offsets.locate(transcript.text.index("Bob:") + 5)
+    assert bob["turn"] == 1
+    assert (bob["start_ms"], bob["end_ms"]) == (6000, 9250)
+    assert bob["source_line"] == 17
+
+
+def test_speaker_prefix_requires_a_name():
+    cues = list(transcript_formats.iter_caption_cues([
+        "00:00:01.000 --> 00:00:02.000",
+        "Dr. Jane Doe: hello",
+        "",
+        "00:00:02.000 --> 00:00:03.000",
+        "Action items: send the notes",
+        "",
+        "00:00:03.000 --> 00:00:04.000",
+        "The plan for next week: ship it",
+        "",
+        "00:00:04.000 --> 00:00:05.000",
+        "SPEAKER_01: ok",
+    ]))
+    assert [(speaker, text) for speaker, text, *_ in cues] == [
+        ("Dr. Jane Doe", "hello"),
+        (None, "Action items: send the notes"),
+        (None, "The plan for next week: ship it"),
+        ("SPEAKER_01", "ok"),
+    ]
+
+
+def test_rolling_captions_drop_repeated_lines():
+    cues = list(transcript_formats.iter_caption_cues([
+        "00:00:01.000 --> 00:00:02.000",
+        "first line",
+        "",
+        "00:00:02.000 --> 00:00:03.000",
+        "first line",
+        "second line",
+    ]))
+    assert [text for _, text, *_ in cues] == ["first line", "second line"]
+
+
+def test_json_messages_are_found_by_key():
+    export = {
+        "meta": {"tags": ["not", "messages"], "count": 12345},
+        "members": [{"name": "x"}],
+        "messages": [{"user": "alice", "text": "hi"}, {"user": "bob", "text": "hello"}],
+        "trailing": [1, 2],
+    }
+    text = json.dumps(export)
+    for size in (1, 5, len(text)):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(transcript_formats.iter_json_items(chunks)) == export["messages"]
+
+
+def test_json_without_messages_yields_nothing():
+    assert list(transcript_formats.iter_json_items(['{"value": null, "other": [1]}'])) == []
+    assert list(transcript_formats.iter_json_items([""])) == []
+
+
+@pytest.mark.parametrize("text", ['[{"user": "a", "text": "x"}', '{"value": [', '"just a string"', "{1: 2}"])
+def test_invalid_json_raises_value_error(text):
+    with pytest.raises(ValueError):
+        list(transcript_formats.iter_json_items([text]))
+
+
+def test_unsupported_extension():
+    assert not transcript_formats.is_supported("notes.txt")
+    with pytest.raises(ValueError):
+        transcript_formats.normalize_transcript("notes.txt", io.BytesIO(b""))